@@ -1,17 +1,38 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
 from .models import (
     WorkShift, 
     ShiftDayRule,
     Employee, 
     RawAttendanceLog, 
     DailyAttendanceReport, 
+    DailyPunchSummary,
     OvertimeRequest, 
     LeaveRequest,
     Holiday,
     MissionRequest,
     ManualLogRequest,
-    GlobalSettings
+    GlobalSettings,
+    SchedulerLease,
+    ProcessingRun,
+    ProcessingRunShard,
+    PolicyChange,
+    BalanceMovement,
+    BalanceSnapshot,
+    Terminal,
+    ArchivedMonth,
+    Site,
+    ShiftAssignment,
+    ClosedPeriod
 )
+from .pending_counts import invalidate_pending_counts
+from .changefeed import record_changes
+from .ledger import post_leave_request
+from .search import index_requests
+from .periods import closed_ranges
 
 class ShiftDayRuleInline(admin.TabularInline):
     model = ShiftDayRule
@@ -31,11 +52,177 @@ class HolidayAdmin(admin.ModelAdmin):
     search_fields = ('name', 'date')
     list_filter = ('date',)
 
-admin.site.register(Employee)
-admin.site.register(RawAttendanceLog)
-admin.site.register(DailyAttendanceReport)
-admin.site.register(OvertimeRequest)
-admin.site.register(LeaveRequest)
-admin.site.register(MissionRequest)
-admin.site.register(ManualLogRequest)
-admin.site.register(GlobalSettings)
\ No newline at end of file
+@admin.register(Site)
+class SiteAdmin(admin.ModelAdmin):
+    list_display = ('name', 'timezone')
+    search_fields = ('name',)
+
+class ShiftAssignmentInline(admin.TabularInline):
+    model = ShiftAssignment
+    extra = 1
+    fields = ('effective_from', 'shift')
+    ordering = ('effective_from',)
+
+@admin.register(Employee)
+class EmployeeAdmin(admin.ModelAdmin):
+    list_display = ('full_name', 'employee_code', 'shift', 'site')
+    list_select_related = ('shift', 'site')
+    search_fields = ('full_name', '=employee_code')
+    inlines = [ShiftAssignmentInline]
+
+admin.site.register(GlobalSettings)
+
+# --- Large tables: estimated counts, indexed navigation, set-based actions ---
+
+def estimated_row_count(model):
+    """The database's own row estimate for a table, without scanning it; None where the backend keeps none."""
+    connection = connections[model.objects.db]; table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql': cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'mysql': cursor.execute("SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s", [table])
+        else: return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] and row[0] > 0 else None
+
+class EstimatedCountPaginator(Paginator):
+    """Counts exactly up to EXACT_LIMIT rows. Larger unfiltered changelists use the table estimate; larger filtered ones stop at the limit."""
+    EXACT_LIMIT = 100000
+    @cached_property
+    def count(self):
+        capped = self.object_list.order_by()[:self.EXACT_LIMIT + 1].count()
+        if capped <= self.EXACT_LIMIT: return capped
+        if not self.object_list.query.where: return max(estimated_row_count(self.object_list.model) or 0, capped)
+        return capped
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator; show_full_result_count = False; list_per_page = 100
+
+def set_request_status(modeladmin, request, queryset, new_status):
+    """One UPDATE for the whole selection. Signals do not fire for it, so the derived data they maintain is refreshed here."""
+    model = queryset.model
+    with transaction.atomic():
+        pending = queryset.filter(status=model.STATUS_PENDING)
+        for start, end in closed_ranges(): pending = pending.exclude(date__range=(start, end))
+        selected = list(pending.values_list('id', 'employee_id')); ids = [pk for pk, _ in selected]
+        updated = model.objects.filter(id__in=ids, status=model.STATUS_PENDING).update(status=new_status, updated_at=timezone.now())
+        invalidate_pending_counts({employee_id for _, employee_id in selected}); record_changes([model(id=pk, employee_id=employee_id) for pk, employee_id in selected])
+        index_requests(model.objects.filter(id__in=ids))
+        if model is LeaveRequest:
+            for leave in LeaveRequest.objects.filter(id__in=ids): post_leave_request(leave)
+    modeladmin.message_user(request, f"{updated} pending request(s) marked {new_status.lower()}.")
+
+@admin.action(description="Approve selected pending requests")
+def approve_selected(modeladmin, request, queryset): set_request_status(modeladmin, request, queryset, queryset.model.STATUS_APPROVED)
+
+@admin.action(description="Reject selected pending requests")
+def reject_selected(modeladmin, request, queryset): set_request_status(modeladmin, request, queryset, queryset.model.STATUS_REJECTED)
+
+@admin.register(RawAttendanceLog)
+class RawAttendanceLogAdmin(LargeTableAdmin):
+    list_display = ('employee_code', 'timestamp', 'terminal', 'sequence')
+    list_select_related = ('terminal',)
+    date_hierarchy = 'timestamp'; ordering = ('-timestamp',); sortable_by = ('timestamp',)
+    search_fields = ('=employee_code',); list_filter = ('terminal',)
+    raw_id_fields = ('terminal',)
+
+@admin.register(DailyAttendanceReport)
+class DailyAttendanceReportAdmin(LargeTableAdmin):
+    list_display = ('employee', 'date', 'first_check_in', 'last_check_out', 'total_lateness_minutes', 'penalty_minutes', 'work_shortfall_minutes', 'work_overtime_minutes')
+    list_select_related = ('employee',)
+    date_hierarchy = 'date'; ordering = ('-date',); sortable_by = ('date',)
+    search_fields = ('=employee__employee_code',)
+    raw_id_fields = ('employee',)
+
+@admin.register(DailyPunchSummary)
+class DailyPunchSummaryAdmin(LargeTableAdmin):
+    list_display = ('employee', 'date', 'first_punch', 'last_punch', 'punch_count', 'presence_minutes', 'has_unmatched_punch')
+    list_select_related = ('employee',)
+    ordering = ('-date',); sortable_by = ('date',)
+    search_fields = ('=employee__employee_code',)
+    raw_id_fields = ('employee',); exclude = ('packed_punches',)
+
+class RequestAdmin(LargeTableAdmin):
+    list_select_related = ('employee',)
+    date_hierarchy = 'date'; ordering = ('-date',); sortable_by = ('date', 'status')
+    search_fields = ('=employee__employee_code',); list_filter = ('status',)
+    raw_id_fields = ('employee',)
+    actions = [approve_selected, reject_selected]
+
+@admin.register(OvertimeRequest)
+class OvertimeRequestAdmin(RequestAdmin):
+    list_display = ('employee', 'date', 'requested_minutes', 'status')
+
+@admin.register(LeaveRequest)
+class LeaveRequestAdmin(RequestAdmin):
+    list_display = ('employee', 'date', 'leave_type', 'start_time', 'end_time', 'status')
+
+@admin.register(MissionRequest)
+class MissionRequestAdmin(RequestAdmin):
+    list_display = ('employee', 'date', 'mission_type', 'destination', 'status')
+
+@admin.register(ManualLogRequest)
+class ManualLogRequestAdmin(RequestAdmin):
+    # Approving a manual log also creates its punch, so that stays on the per-request review endpoint.
+    actions = [reject_selected]
+    list_display = ('employee', 'date', 'time', 'log_type', 'status')
+
+@admin.register(SchedulerLease)
+class SchedulerLeaseAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'heartbeat_at', 'expires_at', 'last_status', 'consecutive_failures', 'last_full_run_date', 'last_incremental_at')
+    readonly_fields = list_display
+
+class ProcessingRunShardInline(admin.TabularInline):
+    model = ProcessingRunShard
+    extra = 0
+    readonly_fields = ('date', 'first_employee_id', 'last_employee_id', 'employee_count', 'completed_at')
+    can_delete = False
+
+@admin.register(ProcessingRun)
+class ProcessingRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'site', 'start_date', 'end_date', 'status', 'checkpoint_date', 'checkpoint_employee_id', 'employees_processed', 'started_at', 'finished_at')
+    list_filter = ('status', 'site')
+    inlines = [ProcessingRunShardInline]
+
+@admin.register(PolicyChange)
+class PolicyChangeAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'kind', 'description', 'status', 'window_start', 'window_end', 'affected_count', 'reports_changed', 'applied_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('kind', 'description', 'changes', 'window_start', 'window_end', 'affected', 'affected_count', 'reports_changed', 'rebuild_summaries', 'status', 'error', 'created_at', 'applied_at')
+
+@admin.register(BalanceMovement)
+class BalanceMovementAdmin(admin.ModelAdmin):
+    """Append-only: corrections are entered as new adjustment movements."""
+    list_display = ('employee', 'account', 'date', 'minutes', 'source', 'note', 'created_at')
+    list_filter = ('account', 'source')
+    search_fields = ('employee__full_name', 'employee__employee_code')
+    fields = ('employee', 'account', 'date', 'minutes', 'note')
+    def save_model(self, request, obj, form, change):
+        obj.source = BalanceMovement.SOURCE_ADJUSTMENT; super().save_model(request, obj, form, change)
+    def has_change_permission(self, request, obj=None): return obj is None and super().has_change_permission(request)
+    def has_delete_permission(self, request, obj=None): return False
+
+@admin.register(BalanceSnapshot)
+class BalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'account', 'balance', 'as_of_movement_id', 'taken_at')
+    list_filter = ('account',)
+    readonly_fields = list_display
+
+@admin.register(Terminal)
+class TerminalAdmin(admin.ModelAdmin):
+    list_display = ('name', 'serial', 'site', 'is_active', 'acknowledged_sequence', 'clock_offset_seconds', 'last_seen_at')
+    list_filter = ('is_active', 'site')
+    search_fields = ('name', 'serial')
+    readonly_fields = ('api_key', 'acknowledged_sequence', 'clock_offset_seconds', 'clock_checked_at', 'last_seen_at')
+
+@admin.register(ArchivedMonth)
+class ArchivedMonthAdmin(admin.ModelAdmin):
+    list_display = ('year', 'month', 'punch_count', 'employee_count', 'compressed', 'path', 'archived_at')
+    readonly_fields = list_display + ('period_start', 'period_end')
+
+@admin.register(ClosedPeriod)
+class ClosedPeriodAdmin(admin.ModelAdmin):
+    """Closing happens through the close_period command; a closed month is never edited or reopened here."""
+    list_display = ('year', 'month', 'report_count', 'employee_count', 'closed_by', 'closed_at')
+    readonly_fields = list_display + ('period_start', 'period_end', 'totals', 'checksum')
+    def has_add_permission(self, request): return False
+    def has_delete_permission(self, request, obj=None): return False
\ No newline at end of file
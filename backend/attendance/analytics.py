@@ -0,0 +1,106 @@
+from bisect import bisect_right
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import AttendanceRollup, Employee, DailyPunchSummary, LeaveRequest, MissionRequest, Holiday
+from .assignments import ShiftTimeline
+from .reports import resolve_day_status
+from .sites import employee_timezone
+
+# Bucket edges in minutes relative to the shift start: bucket 0 is "more than 30 early", the last one "an hour or more late".
+ARRIVAL_BUCKETS = (-30, -15, -5, 0, 5, 15, 30, 60)
+COUNTERS = ('employees', 'present', 'absent', 'on_leave', 'on_mission', 'off', 'late', 'late_minutes')
+STATUS_COUNTER = {'PRESENT': 'present', 'ABSENT': 'absent', 'LEAVE_FULL': 'on_leave', 'LEAVE_HOURLY': 'on_leave', 'MISSION_FULL': 'on_mission', 'HOLIDAY': 'off', 'WEEKEND_OFF': 'off'}
+
+def bucket_labels():
+    edges = ARRIVAL_BUCKETS
+    return [f"< {edges[0]}"] + [f"{low}..{high}" for low, high in zip(edges, edges[1:])] + [f">= {edges[-1]}"]
+
+def arrival_offset(day, day_rule, first_punch, tzinfo):
+    """Minutes between the first punch and the shift start (negative when early); punches after midnight count past 24:00."""
+    first_local = timezone.localtime(first_punch, tzinfo)
+    arrival = (first_local.date() - day).days * 24 * 60 + first_local.hour * 60 + first_local.minute
+    return arrival - (day_rule.start_time.hour * 60 + day_rule.start_time.minute)
+
+# --- Maintenance ---
+
+def day_rollups(day, employees):
+    """Rollup rows for `employees` (with `site` loaded) on `day`, from a fixed number of bulk queries.
+    Classification follows the activity grid (reports.resolve_day_status); lateness matches process_attendance."""
+    employee_ids = [emp.pk for emp in employees]; timeline = ShiftTimeline(employee_ids)
+    first_punches = dict(DailyPunchSummary.objects.filter(date=day, employee_id__in=employee_ids, punch_count__gt=0).values_list('employee_id', 'first_punch'))
+    leaves = {leave.employee_id: leave for leave in LeaveRequest.objects.filter(date=day, employee_id__in=employee_ids, status=LeaveRequest.STATUS_APPROVED)}
+    missions = {mission.employee_id: mission for mission in MissionRequest.objects.filter(date=day, employee_id__in=employee_ids, status=MissionRequest.STATUS_APPROVED)}
+    holiday_name = Holiday.objects.filter(date=day).values_list('name', flat=True).first()
+    groups = {}
+    for emp in employees:
+        history = timeline.history(emp); shift_id = history.shift_id_on(day)
+        if shift_id is None: continue
+        key = (emp.site_id, shift_id, emp.manager_id)
+        rollup = groups.get(key)
+        if rollup is None: rollup = groups[key] = AttendanceRollup(date=day, site_id=emp.site_id, shift_id=shift_id, manager_id=emp.manager_id, arrival_histogram=[0] * (len(ARRIVAL_BUCKETS) + 1))
+        day_rule = history.on(day); first_punch = first_punches.get(emp.pk)
+        status, _ = resolve_day_status(holiday_name, leaves.get(emp.pk), day_rule, 1 if first_punch else 0, missions.get(emp.pk))
+        rollup.employees += 1
+        counter = STATUS_COUNTER[status]; setattr(rollup, counter, getattr(rollup, counter) + 1)
+        if status == 'PRESENT':
+            offset = arrival_offset(day, day_rule, first_punch, employee_timezone(emp))
+            rollup.arrival_histogram[bisect_right(ARRIVAL_BUCKETS, offset)] += 1
+            if offset > 0: rollup.late += 1; rollup.late_minutes += offset
+    return list(groups.values())
+
+@transaction.atomic
+def refresh_rollups(day, site_ids):
+    """Replaces the rollups of `day` for these sites (None: employees without a site). Returns the number of rows written."""
+    written = 0
+    for site_id in set(site_ids):
+        employees = list(Employee.objects.filter(site_id=site_id).select_related('site'))
+        AttendanceRollup.objects.filter(date=day, site_id=site_id).delete()
+        written += len(AttendanceRollup.objects.bulk_create(day_rollups(day, employees)))
+    return written
+
+@transaction.atomic
+def refresh_employee_rollups(day, employee_ids):
+    """Replaces only the rollups of `day` that these employees count in, their (site, shift, manager) groups, for passes that
+    recomputed a few employees. Returns the number of rows written."""
+    employees = list(Employee.objects.filter(pk__in=employee_ids))
+    timeline = ShiftTimeline([emp.pk for emp in employees])
+    groups = {group for group in ((emp.site_id, timeline.shift_id(emp, day), emp.manager_id) for emp in employees) if group[1] is not None}
+    if not groups: return 0
+    teams = Q()
+    for site_id, manager_id in {(site_id, manager_id) for site_id, _, manager_id in groups}: teams |= Q(site_id=site_id, manager_id=manager_id)
+    candidates = list(Employee.objects.filter(teams).select_related('site')); timeline = ShiftTimeline([emp.pk for emp in candidates])
+    members = [emp for emp in candidates if (emp.site_id, timeline.shift_id(emp, day), emp.manager_id) in groups]
+    stale = Q()
+    for site_id, shift_id, manager_id in groups: stale |= Q(site_id=site_id, shift_id=shift_id, manager_id=manager_id)
+    AttendanceRollup.objects.filter(stale, date=day).delete()
+    return len(AttendanceRollup.objects.bulk_create(day_rollups(day, members)))
+
+# --- Reading ---
+
+GROUPINGS = {'organization': None, 'site': ('site_id', 'site__name'), 'shift': ('shift_id', 'shift__name'), 'manager': ('manager_id', 'manager__full_name')}
+
+def trend(rollups, group_by='organization'):
+    """Sums rollup rows into one series per group: per-date counters, period totals and the period's arrival histogram."""
+    key_field, label_field = GROUPINGS[group_by] or (None, None)
+    fields = ['date', *COUNTERS, 'arrival_histogram'] + ([key_field, label_field] if key_field else [])
+    series = {}
+    for row in rollups.order_by().values(*fields).iterator(chunk_size=5000):
+        key = row[key_field] if key_field else None
+        group = series.get(key)
+        if group is None: group = series[key] = {'key': key, 'label': row[label_field] if key_field else 'Organization', 'days': defaultdict(lambda: dict.fromkeys(COUNTERS, 0)), 'histogram': [0] * (len(ARRIVAL_BUCKETS) + 1)}
+        day = group['days'][row['date']]
+        for counter in COUNTERS: day[counter] += row[counter]
+        for index, count in enumerate(row['arrival_histogram']): group['histogram'][index] += count
+    result = []
+    for group in sorted(series.values(), key=lambda group: (group['label'] is None, group['label'] or '')):
+        totals = dict.fromkeys(COUNTERS, 0)
+        for counters in group['days'].values():
+            for counter in COUNTERS: totals[counter] += counters[counter]
+        result.append({
+            'key': group['key'], 'label': group['label'],
+            'days': [{'date': day.isoformat(), **counters} for day, counters in sorted(group['days'].items())],
+            'totals': totals, 'arrival_histogram': group['histogram'],
+        })
+    return result
\ No newline at end of file
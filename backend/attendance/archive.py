@@ -0,0 +1,147 @@
+"""Per-month columnar files for archived RawAttendanceLog rows.
+
+Layout (little-endian): a fixed header, a fixed-width index with one entry per employee code sorted by code, then one block
+per employee. A block holds three int64 columns of equal length: timestamps (epoch microseconds, ascending), terminal ids
+and device sequence numbers (0 when unknown). Compressed files delta-encode the timestamps and zlib each block; uncompressed
+files keep the raw columns so they can be cast straight out of the memory map without copying."""
+import array
+import datetime
+import mmap
+import os
+import struct
+import sys
+import zlib
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+
+MAGIC = b'PUNCHCOL'
+HEADER = struct.Struct('<8sHHIIQ4x')  # magic, year, month, flags, employee count, punch count
+CODE_BYTES = 50
+ENTRY = struct.Struct(f'<{CODE_BYTES}s6xqQQI4x')  # employee code (UTF-8, NUL-padded), employee id (0 if unknown), block offset, block length, punch count
+FLAG_COMPRESSED = 1
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_moving_rows = ContextVar('moving_rows', default=False)
+
+def archive_dir():
+    return Path(getattr(settings, 'PUNCH_ARCHIVE_DIR', settings.BASE_DIR / 'punch_archive'))
+
+def archive_path(year, month):
+    return archive_dir() / f"punches-{year:04d}-{month:02d}.pcol"
+
+def to_micros(timestamp): return (timestamp - _EPOCH) // datetime.timedelta(microseconds=1)
+def from_micros(micros): return _EPOCH + datetime.timedelta(microseconds=micros)
+
+def _encode_block(timestamps, terminals, sequences, compressed):
+    if compressed:
+        timestamps = [timestamps[0]] + [current - previous for previous, current in zip(timestamps, timestamps[1:])] if timestamps else []
+    payload = struct.pack(f'<{3 * len(terminals)}q', *timestamps, *terminals, *sequences)
+    return zlib.compress(payload, 6) if compressed else payload
+
+def write_month(path, year, month, rows, compressed=True):
+    """Writes `rows` of (employee_code, employee_id, timestamp, terminal_id, sequence), sorted by code then timestamp, to `path` atomically.
+
+    Returns the number of punches written. Raises ValueError, before anything is written, for a code longer than CODE_BYTES in
+    UTF-8: struct would silently cut it, and a non-ASCII code of 50 characters can take up to 200 bytes."""
+    blocks = []; current = None
+    for code, employee_id, timestamp, terminal_id, sequence in rows:
+        if current is None or current[0] != code:
+            size = len(code.encode('utf-8'))
+            if size > CODE_BYTES: raise ValueError(f"Employee code {code!r} takes {size} bytes in UTF-8; archive files hold at most {CODE_BYTES}.")
+            current = (code, employee_id or 0, [], [], []); blocks.append(current)
+        current[2].append(to_micros(timestamp)); current[3].append(terminal_id or 0); current[4].append(sequence or 0)
+    path = Path(path); path.parent.mkdir(parents=True, exist_ok=True); tmp_path = path.with_suffix('.tmp')
+    data_offset = HEADER.size + ENTRY.size * len(blocks); punch_count = 0
+    with open(tmp_path, 'wb') as handle:
+        handle.write(b'\0' * data_offset)
+        entries = []
+        for code, employee_id, timestamps, terminals, sequences in blocks:
+            payload = _encode_block(timestamps, terminals, sequences, compressed)
+            offset = handle.tell(); handle.write(payload); handle.write(b'\0' * (-len(payload) % 8))
+            entries.append(ENTRY.pack(code.encode('utf-8'), employee_id, offset, len(payload), len(timestamps))); punch_count += len(timestamps)
+        handle.seek(0)
+        handle.write(HEADER.pack(MAGIC, year, month, FLAG_COMPRESSED if compressed else 0, len(blocks), punch_count)); handle.write(b''.join(entries))
+        handle.flush(); os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+    return punch_count
+
+class PunchArchive:
+    """Read-only memory map over one month file. The index is searched in place; columns of uncompressed files are zero-copy views.
+
+    Views returned by `columns()` borrow the map: drop them before `close()`."""
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as handle: self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, self.year, self.month, flags, self.employee_count, self.punch_count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC: self.close(); raise ValueError(f"{self.path} is not a punch archive.")
+        self.compressed = bool(flags & FLAG_COMPRESSED)
+    def __enter__(self): return self
+    def __exit__(self, *exc_info): self.close()
+    def close(self):
+        if self._map is not None: self._view.release(); self._map.close(); self._map = None
+    def __len__(self): return self.employee_count
+    def _entry(self, index):
+        code, employee_id, offset, length, count = ENTRY.unpack_from(self._map, HEADER.size + index * ENTRY.size)
+        return code.rstrip(b'\0').decode('utf-8'), employee_id, offset, length, count
+    def _code_at(self, index):
+        start = HEADER.size + index * ENTRY.size
+        return bytes(self._view[start:start + CODE_BYTES]).rstrip(b'\0')
+    def employees(self):
+        """(employee_code, employee_id, punch_count) for every employee in the file, in code order."""
+        for index in range(self.employee_count):
+            code, employee_id, _, _, count = self._entry(index); yield code, employee_id, count
+    def find(self, employee_code):
+        key = employee_code.encode('utf-8')
+        index = bisect_left(range(self.employee_count), key, key=self._code_at)
+        return index if index < self.employee_count and self._code_at(index) == key else None
+    def columns(self, employee_code):
+        """(timestamps, terminal_ids, sequences) for one employee as int64 sequences, or None if the code is not archived here."""
+        index = self.find(employee_code)
+        if index is None: return None
+        _, _, offset, length, count = self._entry(index)
+        block = self._view[offset:offset + length]
+        if not self.compressed and sys.byteorder == 'little':
+            values = block.cast('q'); return values[:count], values[count:2 * count], values[2 * count:]
+        values = array.array('q', zlib.decompress(block) if self.compressed else block)
+        if sys.byteorder != 'little': values.byteswap()
+        if self.compressed:
+            for position in range(1, count): values[position] += values[position - 1]
+        return values[:count], values[count:2 * count], values[2 * count:]
+    def punches(self, employee_code, start=None, end=None):
+        """Aware UTC timestamps of one employee, optionally limited to start <= t < end."""
+        found = self.columns(employee_code)
+        if found is None: return []
+        timestamps = found[0]
+        low = 0 if start is None else bisect_left(timestamps, to_micros(start))
+        high = len(timestamps) if end is None else bisect_left(timestamps, to_micros(end))
+        result = [from_micros(timestamps[position]) for position in range(low, high)]
+        del timestamps, found
+        return result
+
+def month_bounds(year, month):
+    """Aware [start, end) of a calendar month in the project time zone."""
+    first = datetime.date(year, month, 1); following = (first + datetime.timedelta(days=32)).replace(day=1)
+    return timezone.make_aware(datetime.datetime.combine(first, datetime.time.min)), timezone.make_aware(datetime.datetime.combine(following, datetime.time.min))
+
+def archived_punches(employee_code, start, end, months):
+    """Archived timestamps of one employee in start <= t < end, read from the given (year, month) files."""
+    punches = []
+    for year, month in months:
+        path = archive_path(year, month)
+        if not path.exists(): continue
+        with PunchArchive(path) as archive: punches.extend(archive.punches(employee_code, start, end))
+    return punches
+
+@contextmanager
+def moving_rows():
+    """Rows deleted inside the block are moved to cold storage (a month file or a period snapshot), not deleted: the change feed
+    does not announce them, the ledger keeps what they posted and the punch summaries, which read the archive too, stay put."""
+    token = _moving_rows.set(True)
+    try: yield
+    finally: _moving_rows.reset(token)
+
+def rows_moving(): return _moving_rows.get()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import datetime
+from bisect import bisect_right
+from collections import defaultdict
+from django.utils import timezone
+from .models import Employee, ShiftAssignment, ShiftDayRule
+from .sites import employee_timezone
+
+# Effective date of the assignment that records an employee's shift from before assignments were tracked.
+EARLIEST = datetime.date(1970, 1, 1)
+
+class ShiftHistory:
+    """One employee's effective-dated shifts. Usable wherever a weekday -> ShiftDayRule mapping is (see intervals.rule_on),
+    but resolves the rule of the shift in force on each date. Lookups bisect the sorted start dates."""
+    __slots__ = ('starts', 'shift_ids', 'rules_by_shift')
+    def __init__(self, starts, shift_ids, rules_by_shift):
+        self.starts = starts; self.shift_ids = shift_ids; self.rules_by_shift = rules_by_shift
+    def shift_id_on(self, day):
+        if not self.starts: return None
+        # The first assignment also covers the days before it.
+        return self.shift_ids[max(bisect_right(self.starts, day) - 1, 0)]
+    def rules_on(self, day): return self.rules_by_shift.get(self.shift_id_on(day), {})
+    def on(self, day): return self.rules_on(day).get(day.weekday())
+    def shift_ids_between(self, start_date, end_date):
+        """Every shift in force at some point in the range."""
+        if not self.starts: return set()
+        first = max(bisect_right(self.starts, start_date) - 1, 0); last = max(bisect_right(self.starts, end_date) - 1, 0)
+        return set(self.shift_ids[first:last + 1])
+    @classmethod
+    def for_employee(cls, employee): return ShiftTimeline([employee.pk]).history(employee)
+
+class ShiftTimeline:
+    """Shift assignments of many employees loaded up front: one query for the assignments, one for the day rules of their shifts.
+    `employee_ids` may be a list or a values_list queryset; None loads everyone."""
+    def __init__(self, employee_ids=None):
+        assignments = ShiftAssignment.objects.all() if employee_ids is None else ShiftAssignment.objects.filter(employee_id__in=employee_ids)
+        self.starts = defaultdict(list); self.shift_ids = defaultdict(list); self.rules_by_shift = {}
+        for employee_id, effective_from, shift_id in assignments.order_by('employee_id', 'effective_from').values_list('employee_id', 'effective_from', 'shift_id'):
+            self.starts[employee_id].append(effective_from); self.shift_ids[employee_id].append(shift_id)
+        self.load_rules({shift_id for shift_ids in self.shift_ids.values() for shift_id in shift_ids})
+    def load_rules(self, shift_ids):
+        missing = {shift_id for shift_id in shift_ids if shift_id and shift_id not in self.rules_by_shift}
+        if not missing: return
+        for shift_id in missing: self.rules_by_shift[shift_id] = {}
+        for rule in ShiftDayRule.objects.filter(shift_id__in=missing).select_related('shift'): self.rules_by_shift[rule.shift_id][rule.day_of_week] = rule
+    def history(self, employee):
+        """Employees without any assignment (created before assignments were tracked) keep their current shift for every date."""
+        if self.starts.get(employee.pk): return ShiftHistory(self.starts[employee.pk], self.shift_ids[employee.pk], self.rules_by_shift)
+        if not employee.shift_id: return ShiftHistory([], [], self.rules_by_shift)
+        self.load_rules([employee.shift_id])
+        return ShiftHistory([datetime.date.min], [employee.shift_id], self.rules_by_shift)
+    def shift_id(self, employee, day): return self.history(employee).shift_id_on(day)
+
+def sync_current_shifts(employees, timeline=None):
+    """Points Employee.shift at the assignment in force today (in each employee's time zone), for assignments that took
+    effect since they were entered. Uses a queryset update, so no employee signals fire. Returns the number changed."""
+    timeline = timeline or ShiftTimeline([emp.pk for emp in employees]); changed = defaultdict(list)
+    for emp in employees:
+        if not timeline.starts.get(emp.pk): continue
+        shift_id = timeline.shift_id(emp, timezone.localdate(timezone=employee_timezone(emp)))
+        if shift_id != emp.shift_id: changed[shift_id].append(emp.pk); emp.shift_id = shift_id
+    for shift_id, employee_ids in changed.items(): Employee.objects.filter(pk__in=employee_ids).update(shift_id=shift_id)
+    return sum(len(employee_ids) for employee_ids in changed.values())
+
+def assign_from_today(employee, previous_shift_id):
+    """Turns a direct edit of Employee.shift into an assignment effective today in the employee's time zone. The first such
+    edit also records the previous shift, which otherwise would stop covering the days before today."""
+    assignments = ShiftAssignment.objects.filter(employee=employee)
+    if previous_shift_id and not assignments.exists(): ShiftAssignment.objects.bulk_create([ShiftAssignment(employee=employee, shift_id=previous_shift_id, effective_from=EARLIEST)])
+    return ShiftAssignment.objects.update_or_create(employee=employee, effective_from=timezone.localdate(timezone=employee_timezone(employee)), defaults={'shift_id': employee.shift_id})[0]
\ No newline at end of file
@@ -0,0 +1,73 @@
+from django.db import connections, transaction
+from .models import ChangeFeedEntry, Employee, OvertimeRequest, LeaveRequest, MissionRequest, ManualLogRequest, RawAttendanceLog, DailyAttendanceReport
+from .serializers import overtime_request_rows, leave_request_rows, mission_request_rows, manual_log_request_rows, raw_attendance_log_rows, daily_attendance_report_rows
+
+FEED_SOURCES = {
+    'overtime': (OvertimeRequest, overtime_request_rows), 'leave': (LeaveRequest, leave_request_rows),
+    'mission': (MissionRequest, mission_request_rows), 'logs': (ManualLogRequest, manual_log_request_rows),
+    'punch': (RawAttendanceLog, raw_attendance_log_rows), 'report': (DailyAttendanceReport, daily_attendance_report_rows),
+}
+KIND_BY_MODEL = {model: kind for kind, (model, _) in FEED_SOURCES.items()}
+
+def _employee_id(instance):
+    if isinstance(instance, RawAttendanceLog): return Employee.objects.filter(employee_code=instance.employee_code).values_list('id', flat=True).first()
+    return instance.employee_id
+
+def _stored_fields(model): return [field.attname for field in model._meta.concrete_fields if not getattr(field, 'auto_now', False)]
+
+def stored_values(instance):
+    """The row as stored before a save, for `record_change` to compare with; None for new rows."""
+    if instance.pk is None: return None
+    return type(instance).objects.filter(pk=instance.pk).values_list(*_stored_fields(type(instance))).first()
+
+def _lock_feed():
+    """Entry ids are the clients' cursors, and ids are handed out on insert, not on commit: an entry still uncommitted below a
+    cursor a client has already passed would never reach it. Like the ledger's snapshot, feed writers therefore take turns:
+    the table lock holds other writers (not readers) off from a transaction's first entry until it commits. SQLite has a
+    single writer, so entries there always commit in id order."""
+    connection = connections[ChangeFeedEntry.objects.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor: cursor.execute(f"LOCK TABLE {ChangeFeedEntry._meta.db_table} IN EXCLUSIVE MODE")
+
+def record_change(instance, deleted=False, previous=None):
+    """A feed entry for a saved or deleted row. A save that left the row as `previous` (see `stored_values`) is not announced."""
+    if not deleted and previous is not None and previous == tuple(getattr(instance, name) for name in _stored_fields(type(instance))): return None
+    employee_id = _employee_id(instance)
+    if employee_id is None: return None
+    with transaction.atomic():
+        _lock_feed()
+        return ChangeFeedEntry.objects.create(employee_id=employee_id, kind=KIND_BY_MODEL[type(instance)], object_id=instance.pk, action=ChangeFeedEntry.ACTION_DELETE if deleted else ChangeFeedEntry.ACTION_UPSERT)
+
+def record_changes(instances):
+    """Feed entries for rows inserted with bulk_create, which sends no signals. Punch employees are resolved in one query."""
+    codes = {instance.employee_code for instance in instances if isinstance(instance, RawAttendanceLog)}
+    employee_ids_by_code = dict(Employee.objects.filter(employee_code__in=codes).values_list('employee_code', 'id')) if codes else {}
+    entries = []
+    for instance in instances:
+        employee_id = employee_ids_by_code.get(instance.employee_code) if isinstance(instance, RawAttendanceLog) else instance.employee_id
+        if employee_id is not None: entries.append(ChangeFeedEntry(employee_id=employee_id, kind=KIND_BY_MODEL[type(instance)], object_id=instance.pk))
+    with transaction.atomic():
+        _lock_feed(); ChangeFeedEntry.objects.bulk_create(entries)
+
+def latest_cursor(employee_ids):
+    return ChangeFeedEntry.objects.filter(employee_id__in=employee_ids).order_by('-id').values_list('id', flat=True).first() or 0
+
+def read_changes(employee_ids, cursor, limit):
+    """Changes after `cursor` for these employees, oldest first. An object changed several times in the page is returned once, at its last position, with its current row."""
+    entries = list(ChangeFeedEntry.objects.filter(employee_id__in=employee_ids, id__gt=cursor).order_by('id').values_list('id', 'employee_id', 'kind', 'object_id', 'action')[:limit + 1])
+    has_more = len(entries) > limit; entries = entries[:limit]
+    latest = {}
+    for entry in entries: latest.pop((entry[2], entry[3]), None); latest[entry[2], entry[3]] = entry
+    upserted = {}
+    for entry_id, employee_id, kind, object_id, action in latest.values():
+        if action == ChangeFeedEntry.ACTION_UPSERT: upserted.setdefault(kind, []).append(object_id)
+    rows = {}
+    for kind, object_ids in upserted.items():
+        model, row_serializer = FEED_SOURCES[kind]
+        rows.update({(kind, row['id']): row for row in row_serializer.serialize(model.objects.filter(id__in=object_ids))})
+    changes = []
+    for entry_id, employee_id, kind, object_id, action in latest.values():
+        row = rows.get((kind, object_id))
+        # An upsert whose row is gone was deleted by a later change beyond this page.
+        changes.append({"cursor": entry_id, "kind": kind, "id": object_id, "employee_id": employee_id, "action": action if row is not None else ChangeFeedEntry.ACTION_DELETE, "data": row})
+    return {"cursor": entries[-1][0] if entries else cursor, "has_more": has_more, "changes": changes}
\ No newline at end of file
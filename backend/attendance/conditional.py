@@ -0,0 +1,49 @@
+import hashlib
+from collections import namedtuple
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+VersionStamp = namedtuple('VersionStamp', ['count', 'last_id', 'last_modified'])
+
+def version_stamp(queryset):
+    """Count, highest id and newest `updated_at` of a queryset: one indexed aggregate that changes on insert, update and delete.
+    The id covers a delete plus an insert within one tick of the clock, which leave the count and the newest timestamp as they were."""
+    aggregate = queryset.aggregate(count=Count('pk'), last_id=Max('pk'), last_modified=Max('updated_at'))
+    return VersionStamp(aggregate['count'], aggregate['last_id'], aggregate['last_modified'])
+
+def team_ids(manager_employee):
+    return list(manager_employee.subordinates.values_list('id', flat=True)) + [manager_employee.id]
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+class ConditionalGetMixin:
+    """Answers GET with a strong ETag built by `get_version_parts`, returning 304 before the handler runs.
+
+    `get_version_parts` runs after authentication and permission checks and must only use cheap
+    stamp queries. Returning None skips conditional handling, e.g. when the handler will error."""
+    def get_version_parts(self, request): raise NotImplementedError
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.version_etag = None; self.version_last_modified = None
+        if request.method != 'GET': return
+        parts = self.get_version_parts(request)
+        if parts is None: return
+        self.version_etag = quote_etag(hashlib.sha1(repr([request.user.pk, request.get_full_path(), *parts]).encode()).hexdigest())
+        modified = [part.last_modified for part in parts if isinstance(part, VersionStamp) and part.last_modified]
+        self.version_last_modified = max(modified) if modified else None
+        if get_conditional_response(request._request, etag=self.version_etag) is not None: raise NotModified()
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified): return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'version_etag', None) and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = self.version_etag
+            if self.version_last_modified: response['Last-Modified'] = http_date(self.version_last_modified.timestamp())
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
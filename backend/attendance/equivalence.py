@@ -0,0 +1,227 @@
+"""Differential checks between the reference attendance calculation and alternative engines.
+
+An engine is a callable `engine(day, employees, global_settings)` returning {employee_id: report fields} for the reports it
+would write on `day` (an employee with no report is simply absent). Optional attribute `fields` lists the report fields it
+produces; the rest are not compared. A missing report compares as EMPTY_REPORT, since payroll sums nothing for it."""
+import datetime
+import math
+import random
+from collections import namedtuple
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import (
+    Employee, WorkShift, ShiftDayRule, ShiftAssignment, RawAttendanceLog, DailyAttendanceReport, DailyPunchSummary, OvertimeRequest, LeaveRequest, MissionRequest, Holiday, Site
+)
+from .assignments import EARLIEST, ShiftHistory, sync_current_shifts
+from .intervals import load_punches
+from .recompute import REPORT_FIELDS
+from .reports import iter_dates
+from .simulation import PeriodInputs
+from .sites import employee_timezone
+from .summaries import rebuild_summaries
+
+PAYROLL_FIELDS = ('penalty_minutes', 'work_shortfall_minutes', 'work_overtime_minutes', 'required_work_minutes_today')
+EMPTY_REPORT = {'first_check_in': None, 'last_check_out': None, 'total_lateness_minutes': 0, 'penalty_minutes': 0.0, 'required_work_minutes_today': 0.0, 'total_worked_minutes': 0, 'work_shortfall_minutes': 0, 'work_overtime_minutes': 0, 'has_unmatched_punch': False}
+Divergence = namedtuple('Divergence', 'engine employee_id date field expected actual')
+
+def _span(start_time, end_time):
+    return int((datetime.datetime.combine(datetime.date.min, end_time) - datetime.datetime.combine(datetime.date.min, start_time)).total_seconds() / 60)
+
+# --- Frozen reference ---
+# The per-employee logic of process_attendance (run_full_calculation / process_off_day_logic) kept verbatim in behaviour and
+# deliberately naive: one query per fact, its own shift lookup, work-day cut and pairing over the raw log. It shares no code with
+# the engines (attendance.intervals, assignments, summaries), so a bug there cannot show up on both sides and cancel out.
+# Do not optimise it; it is what others are checked against.
+
+def reference_rule(emp, day):
+    """The day rule of the shift assigned on `day` (the first assignment also covers the days before it); the employee's
+    current shift when no assignment was ever recorded."""
+    assignments = ShiftAssignment.objects.filter(employee=emp)
+    if assignments.exists(): shift_id = (assignments.filter(effective_from__lte=day).order_by('-effective_from').first() or assignments.order_by('effective_from').first()).shift_id
+    else: shift_id = emp.shift_id
+    return ShiftDayRule.objects.filter(shift_id=shift_id, day_of_week=day.weekday()).first() if shift_id else None
+
+def reference_cutoff(emp, day):
+    """When work day `day` hands over to the next one: midnight, or for an overnight shift halfway between its end and the next
+    day's start (its end when the next start comes first)."""
+    rule = reference_rule(emp, day); next_day = day + datetime.timedelta(days=1); cutoff = datetime.time.min
+    if rule and rule.is_work_day and rule.end_time <= rule.start_time:
+        next_rule = reference_rule(emp, next_day)
+        next_start = next_rule.start_time if next_rule and next_rule.is_work_day else rule.start_time
+        end_minutes = rule.end_time.hour * 60 + rule.end_time.minute; start_minutes = next_start.hour * 60 + next_start.minute
+        cutoff_minutes = (end_minutes + start_minutes) // 2 if start_minutes > end_minutes else end_minutes
+        cutoff = datetime.time(cutoff_minutes // 60, cutoff_minutes % 60)
+    return timezone.make_aware(datetime.datetime.combine(next_day, cutoff))
+
+def reference_punches(emp, today):
+    """The punches of one work day read from RawAttendanceLog, by time."""
+    return list(RawAttendanceLog.objects.filter(employee_code=emp.employee_code, timestamp__gte=reference_cutoff(emp, today - datetime.timedelta(days=1)), timestamp__lt=reference_cutoff(emp, today)).order_by('timestamp').values_list('timestamp', flat=True))
+
+def reference_report(emp, today, day_rule, global_settings, holiday):
+    """The report fields process_attendance writes for one employee-day, or None when it writes none."""
+    if holiday or (day_rule is not None and not day_rule.is_work_day):
+        logs = reference_punches(emp, today)
+        if not logs: return None
+        span = int((logs[-1] - logs[0]).total_seconds() / 60)
+        has_ot_approval = OvertimeRequest.objects.filter(employee=emp, date=today, status=OvertimeRequest.STATUS_APPROVED).exists()
+        return {'first_check_in': timezone.localtime(logs[0]).time(), 'last_check_out': timezone.localtime(logs[-1]).time(), 'has_unmatched_punch': len(logs) % 2 == 1, 'total_lateness_minutes': 0, 'penalty_minutes': 0, 'required_work_minutes_today': 0, 'total_worked_minutes': span, 'work_shortfall_minutes': 0, 'work_overtime_minutes': span if has_ot_approval else 0}
+    if day_rule is None: return None
+    if LeaveRequest.objects.filter(employee=emp, date=today, status=LeaveRequest.STATUS_APPROVED, leave_type=LeaveRequest.TYPE_FULL_DAY).exists(): return None
+    if MissionRequest.objects.filter(employee=emp, date=today, status=MissionRequest.STATUS_APPROVED, mission_type=MissionRequest.TYPE_FULL_DAY).exists():
+        return {'total_worked_minutes': day_rule.required_work_minutes, 'required_work_minutes_today': day_rule.required_work_minutes, 'work_shortfall_minutes': 0, 'work_overtime_minutes': 0, 'total_lateness_minutes': 0, 'penalty_minutes': 0}
+    logs = reference_punches(emp, today)
+    if not logs:
+        return {'work_shortfall_minutes': day_rule.required_work_minutes, 'required_work_minutes_today': day_rule.required_work_minutes, 'first_check_in': None, 'last_check_out': None, 'has_unmatched_punch': False}
+    first_log = timezone.localtime(logs[0]); last_log = timezone.localtime(logs[-1])
+    shift_start_minutes = day_rule.start_time.hour * 60 + day_rule.start_time.minute
+    arrival_minutes = (first_log.date() - today).days * 24 * 60 + first_log.hour * 60 + first_log.minute
+    lateness = arrival_minutes - shift_start_minutes if arrival_minutes > shift_start_minutes else 0
+    penalty = float(lateness) * float(global_settings.penalty_rate) if arrival_minutes > shift_start_minutes + global_settings.grace_period_minutes else 0
+    leave = LeaveRequest.objects.filter(employee=emp, date=today, status=LeaveRequest.STATUS_APPROVED, leave_type=LeaveRequest.TYPE_HOURLY).first()
+    leave_minutes = _span(leave.start_time, leave.end_time) if leave and leave.start_time and leave.end_time else 0
+    presence = 0
+    for log_in, log_out in zip(logs[::2], logs[1::2]): presence += int((log_out - log_in).total_seconds() / 60)
+    mission = MissionRequest.objects.filter(employee=emp, date=today, status=MissionRequest.STATUS_APPROVED, mission_type=MissionRequest.TYPE_HOURLY).first()
+    mission_minutes = _span(mission.start_time, mission.end_time) if mission and mission.start_time and mission.end_time else 0
+    worked = presence + mission_minutes
+    required = float(day_rule.required_work_minutes) + penalty - leave_minutes
+    balance = worked - required; shortfall = 0; overtime = 0
+    if balance < 0: shortfall = abs(balance)
+    elif balance > 0 and OvertimeRequest.objects.filter(employee=emp, date=today, status=OvertimeRequest.STATUS_APPROVED).exists(): overtime = balance
+    return {'first_check_in': first_log.time(), 'last_check_out': last_log.time(), 'has_unmatched_punch': len(logs) % 2 == 1, 'total_lateness_minutes': lateness, 'penalty_minutes': penalty, 'required_work_minutes_today': required, 'total_worked_minutes': worked, 'work_shortfall_minutes': shortfall, 'work_overtime_minutes': overtime}
+
+def reference_engine(day, employees, global_settings):
+    holiday = Holiday.objects.filter(date=day).exists(); reports = {}
+    for emp in employees:
+        with timezone.override(employee_timezone(emp)): report = reference_report(emp, day, reference_rule(emp, day), global_settings, holiday)
+        if report is not None: reports[emp.pk] = report
+    return reports
+
+# --- Engines under test ---
+
+def process_attendance_engine(day, employees, global_settings):
+    """The live command, writing real rows (the harness rolls them back) that are read back afterwards."""
+    from .management.commands.process_attendance import Command
+    ids = [emp.pk for emp in employees]
+    DailyAttendanceReport.objects.filter(date=day, employee_id__in=ids).delete()
+    command = Command(); command.verbosity = 0
+    command.recompute_employees(day, ids, global_settings)
+    return {row['employee_id']: row for row in DailyAttendanceReport.objects.filter(date=day, employee_id__in=ids).values('employee_id', *REPORT_FIELDS)}
+
+def simulation_engine(day, employees, global_settings):
+    """The policy simulator scored over a one-day period. It reports totals only, so an all-zero total stands for no report."""
+    period = PeriodInputs(day, day, Employee.objects.filter(id__in=[emp.pk for emp in employees]))
+    reports = {}
+    for employee_id, total in period.score(period.current_policy()).items():
+        report = {'total_lateness_minutes': total['lateness_minutes'], 'penalty_minutes': total['penalty_minutes'], 'required_work_minutes_today': total['required_minutes'], 'total_worked_minutes': total['worked_minutes'], 'work_shortfall_minutes': total['shortfall_minutes'], 'work_overtime_minutes': total['overtime_minutes']}
+        if any(report.values()): reports[employee_id] = report
+    return reports
+simulation_engine.fields = ('total_lateness_minutes', 'penalty_minutes', 'required_work_minutes_today', 'total_worked_minutes', 'work_shortfall_minutes', 'work_overtime_minutes')
+
+ENGINES = {'process_attendance': process_attendance_engine, 'simulation': simulation_engine}
+
+# --- Comparison ---
+
+def normalise(report):
+    """Full report values as stored: missing reports become EMPTY_REPORT, omitted fields take the model default, values are cast like the database would."""
+    if report is None: return dict(EMPTY_REPORT)
+    normalised = {}
+    for name in REPORT_FIELDS:
+        field = DailyAttendanceReport._meta.get_field(name)
+        normalised[name] = field.to_python(report[name] if name in report else field.get_default())
+    return normalised
+
+def same(expected, actual):
+    if isinstance(expected, float) or isinstance(actual, float): return actual is not None and expected is not None and math.isclose(expected, actual, abs_tol=1e-6)
+    return expected == actual
+
+def compare_engines(start, end, employees, global_settings, engines, fields=REPORT_FIELDS):
+    """Runs the reference and every engine day by day. Returns (divergences, employee_days checked)."""
+    employees = list(employees); divergences = []; checked = 0
+    for day in iter_dates(start, end):
+        expected = reference_engine(day, employees, global_settings)
+        for name, engine in engines.items():
+            actual = engine(day, employees, global_settings)
+            engine_fields = [field for field in fields if field in getattr(engine, 'fields', REPORT_FIELDS)]
+            for emp in employees:
+                want = normalise(expected.get(emp.pk)); got = normalise(actual.get(emp.pk))
+                divergences.extend(Divergence(name, emp.pk, day, field, want[field], got[field]) for field in engine_fields if not same(want[field], got[field]))
+        checked += len(employees)
+    return divergences, checked
+
+def day_inputs(employee_id, day, global_settings):
+    """Everything the calculation reads for one employee-day, for reporting a divergence."""
+    emp = Employee.objects.select_related('site').get(pk=employee_id); rules = ShiftHistory.for_employee(emp); rule = rules.on(day)
+    requests = {}
+    for label, model in (('overtime', OvertimeRequest), ('leave', LeaveRequest), ('mission', MissionRequest)):
+        requests[label] = list(model.objects.filter(employee=emp, date=day).values(*[field for field in ('status', 'leave_type', 'mission_type', 'start_time', 'end_time', 'requested_minutes') if hasattr(model, field)]))
+    summary = DailyPunchSummary.objects.filter(employee=emp, date=day).values('punch_count', 'presence_minutes', 'has_unmatched_punch').first()
+    with timezone.override(employee_timezone(emp)): punches = [timezone.localtime(timestamp).isoformat() for timestamp in load_punches(emp.employee_code, day, day, rules)]
+    return {
+        'employee': f"{emp.full_name} ({emp.employee_code})", 'date': day.isoformat(), 'shift': rule.shift.name if rule else None, 'site': str(emp.site) if emp.site else None,
+        'rule': {field: getattr(rule, field) for field in ('is_work_day', 'start_time', 'end_time', 'required_work_minutes')} if rule else None,
+        'holiday': Holiday.objects.filter(date=day).values_list('name', flat=True).first(),
+        'grace_period_minutes': global_settings.grace_period_minutes, 'penalty_rate': float(global_settings.penalty_rate),
+        'punches': punches,
+        'summary': summary, 'requests': requests,
+    }
+
+# --- Generated datasets ---
+
+def generate_dataset(seed, employee_count, start, end, global_settings):
+    """Creates a reproducible random population over [start, end]: sites in several time zones, daytime and overnight shifts
+    (some with missing rules), punch patterns from absent to unmatched, requests in every status, holidays and a random policy. Call inside a
+    transaction that is rolled back. Returns the generated employees."""
+    rng = random.Random(seed); prefix = f"eq{seed}"
+    global_settings.grace_period_minutes = rng.choice([0, 5, 15, 30, 90]); global_settings.penalty_rate = rng.choice(['1.00', '1.40', '2.00']); global_settings.save()
+    shifts = []
+    for index in range(3):
+        shift = WorkShift.objects.create(name=f"{prefix}-shift-{index}"); overnight = index == 2
+        for weekday in range(7):
+            if index == 1 and weekday == 6: continue  # a shift without a Sunday rule
+            start_time = datetime.time(22, 0) if overnight else datetime.time(rng.choice([7, 8, 9]), rng.choice([0, 30]))
+            end_time = datetime.time(6, 0) if overnight else datetime.time(17, 0)
+            ShiftDayRule.objects.create(shift=shift, day_of_week=weekday, is_work_day=weekday < 5 or rng.random() < 0.2, start_time=start_time, end_time=end_time, required_work_minutes=480 if overnight else rng.choice([450, 480, 525]))
+        shifts.append(shift)
+    for day in iter_dates(start, end):
+        if rng.random() < 0.07: Holiday.objects.get_or_create(date=day, defaults={'name': f"{prefix} holiday"})
+    sites = [None] + [Site.objects.create(name=f"{prefix}-site-{zone}", timezone=zone) for zone in ('Asia/Tehran', 'America/New_York', 'Pacific/Auckland')]
+    employees = [Employee.objects.create(full_name=f"{prefix} employee {index}", employee_code=f"{prefix}-{index}", shift=rng.choice(shifts), site=rng.choice(sites)) for index in range(employee_count)]
+    # Some employees change shift (or lose it) part-way through the period.
+    days = list(iter_dates(start, end)); assignments = [ShiftAssignment(employee=emp, shift=emp.shift, effective_from=EARLIEST) for emp in employees]
+    assignments += [ShiftAssignment(employee=emp, shift=rng.choice(shifts + [None]), effective_from=rng.choice(days[1:] or days)) for emp in employees if rng.random() < 0.3]
+    ShiftAssignment.objects.bulk_create(assignments); sync_current_shifts(employees)
+    punches = []; requests = {OvertimeRequest: [], LeaveRequest: [], MissionRequest: []}
+    status = lambda: rng.choice([OvertimeRequest.STATUS_APPROVED, OvertimeRequest.STATUS_APPROVED, OvertimeRequest.STATUS_PENDING, OvertimeRequest.STATUS_REJECTED])
+    for emp in employees:
+        rules = ShiftHistory.for_employee(emp)
+        for day in iter_dates(start, end):
+            rule = rules.on(day); start_time = rule.start_time if rule else datetime.time(8, 0)
+            shift_start = timezone.make_aware(datetime.datetime.combine(day, start_time), employee_timezone(emp))
+            if rng.random() > 0.1:
+                arrival = shift_start + datetime.timedelta(minutes=rng.randint(-30, 150), seconds=rng.randint(0, 59))
+                times = [arrival]; pattern = rng.random()
+                if pattern < 0.3: times.append(arrival + datetime.timedelta(minutes=rng.randint(180, 260))); times.append(times[-1] + datetime.timedelta(minutes=rng.randint(20, 60)))
+                if pattern > 0.08: times.append(times[-1] + datetime.timedelta(minutes=rng.randint(200, 600), seconds=rng.randint(0, 59)))
+                punches.extend(RawAttendanceLog(employee_code=emp.employee_code, timestamp=timestamp) for timestamp in times)
+            if rng.random() < 0.15: requests[OvertimeRequest].append(OvertimeRequest(employee=emp, date=day, requested_minutes=rng.randint(30, 180), status=status()))
+            if rng.random() < 0.1:
+                hourly = rng.random() < 0.6; begin = rng.randint(9, 14)
+                model = rng.choice([LeaveRequest, MissionRequest]); type_field = 'leave_type' if model is LeaveRequest else 'mission_type'
+                requests[model].append(model(employee=emp, date=day, status=status(), **{type_field: model.TYPE_HOURLY if hourly else model.TYPE_FULL_DAY}, start_time=datetime.time(begin) if hourly else None, end_time=datetime.time(begin + rng.randint(1, 3)) if hourly else None))
+    RawAttendanceLog.objects.bulk_create(punches, batch_size=2000)
+    for model, rows in requests.items(): model.objects.bulk_create(rows, batch_size=2000)
+    for emp in employees: rebuild_summaries(emp, start - datetime.timedelta(days=1), end + datetime.timedelta(days=1))
+    return employees
+
+def run_check(start, end, engines, global_settings, seed=None, employee_count=0, employees=None):
+    """Generates (when `seed` is given) or uses existing data, compares, and rolls every write back."""
+    with transaction.atomic():
+        if seed is not None: employees = generate_dataset(seed, employee_count, start, end, global_settings)
+        elif employees is None: employees = Employee.objects.filter(Q(shift__isnull=False) | Q(shift_assignments__shift__isnull=False)).distinct()
+        employees = list(employees.select_related('site') if hasattr(employees, 'select_related') else employees)
+        divergences, checked = compare_engines(start, end, employees, global_settings, engines)
+        first = day_inputs(divergences[0].employee_id, divergences[0].date, global_settings) if divergences else None
+        transaction.set_rollback(True)
+    return divergences, checked, first
\ No newline at end of file
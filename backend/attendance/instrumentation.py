@@ -0,0 +1,45 @@
+import logging
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Phases timed explicitly. 'calculation' is not timed itself: it is each employee's time minus the phases nested inside it.
+PHASES = ('settings', 'holidays', 'summaries', 'rules', 'punches', 'requests', 'calculation', 'write', 'rollups', 'checkpoint')
+
+class RunProfile:
+    """Phase timers and counters for one process_attendance run, cheap enough to stay on in production."""
+    def __init__(self, slow_ms=250):
+        self.slow_seconds = slow_ms / 1000; self.started = time.perf_counter(); self.finished = None
+        self.seconds = defaultdict(float); self.calls = Counter(); self.counters = Counter()
+        self.slow_employees = []; self._employee = None
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try: yield
+        finally: self.seconds[name] += time.perf_counter() - started; self.calls[name] += 1
+    @contextmanager
+    def employee(self, emp, day):
+        """Times one employee-day. Nested calls (a weekend handled through the off-day path) count once."""
+        if self._employee is not None: yield; return
+        self._employee = emp; started = time.perf_counter(); phases_before = sum(self.seconds.values())
+        try: yield
+        finally:
+            elapsed = time.perf_counter() - started; self._employee = None
+            self.seconds['calculation'] += max(elapsed - (sum(self.seconds.values()) - phases_before), 0); self.calls['calculation'] += 1
+            self.counters['employee_days'] += 1
+            if elapsed >= self.slow_seconds:
+                self.slow_employees.append({'employee_id': emp.pk, 'date': day.isoformat(), 'ms': round(elapsed * 1000, 1)})
+                logger.warning("Slow employee-day: %s (%s) on %s took %.0f ms.", emp.full_name, emp.pk, day, elapsed * 1000)
+    def count(self, name, amount=1): self.counters[name] += amount
+    def finish(self): self.finished = time.perf_counter()
+    def summary(self, **extra):
+        elapsed = (self.finished or time.perf_counter()) - self.started; employee_days = self.counters['employee_days']
+        return {
+            **extra, 'elapsed_seconds': round(elapsed, 3), 'employee_days': employee_days,
+            'employee_days_per_second': round(employee_days / elapsed, 1) if elapsed else None,
+            'phases': {name: {'seconds': round(self.seconds[name], 4), 'calls': self.calls[name]} for name in PHASES if self.calls[name]},
+            'counters': dict(self.counters),
+            'slow_employees': sorted(self.slow_employees, key=lambda row: -row['ms'])[:50], 'slow_threshold_ms': round(self.slow_seconds * 1000),
+        }
\ No newline at end of file
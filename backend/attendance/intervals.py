@@ -0,0 +1,114 @@
+import datetime
+import struct
+from collections import Counter, namedtuple
+from django.utils import timezone
+from .models import RawAttendanceLog, ArchivedMonth
+from .archive import archived_punches
+
+Interval = namedtuple('Interval', ['check_in', 'check_out', 'minutes'])
+
+class PunchSummary:
+    """Accumulates a sorted punch stream for one work day in a single pass.
+
+    Punches alternate IN/OUT. A trailing IN without its OUT is kept in
+    `unmatched_punch` instead of being silently dropped."""
+    __slots__ = ('punches', 'intervals', 'presence_minutes', 'unmatched_punch')
+    def __init__(self):
+        self.punches = []; self.intervals = []; self.presence_minutes = 0; self.unmatched_punch = None
+    def add(self, timestamp):
+        self.punches.append(timestamp)
+        if self.unmatched_punch is None: self.unmatched_punch = timestamp; return
+        minutes = int((timestamp - self.unmatched_punch).total_seconds() / 60)
+        self.intervals.append(Interval(self.unmatched_punch, timestamp, minutes)); self.presence_minutes += minutes; self.unmatched_punch = None
+    @property
+    def count(self): return len(self.punches)
+    @property
+    def first(self): return self.punches[0] if self.punches else None
+    @property
+    def last(self): return self.punches[-1] if self.punches else None
+    @property
+    def has_unmatched_punch(self): return self.unmatched_punch is not None
+    @property
+    def span_minutes(self):
+        if len(self.punches) < 2: return 0
+        return int((self.punches[-1] - self.punches[0]).total_seconds() / 60)
+
+def pair_punches(timestamps):
+    summary = PunchSummary()
+    for ts in timestamps: summary.add(ts)
+    return summary
+
+def _minutes(t): return t.hour * 60 + t.minute
+
+def is_overnight(day_rule):
+    return bool(day_rule and day_rule.is_work_day and day_rule.end_time <= day_rule.start_time)
+
+def rule_on(rules_by_weekday, day):
+    """The day rule in force on `day`. `rules_by_weekday` is either one shift's weekday mapping or a ShiftHistory,
+    whose shift can change from one date to the next."""
+    if hasattr(rules_by_weekday, 'on'): return rules_by_weekday.on(day)
+    return rules_by_weekday.get(day.weekday())
+
+def day_cutoff(day, rules_by_weekday):
+    """Aware datetime at which the work day `day` closes and the next one opens.
+
+    Daytime shifts close at midnight, exactly like `timestamp__date` bucketing.
+    An overnight shift closes halfway between its end time and the next shift start
+    on the following calendar day, so its early-morning punches stay on the day it began."""
+    next_day = day + datetime.timedelta(days=1)
+    day_rule = rule_on(rules_by_weekday, day)
+    cutoff = datetime.time.min
+    if is_overnight(day_rule):
+        next_rule = rule_on(rules_by_weekday, next_day)
+        next_start = next_rule.start_time if next_rule and next_rule.is_work_day else day_rule.start_time
+        end_minutes = _minutes(day_rule.end_time); start_minutes = _minutes(next_start)
+        cutoff_minutes = (end_minutes + start_minutes) // 2 if start_minutes > end_minutes else end_minutes
+        cutoff = datetime.time(cutoff_minutes // 60, cutoff_minutes % 60)
+    return timezone.make_aware(datetime.datetime.combine(next_day, cutoff))
+
+def work_day_window(day, rules_by_weekday):
+    return day_cutoff(day - datetime.timedelta(days=1), rules_by_weekday), day_cutoff(day, rules_by_weekday)
+
+def work_range_window(start_date, end_date, rules_by_weekday):
+    return work_day_window(start_date, rules_by_weekday)[0], work_day_window(end_date, rules_by_weekday)[1]
+
+def iter_work_days(timestamps, start_date, end_date, rules_by_weekday):
+    """Yields (date, PunchSummary) for every day in the range from one pass over sorted timestamps."""
+    punches = iter(timestamps); pending = next(punches, None)
+    window_start = work_day_window(start_date, rules_by_weekday)[0]
+    while pending is not None and pending < window_start: pending = next(punches, None)
+    current_day = start_date
+    while current_day <= end_date:
+        window_end = day_cutoff(current_day, rules_by_weekday); summary = PunchSummary()
+        while pending is not None and pending < window_end:
+            summary.add(pending); pending = next(punches, None)
+        yield current_day, summary
+        current_day += datetime.timedelta(days=1)
+
+def work_date_for(timestamp, rules_by_weekday):
+    day = timezone.localtime(timestamp).date()
+    if timestamp < work_day_window(day, rules_by_weekday)[0]: return day - datetime.timedelta(days=1)
+    return day
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+def pack_punches(timestamps):
+    """Packs aware timestamps as little-endian int64 microseconds since the epoch (8 bytes per punch)."""
+    micros = [(ts - _EPOCH) // datetime.timedelta(microseconds=1) for ts in timestamps]
+    return struct.pack(f'<{len(micros)}q', *micros)
+
+def unpack_punches(packed):
+    packed = bytes(packed or b'')
+    return [_EPOCH + datetime.timedelta(microseconds=value) for value in struct.unpack(f'<{len(packed) // 8}q', packed)]
+
+def load_punches(employee_code, start_date, end_date, rules_by_weekday):
+    window_start, window_end = work_range_window(start_date, end_date, rules_by_weekday)
+    punches = list(RawAttendanceLog.objects.filter(employee_code=employee_code, timestamp__gte=window_start, timestamp__lt=window_end).order_by('timestamp').values_list('timestamp', flat=True))
+    archived_months = list(ArchivedMonth.objects.filter(period_start__lt=window_end, period_end__gt=window_start).values_list('year', 'month'))
+    # Live rows of an archived month are late punches or, after `archive_punches --keep-rows`, copies of archived ones: each counts once.
+    if archived_months: punches = sorted((Counter(punches) | Counter(archived_punches(employee_code, window_start, window_end, archived_months))).elements())
+    return punches
+
+def shift_rules_by_weekday(shift):
+    if not shift: return {}
+    return {rule.day_of_week: rule for rule in shift.day_rules.all()}
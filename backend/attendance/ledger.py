@@ -0,0 +1,85 @@
+import datetime
+from django.db import connections, transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+from .models import BalanceMovement, BalanceSnapshot, DailyAttendanceReport, Employee, LeaveRequest
+from .assignments import ShiftHistory
+
+# --- Posting: every source keeps its movements summing to what it currently contributes ---
+
+def _post(employee_id, account, source, date, target, source_id=None, note=''):
+    """Appends the difference between what the source contributes now, `target()`, and what it already posted; never rewrites
+    earlier movements. The employee row is locked first (a deleted source has no row left to lock) and `target` reads the
+    source from the database inside the lock, so concurrent saves of one source cannot post the same difference twice."""
+    with transaction.atomic():
+        list(Employee.objects.select_for_update().filter(pk=employee_id).values_list('pk', flat=True))
+        target_minutes = target()
+        posted = BalanceMovement.objects.filter(employee_id=employee_id, account=account, source=source, date=date, source_id=source_id).aggregate(total=Sum('minutes'))['total'] or 0
+        if target_minutes != posted:
+            return BalanceMovement.objects.create(employee_id=employee_id, account=account, source=source, source_id=source_id, date=date, minutes=target_minutes - posted, note=note)
+    return None
+
+def post_report(report, deleted=False):
+    """Approved overtime of a computed day is credited to the overtime bank."""
+    def target():
+        if deleted: return 0
+        return DailyAttendanceReport.objects.filter(employee_id=report.employee_id, date=report.date).values_list('work_overtime_minutes', flat=True).first() or 0
+    return _post(report.employee_id, BalanceMovement.ACCOUNT_OVERTIME, BalanceMovement.SOURCE_REPORT, report.date, target)
+
+def leave_minutes(leave):
+    if leave.leave_type == LeaveRequest.TYPE_HOURLY:
+        if not (leave.start_time and leave.end_time): return 0
+        return int((datetime.datetime.combine(leave.date, leave.end_time) - datetime.datetime.combine(leave.date, leave.start_time)).total_seconds() / 60)
+    rule = ShiftHistory.for_employee(leave.employee).on(leave.date)
+    return rule.required_work_minutes if rule and rule.is_work_day else 0
+
+def post_leave_request(leave, deleted=False):
+    """Approved leave is debited from the leave balance; rejecting or deleting it afterwards credits it back."""
+    def target():
+        current = None if deleted else LeaveRequest.objects.filter(pk=leave.pk).select_related('employee').first()
+        return -leave_minutes(current) if current and current.status == LeaveRequest.STATUS_APPROVED else 0
+    return _post(leave.employee_id, BalanceMovement.ACCOUNT_LEAVE, BalanceMovement.SOURCE_LEAVE_REQUEST, leave.date, target, source_id=leave.pk)
+
+# --- Reading: snapshot + tail ---
+
+def balances(employee_id):
+    """Current balance per account in minutes: the stored snapshot plus the movements appended after it (two indexed queries)."""
+    snapshots = {account: (as_of, balance) for account, as_of, balance in BalanceSnapshot.objects.filter(employee_id=employee_id).values_list('account', 'as_of_movement_id', 'balance')}
+    tails = {
+        account: Sum('minutes', filter=Q(account=account, id__gt=snapshots.get(account, (0, 0))[0]))
+        for account, _ in BalanceMovement.ACCOUNT_CHOICES
+    }
+    tail = BalanceMovement.objects.filter(employee_id=employee_id, id__gt=min(as_of for as_of, _ in snapshots.values()) if snapshots else 0).aggregate(**tails)
+    return {account: snapshots.get(account, (0, 0))[1] + (tail[account] or 0) for account, _ in BalanceMovement.ACCOUNT_CHOICES}
+
+def last_movement_id(employee_id):
+    return BalanceMovement.objects.filter(employee_id=employee_id).aggregate(last=Max('id'))['last']
+
+def _lock_movements():
+    """Ids are handed out when a movement is inserted, not when it commits: without the lock, a movement still uncommitted
+    below the new watermark would be missing from the snapshot and, being under the watermark, from every later tail too.
+    The table lock waits for the transactions that appended movements and holds new ones off until the snapshot commits.
+    SQLite has a single writer, so there nothing below the watermark can commit later."""
+    connection = connections[BalanceMovement.objects.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor: cursor.execute(f"LOCK TABLE {BalanceMovement._meta.db_table} IN EXCLUSIVE MODE")
+
+@transaction.atomic
+def take_snapshots():
+    """Folds the movements appended since the previous run into the snapshots. Returns the number of snapshots written.
+
+    Each run stamps its snapshots with the same watermark, so a pair's unfolded movements are exactly those above the last watermark."""
+    _lock_movements()
+    watermark = BalanceMovement.objects.aggregate(last=Max('id'))['last']
+    if watermark is None: return 0
+    previous_watermark = BalanceSnapshot.objects.aggregate(last=Max('as_of_movement_id'))['last'] or 0
+    tails = BalanceMovement.objects.filter(id__gt=previous_watermark, id__lte=watermark).values_list('employee_id', 'account').annotate(total=Sum('minutes')).order_by()
+    tails = {(employee_id, account): total for employee_id, account, total in tails}
+    existing = {(snapshot.employee_id, snapshot.account): snapshot for snapshot in BalanceSnapshot.objects.filter(employee_id__in={employee_id for employee_id, _ in tails})}
+    to_create = []; to_update = []
+    for (employee_id, account), total in tails.items():
+        snapshot = existing.get((employee_id, account))
+        if snapshot is None: to_create.append(BalanceSnapshot(employee_id=employee_id, account=account, as_of_movement_id=watermark, balance=total))
+        else: snapshot.as_of_movement_id = watermark; snapshot.balance += total; snapshot.taken_at = timezone.now(); to_update.append(snapshot)
+    BalanceSnapshot.objects.bulk_create(to_create); BalanceSnapshot.objects.bulk_update(to_update, ['as_of_movement_id', 'balance', 'taken_at'])
+    return len(to_create) + len(to_update)
\ No newline at end of file
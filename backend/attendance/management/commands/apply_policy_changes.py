@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from attendance.models import PolicyChange
+from attendance.recompute import apply_change
+
+class Command(BaseCommand):
+    help = 'Recomputes the reports affected by recorded policy changes that are still pending or whose recompute failed (run_scheduler applies pending ones on every tick).'
+    def add_arguments(self, parser):
+        parser.add_argument('--id', type=int, action='append', help='Only these policy changes (repeatable); applied ones are recomputed again.')
+    def handle(self, *args, **options):
+        changes = PolicyChange.objects.filter(pk__in=options['id']) if options['id'] else PolicyChange.objects.exclude(status=PolicyChange.STATUS_APPLIED)
+        for change in changes.order_by('created_at'):
+            change = apply_change(change)
+            if change.status == PolicyChange.STATUS_APPLIED: self.stdout.write(self.style.SUCCESS(f"{change}: {change.affected_count} employee-days recomputed, {change.reports_changed} reports changed."))
+            else: self.stderr.write(f"{change}: {change.error}")
\ No newline at end of file
@@ -0,0 +1,62 @@
+import datetime
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from attendance.models import RawAttendanceLog, Employee, ArchivedMonth
+from attendance.archive import PunchArchive, archive_path, from_micros, month_bounds, moving_rows, write_month
+
+class Command(BaseCommand):
+    help = 'Moves raw punches of closed months out of the live table into per-month columnar archive files.'
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='First month (YYYY-MM) to keep live; defaults to the previous month, so the current and previous months stay hot.')
+        parser.add_argument('--uncompressed', action='store_true', help='Store raw columns that can be read zero-copy, at several times the size.')
+        parser.add_argument('--keep-rows', action='store_true', help='Write the files but leave the live rows in place.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per statement.')
+    def handle(self, *args, **options):
+        if options['before']:
+            try: keep_from = datetime.date.fromisoformat(f"{options['before']}-01")
+            except ValueError: raise CommandError("Invalid --before. Use YYYY-MM.")
+        else: keep_from = (timezone.localdate().replace(day=1) - datetime.timedelta(days=1)).replace(day=1)
+        cutoff = month_bounds(keep_from.year, keep_from.month)[0]
+        oldest = RawAttendanceLog.objects.filter(timestamp__lt=cutoff).aggregate(oldest=Min('timestamp'))['oldest']
+        if oldest is None: self.stdout.write("No punches older than the live window."); return
+        employee_ids = dict(Employee.objects.values_list('employee_code', 'id'))
+        month = timezone.localtime(oldest).date().replace(day=1)
+        while month < keep_from:
+            self.archive_month(month.year, month.month, employee_ids, options)
+            month = (month + datetime.timedelta(days=32)).replace(day=1)
+    def archive_month(self, year, month, employee_ids, options):
+        start, end = month_bounds(year, month)
+        live = list(RawAttendanceLog.objects.filter(timestamp__gte=start, timestamp__lt=end).values_list('id', 'employee_code', 'timestamp', 'terminal_id', 'sequence').iterator(chunk_size=10000))
+        if not live: return
+        if options['dry_run']: self.stdout.write(f"{year:04d}-{month:02d}: would archive {len(live)} punches."); return
+        punches = Counter((code, timestamp, terminal_id, sequence) for _, code, timestamp, terminal_id, sequence in live); archived_ids = {}
+        path = archive_path(year, month)
+        if path.exists():
+            # Late punches for an already archived month, or rows left by --keep-rows: merge them into the existing file, each punch once.
+            archived = Counter()
+            with PunchArchive(path) as archive:
+                for code, employee_id, _ in archive.employees():
+                    timestamps, terminals, sequences = archive.columns(code)
+                    archived.update((code, from_micros(micros), terminal or None, sequence or None) for micros, terminal, sequence in zip(timestamps, terminals, sequences))
+                    archived_ids[code] = employee_id or None
+                    del timestamps, terminals, sequences
+            punches |= archived
+        rows = sorted(((code, employee_ids.get(code) or archived_ids.get(code), timestamp, terminal_id, sequence) for code, timestamp, terminal_id, sequence in punches.elements()), key=lambda row: (row[0], row[2]))
+        try: written = write_month(path, year, month, rows, compressed=not options['uncompressed'])
+        except ValueError as exc: raise CommandError(f"{year:04d}-{month:02d} was not archived: {exc}")
+        with PunchArchive(path) as archive:
+            if archive.punch_count != len(rows): raise CommandError(f"Verification of {path} failed: {archive.punch_count} punches written, {len(rows)} expected.")
+            employee_count = len(archive)
+        with transaction.atomic():
+            ArchivedMonth.objects.update_or_create(year=year, month=month, defaults={
+                'period_start': start, 'period_end': end, 'path': str(path), 'employee_count': employee_count, 'punch_count': written, 'compressed': not options['uncompressed'],
+            })
+            if not options['keep_rows']:
+                ids = [row[0] for row in live]
+                with moving_rows():
+                    for offset in range(0, len(ids), options['batch_size']): RawAttendanceLog.objects.filter(id__in=ids[offset:offset + options['batch_size']]).delete()
+        self.stdout.write(self.style.SUCCESS(f"{year:04d}-{month:02d}: archived {len(live)} punches to {path} ({written} in file, {path.stat().st_size} bytes)."))
\ No newline at end of file
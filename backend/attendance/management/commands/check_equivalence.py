@@ -0,0 +1,57 @@
+import datetime
+import json
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from attendance.models import GlobalSettings
+from attendance.equivalence import ENGINES, PAYROLL_FIELDS, run_check
+
+class Command(BaseCommand):
+    help = 'Checks that alternative calculation engines produce the same DailyAttendanceReport rows as the frozen reference. Every write is rolled back.'
+    def add_arguments(self, parser):
+        parser.add_argument('--engine', action='append', default=[], help=f"Engine to check: {', '.join(ENGINES)} or a dotted path to a callable. Repeatable; defaults to all built-in engines.")
+        parser.add_argument('--seed', type=int, action='append', default=[], help='Generate a random dataset from this seed. Repeatable.')
+        parser.add_argument('--employees', type=int, default=40, help='Employees per generated dataset.')
+        parser.add_argument('--days', type=int, default=21, help='Days per generated dataset, ending yesterday.')
+        parser.add_argument('--start-date', help='Check existing data from this date (YYYY-MM-DD) instead of generating it.')
+        parser.add_argument('--end-date', help='Last date of the existing-data check; defaults to --start-date.')
+        parser.add_argument('--payroll-only', action='store_true', help=f"Only compare {', '.join(PAYROLL_FIELDS)}.")
+        parser.add_argument('--json', action='store_true', help='Print the result as JSON.')
+    def handle(self, *args, **options):
+        try: global_settings = GlobalSettings.objects.get(pk=1)
+        except GlobalSettings.DoesNotExist: raise CommandError("FATAL: GlobalSettings not found. Please create the first settings object in the admin panel.")
+        engines = {}
+        for name in options['engine'] or list(ENGINES):
+            try: engines[name] = ENGINES[name] if name in ENGINES else import_string(name)
+            except ImportError: raise CommandError(f"Unknown engine {name}.")
+        if options['start_date']:
+            try:
+                start = datetime.date.fromisoformat(options['start_date'])
+                end = datetime.date.fromisoformat(options['end_date']) if options['end_date'] else start
+            except ValueError: raise CommandError("Invalid --start-date/--end-date. Use YYYY-MM-DD.")
+            datasets = [(None, start, end)]
+        else:
+            end = timezone.localdate() - datetime.timedelta(days=1); start = end - datetime.timedelta(days=options['days'] - 1)
+            datasets = [(seed, start, end) for seed in options['seed'] or [1]]
+        results = []; failed = False
+        for seed, start, end in datasets:
+            divergences, checked, first_inputs = run_check(start, end, engines, global_settings, seed=seed, employee_count=options['employees'])
+            if options['payroll_only']: divergences = [row for row in divergences if row.field in PAYROLL_FIELDS]
+            failed = failed or bool(divergences)
+            result = {
+                'seed': seed, 'start_date': start.isoformat(), 'end_date': end.isoformat(), 'employee_days': checked, 'divergences': len(divergences),
+                'by_engine_and_field': {f"{engine}.{field}": count for (engine, field), count in Counter((row.engine, row.field) for row in divergences).items()},
+                'first_divergence': {**divergences[0]._asdict(), 'inputs': first_inputs} if divergences else None,
+            }
+            results.append(result)
+            if options['json']: continue
+            label = f"seed {seed}" if seed is not None else "existing data"
+            if not divergences: self.stdout.write(self.style.SUCCESS(f"{label}, {start}..{end}: {checked} employee-days identical across {', '.join(engines)}.")); continue
+            self.stdout.write(self.style.ERROR(f"{label}, {start}..{end}: {len(divergences)} divergence(s) in {checked} employee-days."))
+            for key, count in sorted(result['by_engine_and_field'].items()): self.stdout.write(f"  {key}: {count}")
+            first = divergences[0]
+            self.stdout.write(f"First: engine {first.engine}, employee {first.employee_id} on {first.date}, {first.field}: reference {first.expected!r}, engine {first.actual!r}")
+            self.stdout.write(json.dumps(first_inputs, indent=2, default=str))
+        if options['json']: self.stdout.write(json.dumps(results, default=str))
+        if failed: raise CommandError("Engines diverge from the reference.")
\ No newline at end of file
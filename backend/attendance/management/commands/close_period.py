@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from attendance.models import ClosedPeriod, OvertimeRequest, LeaveRequest, MissionRequest, ManualLogRequest
+from attendance.periods import PeriodClosed, close_period, month_dates, verify_period
+
+class Command(BaseCommand):
+    help = "Closes a finalized month: freezes its reports into per-employee snapshots, locks it against recomputation and serves its reads from the snapshots."
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Month to close (YYYY-MM).')
+        parser.add_argument('--user', help='Username recorded as having closed the month.')
+        parser.add_argument('--drop-rows', action='store_true', help='Also delete the live report rows once they are in the snapshots. Views that list reports directly then show nothing for the month.')
+        parser.add_argument('--verify', action='store_true', help='Only check every closed month against its checksum.')
+    def handle(self, *args, **options):
+        if options['verify']:
+            failed = [str(period) for period in ClosedPeriod.objects.all() if not verify_period(period)]
+            if failed: raise CommandError(f"Checksum mismatch: {', '.join(failed)}.")
+            self.stdout.write(self.style.SUCCESS("Every closed month matches its checksum.")); return
+        try: year, month = (int(part) for part in (options['month'] or '').split('-')); month_dates(year, month)
+        except ValueError: raise CommandError("Invalid --month. Use YYYY-MM.")
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None: raise CommandError(f"Unknown user {options['user']}.")
+        start, end = month_dates(year, month)
+        pending = sum(model.objects.filter(date__range=(start, end), status=model.STATUS_PENDING).count() for model in (OvertimeRequest, LeaveRequest, MissionRequest, ManualLogRequest))
+        if pending: self.stdout.write(self.style.WARNING(f"{pending} request(s) of {year:04d}-{month:02d} are still pending and can no longer be reviewed once it is closed."))
+        try: period = close_period(year, month, user=user, keep_rows=not options['drop_rows'])
+        except (PeriodClosed, ValueError) as exc: raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"{year:04d}-{month:02d} closed: {period.report_count} reports of {period.employee_count} employees frozen "
+            f"({sum(len(packed) for packed in period.snapshots.values_list('packed_reports', flat=True))} bytes of snapshots)."
+        ))
\ No newline at end of file
@@ -1,97 +1,260 @@
+import cProfile
 import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor
 from django.utils import timezone
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
 from attendance.models import (
     Employee, RawAttendanceLog, DailyAttendanceReport, WorkShift, 
-    OvertimeRequest, LeaveRequest, Holiday, ShiftDayRule, MissionRequest, GlobalSettings
+    OvertimeRequest, LeaveRequest, Holiday, ShiftDayRule, MissionRequest, GlobalSettings, DailyPunchSummary, ManualLogRequest,
+    ProcessingRun, ProcessingRunShard, Site
 )
-from django.db.models import Min, Max
-from django.core.exceptions import ObjectDoesNotExist
+from attendance.analytics import refresh_employee_rollups, refresh_rollups
+from attendance.assignments import ShiftTimeline, sync_current_shifts
+from attendance.summaries import to_punch_summary
+from attendance.instrumentation import RunProfile
+from attendance.periods import REPORT_FIELDS, closed_dates
+from attendance.sites import by_timezone, partitions, site_timezone
+from django.db.models import Min, Max, Q
+from django.db import connections, transaction
 
 class Command(BaseCommand):
     help = 'Processes logs using global settings and dynamic ShiftDayRule logic.'
+    site_filter = {}; report_defaults = {}; reported_ids = None
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Work date to process (YYYY-MM-DD), defaults to each site's local today.")
+        parser.add_argument('--end-date', help='Last work date of a backfill range starting at --date.')
+        parser.add_argument('--changed-since', help='ISO datetime; only reprocess employees whose punches or requests for the date changed after it.')
+        parser.add_argument('--shard-size', type=int, default=500, help='Employees written per checkpointed transaction.')
+        parser.add_argument('--resume', nargs='?', const='latest', help='Continue an interrupted run from its last checkpoint (run id, or the latest unfinished run).')
+        parser.add_argument('--summary-json', metavar='PATH', help="Write a JSON run summary (phase timings, counters, throughput) to PATH, or '-' for stdout.")
+        parser.add_argument('--slow-ms', type=int, default=250, help='Log employee-days slower than this many milliseconds.')
+        parser.add_argument('--profile', metavar='PATH', help='Also run under cProfile and dump the stats to PATH (read with pstats or snakeviz). Runs sites one after another.')
+        parser.add_argument('--site', help='Only process this site, by name. By default every site is a separate partition processed at its own local day boundary.')
+        parser.add_argument('--without-site', action='store_true', help='Only process the employees without a site (the partition run_scheduler schedules under its default lease).')
+        parser.add_argument('--workers', type=int, default=1, help='Sites processed in parallel, one thread and database connection each. Needs a database that allows concurrent writers.')
     def handle(self, *args, **options):
-        today = timezone.localdate()
+        # Verbosity 0 is quiet, 1 prints one progress line per shard, 2 and up adds the per-employee lines.
+        self.verbosity = options['verbosity']
+        try: sites = [None] if options.get('without_site') else partitions(options.get('site'))
+        except Site.DoesNotExist: raise CommandError(f"Unknown site {options['site']}.")
+        resumed = None
+        if options.get('resume'): resumed = self.resume_run(options['resume'], sites[0] if options.get('site') else None); sites = [resumed.site]
+        if not options.get('profile'): summaries = self.run_partitions(sites, options, resumed, options['workers'])
+        else:
+            profiler = cProfile.Profile()
+            try: summaries = profiler.runcall(self.run_partitions, sites, options, resumed, 1)
+            finally: profiler.dump_stats(options['profile']); self.stderr.write(f"cProfile stats written to {options['profile']}.")
+        if len(summaries) == 1: summary = summaries[0]
+        else: summary = {'employee_days': sum(part['employee_days'] for part in summaries), 'partitions': summaries}
+        if options.get('summary_json') == '-': self.stdout.write(json.dumps(summary))
+        elif options.get('summary_json'):
+            with open(options['summary_json'], 'w') as handle: json.dump(summary, handle, indent=2)
+    def run_partitions(self, sites, options, resumed=None, workers=1):
+        """Sites share nothing but global settings and holidays, so each runs as its own ProcessingRun; with workers > 1 in parallel threads."""
+        workers = max(1, min(workers, len(sites)))
+        if workers > 1 and connections['default'].vendor == 'sqlite':
+            self.stderr.write("SQLite allows a single writer; processing sites one after another."); workers = 1
+        if workers == 1: return [self.run_partition(site, options, resumed) for site in sites]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='process-site') as pool: return list(pool.map(lambda site: self.run_partition(site, options, close_connections=True), sites))
+    def run_partition(self, site, options, resumed=None, close_connections=False):
+        partition = Command(); partition.stdout = self.stdout; partition.stderr = self.stderr; partition.style = self.style
+        partition.verbosity = self.verbosity; partition.profile = RunProfile(options['slow_ms']); partition.site_filter = {'site': site}
+        try:
+            with timezone.override(site_timezone(site)): return partition.run(options, site, resumed)
+        finally:
+            if close_connections: connections.close_all()
+    def run(self, options, site=None, run=None):
         try:
-            global_settings = GlobalSettings.objects.get(pk=1)
+            with self.profile.phase('settings'): global_settings = GlobalSettings.objects.get(pk=1)
         except GlobalSettings.DoesNotExist:
-            self.stdout.write(self.style.ERROR("FATAL: GlobalSettings not found. Please create the first settings object in the admin panel."))
-            return
-        holiday_today = Holiday.objects.filter(date=today).first()
+            raise CommandError("FATAL: GlobalSettings not found. Please create the first settings object in the admin panel.")
+        with self.profile.phase('rules'):
+            # Every date of the run resolves its shift from the same in-memory timeline; assignments that took effect since
+            # they were entered also become the employees' current shift.
+            employees = list(Employee.objects.filter(**self.site_filter).select_related('site'))
+            self.timeline = ShiftTimeline([emp.pk for emp in employees]); self.profile.count('shifts_synced', sync_current_shifts(employees, self.timeline))
+        if run is None: run = self.start_run(options, site)
+        self.closed_dates = closed_dates(run.start_date, run.end_date)
+        try:
+            current_date = run.checkpoint_date or run.start_date
+            while current_date <= run.end_date:
+                self.process_date(run, current_date, global_settings, options['shard_size'])
+                current_date += datetime.timedelta(days=1)
+        except BaseException as exc:
+            run.status = ProcessingRun.STATUS_FAILED; run.error = str(exc) or exc.__class__.__name__; run.save(update_fields=['status', 'error'])
+            raise
+        run.status = ProcessingRun.STATUS_COMPLETED; run.finished_at = timezone.now(); run.save(update_fields=['status', 'finished_at'])
+        self.profile.finish()
+        summary = self.profile.summary(run_id=run.pk, site=site.name if site else None, timezone=timezone.get_current_timezone_name(), start_date=run.start_date.isoformat(), end_date=run.end_date.isoformat())
+        if self.verbosity >= 1:
+            self.stdout.write(self.style.SUCCESS(
+                f"Run {run.pk}{f' ({site.name})' if site else ''} completed: {run.employees_processed} employee-days for {run.start_date}..{run.end_date} "
+                f"in {summary['elapsed_seconds']}s ({summary['employee_days_per_second']} employee-days/s)."
+            ))
+        return summary
+    def start_run(self, options, site=None):
+        try:
+            start_date = datetime.date.fromisoformat(options['date']) if options.get('date') else timezone.localdate()
+            end_date = datetime.date.fromisoformat(options['end_date']) if options.get('end_date') else start_date
+        except ValueError: raise CommandError("Invalid --date/--end-date. Use YYYY-MM-DD.")
+        if end_date < start_date: raise CommandError("--end-date must not be before --date.")
+        changed_since = None
+        if options.get('changed_since'):
+            changed_since = parse_datetime(options['changed_since'])
+            if changed_since is None: raise CommandError("Invalid --changed-since. Use an ISO datetime.")
+            if timezone.is_naive(changed_since): changed_since = timezone.make_aware(changed_since)
+        return ProcessingRun.objects.create(start_date=start_date, end_date=end_date, changed_since=changed_since, site=site)
+    def resume_run(self, run_id, site=None):
+        unfinished = ProcessingRun.objects.exclude(status=ProcessingRun.STATUS_COMPLETED).select_related('site')
+        if site is not None: unfinished = unfinished.filter(site=site)
+        run = unfinished.order_by('-pk').first() if run_id == 'latest' else unfinished.filter(pk=run_id).first()
+        if run is None: raise CommandError(f"No unfinished run to resume ({run_id}).")
+        run.status = ProcessingRun.STATUS_RUNNING; run.error = ''; run.save(update_fields=['status', 'error'])
+        if self.verbosity >= 1: self.stdout.write(self.style.WARNING(f"Resuming run {run.pk} at {run.checkpoint_date or run.start_date} after employee {run.checkpoint_employee_id or '-'}."))
+        return run
+    def process_date(self, run, today, global_settings, shard_size):
+        if today in self.closed_dates:
+            # Reports of a closed month are frozen in its snapshots.
+            self.profile.count('closed_dates_skipped')
+            if self.verbosity >= 1: self.stdout.write(self.style.WARNING(f"{today}: period is closed, skipped."))
+            run.checkpoint_date = today + datetime.timedelta(days=1); run.checkpoint_employee_id = None
+            run.save(update_fields=['checkpoint_date', 'checkpoint_employee_id']); return
+        self.target_employee_ids = self.changed_employee_ids(today, run.changed_since) if run.changed_since else None
+        with self.profile.phase('holidays'): holiday_today = Holiday.objects.filter(date=today).first()
         if holiday_today:
-            self.stdout.write(self.style.WARNING(f"Processing {today} as OFFICIAL HOLIDAY: {holiday_today.name}"))
-            self.process_off_day_logic(today)
+            self.detail(f"Processing {today} as OFFICIAL HOLIDAY: {holiday_today.name}", self.style.WARNING)
         else:
-            self.stdout.write(self.style.SUCCESS(f"Processing {today} as NON-Holiday. Checking dynamic shifts..."))
-            self.process_shift_based_logic(today, global_settings)
-    def process_off_day_logic(self, today, is_holiday=False, is_weekend=False):
-        employees = Employee.objects.filter(shift__isnull=False)
+            self.detail(f"Processing {today} as NON-Holiday. Checking dynamic shifts...", self.style.SUCCESS)
+        done_today = 0
+        after_id = run.checkpoint_employee_id if run.checkpoint_date == today else None
+        while True:
+            employees = self.target_employees().order_by('id')
+            if after_id is not None: employees = employees.filter(id__gt=after_id)
+            shard = list(employees[:shard_size])
+            if not shard: break
+            with transaction.atomic():
+                self.load_day_summaries(today, [emp.id for emp in shard])
+                if holiday_today: self.process_off_day_logic(today, is_holiday=True, employees=shard)
+                else: self.process_shift_based_logic(today, global_settings, employees=shard)
+                after_id = shard[-1].id
+                with self.profile.phase('checkpoint'):
+                    run.checkpoint_date = today; run.checkpoint_employee_id = after_id; run.employees_processed += len(shard)
+                    run.save(update_fields=['checkpoint_date', 'checkpoint_employee_id', 'employees_processed'])
+                    ProcessingRunShard.objects.create(run=run, date=today, first_employee_id=shard[0].id, last_employee_id=after_id, employee_count=len(shard))
+            self.profile.count('shards'); done_today += len(shard)
+            if self.verbosity >= 1: self.stdout.write(f"{today}: {done_today} employees processed (through employee {after_id}).")
+        with self.profile.phase('rollups'): self.refresh_rollups(today)
+        run.checkpoint_date = today + datetime.timedelta(days=1); run.checkpoint_employee_id = None
+        run.save(update_fields=['checkpoint_date', 'checkpoint_employee_id'])
+    def recompute_employees(self, today, employee_ids, global_settings):
+        """Recomputes only the given employees for one date, outside of any ProcessingRun (used for retroactive policy changes).
+        Their reports are updated in place as if written afresh: fields the calculation leaves out get their defaults. Returns
+        the ids of the employees that got a report; the caller removes the others' stale reports."""
+        self.target_employee_ids = set(employee_ids); self.timeline = ShiftTimeline(self.target_employee_ids)
+        self.report_defaults = {name: DailyAttendanceReport._meta.get_field(name).get_default() for name in REPORT_FIELDS}; self.reported_ids = set()
+        self.verbosity = getattr(self, 'verbosity', 1); self.profile = getattr(self, 'profile', None) or RunProfile()
+        employees = list(self.target_employees())
+        self.load_day_summaries(today, self.target_employee_ids)
+        holiday = Holiday.objects.filter(date=today).exists()
+        for tzinfo, group in by_timezone(employees):
+            with timezone.override(tzinfo):
+                if holiday: self.process_off_day_logic(today, is_holiday=True, employees=group)
+                else: self.process_shift_based_logic(today, global_settings, employees=group)
+        with self.profile.phase('rollups'): self.refresh_rollups(today)
+        return self.reported_ids
+    def refresh_rollups(self, today):
+        # A full pass rebuilds its site; an incremental one only the groups its target employees count in (all of them, so a
+        # resumed run also covers the shards done before it stopped).
+        if self.target_employee_ids is None: refresh_rollups(today, [getattr(self.site_filter.get('site'), 'pk', None)])
+        else: refresh_employee_rollups(today, list(self.target_employees().values_list('id', flat=True)))
+    def changed_employee_ids(self, today, changed_since):
+        changed = set()
+        for model in (DailyPunchSummary, OvertimeRequest, LeaveRequest, MissionRequest, ManualLogRequest):
+            changed.update(model.objects.filter(date=today, updated_at__gte=changed_since).values_list('employee_id', flat=True))
+        return changed
+    def target_employees(self):
+        # Employees without a shift today may still have had one on an earlier date being processed.
+        employees = Employee.objects.filter(Q(shift__isnull=False) | Q(shift_assignments__shift__isnull=False), **self.site_filter).distinct().select_related('site')
+        if self.target_employee_ids is not None: employees = employees.filter(id__in=self.target_employee_ids)
+        return employees
+    def detail(self, message, style=None):
+        if self.verbosity >= 2: self.stdout.write(style(message) if style else message)
+    def load_day_summaries(self, today, employee_ids):
+        with self.profile.phase('summaries'): self.day_summaries = {summary.employee_id: summary for summary in DailyPunchSummary.objects.filter(date=today, employee_id__in=employee_ids)}
+    def load_day_punches(self, emp):
+        with self.profile.phase('punches'): return to_punch_summary(self.day_summaries.get(emp.pk))
+    def save_report(self, emp, today, defaults):
+        with self.profile.phase('write'): DailyAttendanceReport.objects.update_or_create(employee=emp, date=today, defaults={**self.report_defaults, **defaults})
+        self.profile.count('reports_written')
+        if self.reported_ids is not None: self.reported_ids.add(emp.pk)
+    def process_off_day_logic(self, today, is_holiday=False, is_weekend=False, employees=None):
+        if employees is None: employees = self.target_employees()
         for emp in employees:
-            logs_today = RawAttendanceLog.objects.filter(employee_code=emp.employee_code, timestamp__date=today)
-            if not logs_today.exists(): continue
-            first_log = logs_today.earliest('timestamp'); last_log = logs_today.latest('timestamp')
-            total_worked_minutes = int((last_log.timestamp - first_log.timestamp).total_seconds() / 60)
-            has_ot_approval = OvertimeRequest.objects.filter(employee=emp, date=today, status=OvertimeRequest.STATUS_APPROVED).exists()
-            final_overtime = total_worked_minutes if has_ot_approval else 0
-            DailyAttendanceReport.objects.update_or_create(
-                employee=emp, date=today,
-                defaults={ 'first_check_in': first_log.timestamp.time(), 'last_check_out': last_log.timestamp.time(), 'total_lateness_minutes': 0, 'penalty_minutes': 0, 'required_work_minutes_today': 0, 'total_worked_minutes': total_worked_minutes, 'work_shortfall_minutes': 0, 'work_overtime_minutes': final_overtime }
-            )
-            log_type = "Holiday" if is_holiday else "Weekend"
-            self.stdout.write(f"Processed {log_type} Work for {emp.full_name}. OT: {final_overtime}m")
-    def process_shift_based_logic(self, today, global_settings):
+            with self.profile.employee(emp, today): self.process_off_day(emp, today, is_holiday)
+    def process_off_day(self, emp, today, is_holiday):
+        punches = self.load_day_punches(emp)
+        if not punches.count: return
+        first_log = timezone.localtime(punches.first); last_log = timezone.localtime(punches.last)
+        total_worked_minutes = punches.span_minutes
+        with self.profile.phase('requests'): has_ot_approval = OvertimeRequest.objects.filter(employee=emp, date=today, status=OvertimeRequest.STATUS_APPROVED).exists()
+        final_overtime = total_worked_minutes if has_ot_approval else 0
+        self.save_report(emp, today, { 'first_check_in': first_log.time(), 'last_check_out': last_log.time(), 'has_unmatched_punch': punches.has_unmatched_punch, 'total_lateness_minutes': 0, 'penalty_minutes': 0, 'required_work_minutes_today': 0, 'total_worked_minutes': total_worked_minutes, 'work_shortfall_minutes': 0, 'work_overtime_minutes': final_overtime })
+        log_type = "Holiday" if is_holiday else "Weekend"
+        self.detail(f"Processed {log_type} Work for {emp.full_name}. OT: {final_overtime}m")
+    def process_shift_based_logic(self, today, global_settings, employees=None):
         today_weekday_num = today.weekday()
-        employees = Employee.objects.filter(shift__isnull=False)
+        if employees is None: employees = self.target_employees()
         for emp in employees:
-            shift = emp.shift
-            if not shift: continue
-            try: day_rule = ShiftDayRule.objects.get(shift=shift, day_of_week=today_weekday_num)
-            except ObjectDoesNotExist:
-                self.stdout.write(self.style.ERROR(f"FATAL: No ShiftDayRule defined for {shift.name} on day {today_weekday_num}. Skipping {emp.full_name}."))
-                continue
-            if not day_rule.is_work_day:
-                self.stdout.write(self.style.WARNING(f"Day is WEEKEND for {emp.full_name} (Rule: {day_rule})."))
-                self.process_off_day_logic(today, is_weekend=True)
-                continue
-            self.stdout.write(self.style.SUCCESS(f"Day is NORMAL WORK DAY for {emp.full_name}. Running calc with rule: {day_rule}"))
-            self.run_full_calculation(emp, shift, today, day_rule, global_settings)
+            with self.profile.employee(emp, today): self.process_shift_day(emp, today, today_weekday_num, global_settings)
+    def process_shift_day(self, emp, today, today_weekday_num, global_settings):
+        with self.profile.phase('rules'): history = self.timeline.history(emp); shift_id = history.shift_id_on(today)
+        if not shift_id: return
+        day_rule = history.rules_on(today).get(today_weekday_num)
+        if day_rule is None:
+            self.profile.count('missing_rules')
+            if self.verbosity >= 1: self.stdout.write(self.style.ERROR(f"FATAL: No ShiftDayRule defined for {WorkShift.objects.get(pk=shift_id).name} on day {today_weekday_num}. Skipping {emp.full_name}."))
+            return
+        if not day_rule.is_work_day:
+            self.detail(f"Day is WEEKEND for {emp.full_name} (Rule: {day_rule}).", self.style.WARNING)
+            self.process_off_day_logic(today, is_weekend=True, employees=[emp])
+            return
+        self.detail(f"Day is NORMAL WORK DAY for {emp.full_name}. Running calc with rule: {day_rule}", self.style.SUCCESS)
+        self.run_full_calculation(emp, day_rule.shift, today, day_rule, global_settings)
     def run_full_calculation(self, emp, shift, today, day_rule, global_settings):
-        if LeaveRequest.objects.filter(employee=emp, date=today, status=LeaveRequest.STATUS_APPROVED, leave_type=LeaveRequest.TYPE_FULL_DAY).exists():
-            self.stdout.write(f'Skipping calculation for {emp.full_name} (On Full Leave).'); return
-        if MissionRequest.objects.filter(employee=emp, date=today, status=MissionRequest.STATUS_APPROVED, mission_type=MissionRequest.TYPE_FULL_DAY).exists():
-            self.stdout.write(f'Processing {emp.full_name} as Full Day Mission.')
-            DailyAttendanceReport.objects.update_or_create(
-                employee=emp, date=today,
-                defaults={ 'total_worked_minutes': day_rule.required_work_minutes, 'required_work_minutes_today': day_rule.required_work_minutes, 'work_shortfall_minutes': 0, 'work_overtime_minutes': 0, 'total_lateness_minutes': 0, 'penalty_minutes': 0 }
-            ); return
-        logs_today = RawAttendanceLog.objects.filter(employee_code=emp.employee_code, timestamp__date=today).order_by('timestamp')
-        if not logs_today.exists():
-            self.stdout.write(f'No logs found for {emp.full_name} (Absent)')
-            DailyAttendanceReport.objects.update_or_create(
-                employee=emp, date=today,
-                defaults={ 'work_shortfall_minutes': day_rule.required_work_minutes, 'required_work_minutes_today': day_rule.required_work_minutes, 'first_check_in': None, 'last_check_out': None }
-            ); return
-        first_log = logs_today.first(); last_log = logs_today.last()
-        first_check_in_time = first_log.timestamp.time(); last_check_out_time = last_log.timestamp.time()
+        with self.profile.phase('requests'): on_full_leave = LeaveRequest.objects.filter(employee=emp, date=today, status=LeaveRequest.STATUS_APPROVED, leave_type=LeaveRequest.TYPE_FULL_DAY).exists()
+        if on_full_leave:
+            self.profile.count('full_leave'); self.detail(f'Skipping calculation for {emp.full_name} (On Full Leave).'); return
+        with self.profile.phase('requests'): on_full_mission = MissionRequest.objects.filter(employee=emp, date=today, status=MissionRequest.STATUS_APPROVED, mission_type=MissionRequest.TYPE_FULL_DAY).exists()
+        if on_full_mission:
+            self.profile.count('full_mission'); self.detail(f'Processing {emp.full_name} as Full Day Mission.')
+            self.save_report(emp, today, { 'total_worked_minutes': day_rule.required_work_minutes, 'required_work_minutes_today': day_rule.required_work_minutes, 'work_shortfall_minutes': 0, 'work_overtime_minutes': 0, 'total_lateness_minutes': 0, 'penalty_minutes': 0 }); return
+        punches = self.load_day_punches(emp)
+        if not punches.count:
+            self.profile.count('absent'); self.detail(f'No logs found for {emp.full_name} (Absent)')
+            self.save_report(emp, today, { 'work_shortfall_minutes': day_rule.required_work_minutes, 'required_work_minutes_today': day_rule.required_work_minutes, 'first_check_in': None, 'last_check_out': None, 'has_unmatched_punch': False }); return
+        first_log = timezone.localtime(punches.first); last_log = timezone.localtime(punches.last)
+        first_check_in_time = first_log.time(); last_check_out_time = last_log.time()
         shift_start_minutes = (day_rule.start_time.hour * 60) + day_rule.start_time.minute
         grace_deadline_minutes = shift_start_minutes + global_settings.grace_period_minutes
-        arrival_time_minutes = (first_check_in_time.hour * 60) + first_check_in_time.minute
+        arrival_day_offset = (first_log.date() - today).days * 24 * 60
+        arrival_time_minutes = arrival_day_offset + (first_check_in_time.hour * 60) + first_check_in_time.minute
         total_lateness_minutes = 0; penalty_minutes = 0
         if arrival_time_minutes > shift_start_minutes: total_lateness_minutes = arrival_time_minutes - shift_start_minutes
         if arrival_time_minutes > grace_deadline_minutes: penalty_minutes = float(total_lateness_minutes) * float(global_settings.penalty_rate)
         approved_hourly_leave_minutes = 0
-        hourly_leave_req = LeaveRequest.objects.filter(employee=emp, date=today, status=LeaveRequest.STATUS_APPROVED, leave_type=LeaveRequest.TYPE_HOURLY).first()
+        with self.profile.phase('requests'): hourly_leave_req = LeaveRequest.objects.filter(employee=emp, date=today, status=LeaveRequest.STATUS_APPROVED, leave_type=LeaveRequest.TYPE_HOURLY).first()
         if hourly_leave_req and hourly_leave_req.start_time and hourly_leave_req.end_time:
             dummy_date = datetime.date.min
             start_dt = datetime.datetime.combine(dummy_date, hourly_leave_req.start_time)
             end_dt = datetime.datetime.combine(dummy_date, hourly_leave_req.end_time)
             approved_hourly_leave_minutes = int((end_dt - start_dt).total_seconds() / 60)
-        total_physical_presence = 0
-        if len(logs_today) >= 2:
-            log_pairs = zip(logs_today[::2], logs_today[1::2])
-            for log_in, log_out in log_pairs: total_physical_presence += int((log_out.timestamp - log_in.timestamp).total_seconds() / 60)
+        total_physical_presence = punches.presence_minutes
+        if punches.has_unmatched_punch:
+            self.profile.count('unmatched_punches'); self.detail(f'Unmatched punch at {timezone.localtime(punches.unmatched_punch).time()} for {emp.full_name}; it is not counted as presence.', self.style.WARNING)
         approved_hourly_mission_minutes = 0
-        hourly_mission_req = MissionRequest.objects.filter(employee=emp, date=today, status=MissionRequest.STATUS_APPROVED, mission_type=MissionRequest.TYPE_HOURLY).first()
+        with self.profile.phase('requests'): hourly_mission_req = MissionRequest.objects.filter(employee=emp, date=today, status=MissionRequest.STATUS_APPROVED, mission_type=MissionRequest.TYPE_HOURLY).first()
         if hourly_mission_req and hourly_mission_req.start_time and hourly_mission_req.end_time:
             dummy_date = datetime.date.min
             start_dt = datetime.datetime.combine(dummy_date, hourly_mission_req.start_time)
@@ -104,10 +267,7 @@ class Command(BaseCommand):
         work_shortfall_minutes = 0; work_overtime_minutes = 0
         if work_balance_minutes < 0: work_shortfall_minutes = abs(work_balance_minutes)
         elif work_balance_minutes > 0:
-            has_ot_approval = OvertimeRequest.objects.filter(employee=emp, date=today, status=OvertimeRequest.STATUS_APPROVED).exists()
+            with self.profile.phase('requests'): has_ot_approval = OvertimeRequest.objects.filter(employee=emp, date=today, status=OvertimeRequest.STATUS_APPROVED).exists()
             if has_ot_approval: work_overtime_minutes = work_balance_minutes
-        DailyAttendanceReport.objects.update_or_create(
-            employee=emp, date=today,
-            defaults={ 'first_check_in': first_check_in_time, 'last_check_out': last_check_out_time, 'total_lateness_minutes': total_lateness_minutes, 'penalty_minutes': penalty_minutes, 'required_work_minutes_today': final_required_minutes, 'total_worked_minutes': total_worked_minutes, 'work_shortfall_minutes': work_shortfall_minutes, 'work_overtime_minutes': work_overtime_minutes }
-        )
-        self.stdout.write(self.style.SUCCESS(f'Successfully processed NORMAL report for {emp.full_name}'))
\ No newline at end of file
+        self.save_report(emp, today, { 'first_check_in': first_check_in_time, 'last_check_out': last_check_out_time, 'has_unmatched_punch': punches.has_unmatched_punch, 'total_lateness_minutes': total_lateness_minutes, 'penalty_minutes': penalty_minutes, 'required_work_minutes_today': final_required_minutes, 'total_worked_minutes': total_worked_minutes, 'work_shortfall_minutes': work_shortfall_minutes, 'work_overtime_minutes': work_overtime_minutes })
+        self.detail(f'Successfully processed NORMAL report for {emp.full_name}', self.style.SUCCESS)
\ No newline at end of file
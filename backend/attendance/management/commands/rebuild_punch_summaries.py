@@ -0,0 +1,25 @@
+import datetime
+from django.utils import timezone
+from django.core.management.base import BaseCommand, CommandError
+from attendance.models import Employee
+from attendance.assignments import ShiftTimeline
+from attendance.summaries import rebuild_summaries
+
+class Command(BaseCommand):
+    help = 'Rebuilds DailyPunchSummary rows from RawAttendanceLog (backfills, bulk imports, or after a shift becomes overnight).'
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='YYYY-MM-DD, defaults to the first day of the current month.')
+        parser.add_argument('--end-date', help='YYYY-MM-DD, defaults to today.')
+        parser.add_argument('--employee-code', help='Only rebuild this employee.')
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            start_date = datetime.date.fromisoformat(options['start_date']) if options['start_date'] else today.replace(day=1)
+            end_date = datetime.date.fromisoformat(options['end_date']) if options['end_date'] else today
+        except ValueError: raise CommandError("Invalid date format. Use YYYY-MM-DD.")
+        if start_date > end_date: raise CommandError("start-date must not be after end-date.")
+        employees = Employee.objects.select_related('site')
+        if options['employee_code']: employees = employees.filter(employee_code=options['employee_code'])
+        employees = list(employees); timeline = ShiftTimeline([emp.pk for emp in employees]); total_days = 0
+        for emp in employees: total_days += rebuild_summaries(emp, start_date, end_date, timeline.history(emp))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total_days} punch summaries for {start_date}..{end_date}."))
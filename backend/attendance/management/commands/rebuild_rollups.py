@@ -0,0 +1,22 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from attendance.analytics import refresh_rollups
+from attendance.models import Site
+from attendance.reports import iter_dates
+
+class Command(BaseCommand):
+    help = 'Rebuilds the attendance analytics rollups for a date range (backfills; process_attendance keeps them current afterwards).'
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='YYYY-MM-DD, defaults to the first day of the current month.')
+        parser.add_argument('--end-date', help='YYYY-MM-DD, defaults to yesterday.')
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            start_date = datetime.date.fromisoformat(options['start_date']) if options['start_date'] else today.replace(day=1)
+            end_date = datetime.date.fromisoformat(options['end_date']) if options['end_date'] else today - datetime.timedelta(days=1)
+        except ValueError: raise CommandError("Invalid date format. Use YYYY-MM-DD.")
+        if start_date > end_date: raise CommandError("start-date must not be after end-date.")
+        site_ids = [None] + list(Site.objects.values_list('id', flat=True)); written = 0
+        for day in iter_dates(start_date, end_date): written += refresh_rollups(day, site_ids)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup rows for {start_date}..{end_date}."))
\ No newline at end of file
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from attendance.search import rebuild_index
+
+class Command(BaseCommand):
+    help = 'Rebuilds the request full-text search index from the request tables (after bulk imports or restoring a backup).'
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Requests upserted per statement.')
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"{rebuild_index(options['batch_size'])} requests indexed."))
\ No newline at end of file
@@ -0,0 +1,100 @@
+import datetime
+import os
+import random
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from django.utils import timezone
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections
+from attendance.scheduling import acquire_lease, release_lease, record_run, changed_work_dates
+from attendance.recompute import apply_pending_changes
+from attendance.models import Site
+from attendance.sites import partitions, site_timezone
+
+class Command(BaseCommand):
+    help = 'Runs process_attendance continuously: a nightly full pass plus intraday incremental passes, with one active runner per site.'
+    # Every site is scheduled on its own wall clock and under a lease named after it (the lease passed with --site stands for the
+    # employees without a site): the default runner takes each site's lease in turn, so a dedicated runner for a site excludes it.
+    def add_arguments(self, parser):
+        parser.add_argument('--site', default='default', help="Lease name; runners for the same site exclude each other. When it names a Site, only that site is processed; otherwise every site is, each under its own lease.")
+        parser.add_argument('--workers', type=int, default=1, help='Sites scheduled in parallel when all sites are processed.')
+        parser.add_argument('--interval', type=int, default=5, help='Minutes between incremental passes.')
+        parser.add_argument('--nightly-at', default='23:30', help='Local HH:MM after which the daily full pass runs.')
+        parser.add_argument('--lease-seconds', type=int, default=900, help='Lease lifetime; renewed every third of it while a pass runs.')
+        parser.add_argument('--max-backoff', type=int, default=1800, help='Upper bound in seconds for the retry delay after failures.')
+        parser.add_argument('--once', action='store_true', help='Run a single scheduling tick and exit.')
+    def handle(self, *args, **options):
+        try: self.nightly_at = datetime.time.fromisoformat(options['nightly_at'])
+        except ValueError: raise CommandError("Invalid --nightly-at. Use HH:MM.")
+        self.site = options['site']; self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.partition = Site.objects.filter(name=self.site).first(); self.workers = options['workers']; self.held = set()
+        self.interval = datetime.timedelta(minutes=options['interval']); self.lease_seconds = options['lease_seconds']; self.max_backoff = options['max_backoff']
+        self.stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM): signal.signal(signum, lambda *_: self.stopping.set())
+        self.stdout.write(f"Scheduler {self.owner} started for site '{self.site}'.")
+        try:
+            while not self.stopping.is_set():
+                delay = self.tick()
+                if options['once']: break
+                self.stopping.wait(delay)
+        finally:
+            for name in list(self.held): release_lease(name, self.owner)
+            self.stdout.write(f"Scheduler {self.owner} stopped.")
+    def jitter(self, seconds): return seconds * random.uniform(0.9, 1.1)
+    def poll_seconds(self): return self.jitter(min(60, self.interval.total_seconds()))
+    def scheduled_sites(self):
+        """(lease name, site) of every partition this runner schedules; None is the partition of the employees without a site."""
+        if self.partition: return [(self.site, self.partition)]
+        return [(site.name if site else self.site, site) for site in partitions()]
+    def tick(self):
+        """Schedules every partition once and returns the seconds until the next tick."""
+        close_old_connections()
+        sites = self.scheduled_sites(); workers = max(1, min(self.workers, len(sites)))
+        if workers == 1 or connection.vendor == 'sqlite': return min(self.tick_site(name, site) for name, site in sites)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='schedule-site') as pool: return min(pool.map(lambda pair: self.tick_site(*pair, close_connections=True), sites))
+    def tick_site(self, name, site, close_connections=False):
+        try: return self.run_site(name, site)
+        finally:
+            if close_connections: connections.close_all()
+    def run_site(self, name, site):
+        lease = acquire_lease(name, self.owner, self.lease_seconds)
+        if lease is None: self.held.discard(name); return self.poll_seconds()
+        self.held.add(name)
+        # The site's own day: its local date and nightly time, not the server's.
+        with timezone.override(site_timezone(site)): now = timezone.localtime(); today = now.date()
+        started = timezone.now(); changed_since = lease.last_incremental_at or timezone.make_aware(datetime.datetime.combine(today, datetime.time.min), now.tzinfo)
+        if now.time() >= self.nightly_at and lease.last_full_run_date != today:
+            job = 'full'; command_options = {'date': today.isoformat()}; done_fields = {'last_full_run_date': today, 'last_incremental_at': started}
+        elif lease.last_incremental_at is None or started - lease.last_incremental_at >= self.interval:
+            job = 'incremental'; command_options = {'date': today.isoformat(), 'changed_since': changed_since.isoformat()}; done_fields = {'last_incremental_at': started}
+        else: return self.poll_seconds()
+        partition_options = {'site': site.name} if site else {'without_site': True}
+        finished = threading.Event(); keeper = threading.Thread(target=self.keep_lease, args=(name, finished), daemon=True); keeper.start()
+        try:
+            # Policy changes saved since the last tick recompute their affected days here rather than in the saving request.
+            apply_pending_changes()
+            # Earlier work dates whose inputs changed since the last pass: only the changed employees are recomputed.
+            earlier_dates = sorted(changed_work_dates(changed_since, today - datetime.timedelta(days=1), site))
+            for day in earlier_dates: call_command('process_attendance', stdout=StringIO(), verbosity=0, date=day.isoformat(), changed_since=changed_since.isoformat(), **partition_options)
+            call_command('process_attendance', stdout=StringIO(), verbosity=0, **command_options, **partition_options)
+            if job == 'full': call_command('snapshot_balances', stdout=StringIO())
+        except Exception as exc:
+            lease = record_run(name, self.owner, error=exc)
+            if lease is None: self.stderr.write(f"{name}: {job} pass for {today} failed after the lease was taken over: {exc}"); return self.poll_seconds()
+            delay = min(self.max_backoff, 30 * 2 ** lease.consecutive_failures) * random.uniform(0.5, 1.5)
+            self.stderr.write(f"{name}: {job} pass for {today} failed ({lease.consecutive_failures} in a row), retrying in {delay:.0f}s: {exc}")
+            return delay
+        finally:
+            finished.set(); keeper.join()
+        if record_run(name, self.owner, **done_fields) is None:
+            self.stderr.write(f"Lease '{name}' was taken over during the {job} pass for {today}; its new owner keeps the schedule."); return self.poll_seconds()
+        self.stdout.write(self.style.SUCCESS(f"{name}: {job} pass for {today} finished{f' (and {len(earlier_dates)} earlier dates)' if earlier_dates else ''}."))
+        return self.poll_seconds()
+    def keep_lease(self, name, finished):
+        try:
+            while not finished.wait(self.lease_seconds / 3): acquire_lease(name, self.owner, self.lease_seconds)
+        finally: connection.close()
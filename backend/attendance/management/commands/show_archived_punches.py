@@ -0,0 +1,19 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from attendance.models import ArchivedMonth
+from attendance.archive import archived_punches
+
+class Command(BaseCommand):
+    help = 'Prints an employee\'s archived punches for a date range (audit access to the cold archive).'
+    def add_arguments(self, parser):
+        parser.add_argument('--employee-code', required=True)
+        parser.add_argument('--start-date', required=True, help='YYYY-MM-DD'); parser.add_argument('--end-date', required=True, help='YYYY-MM-DD, inclusive')
+    def handle(self, *args, **options):
+        try: start_date = datetime.date.fromisoformat(options['start_date']); end_date = datetime.date.fromisoformat(options['end_date'])
+        except ValueError: raise CommandError("Invalid --start-date/--end-date. Use YYYY-MM-DD.")
+        start = timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min)); end = timezone.make_aware(datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min))
+        months = list(ArchivedMonth.objects.filter(period_start__lt=end, period_end__gt=start).values_list('year', 'month'))
+        punches = archived_punches(options['employee_code'], start, end, months)
+        for timestamp in punches: self.stdout.write(timezone.localtime(timestamp).isoformat())
+        self.stdout.write(self.style.SUCCESS(f"{len(punches)} archived punches in {len(months)} archived month(s)."))
\ No newline at end of file
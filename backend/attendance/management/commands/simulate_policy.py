@@ -0,0 +1,53 @@
+import datetime
+import itertools
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from attendance.models import GlobalSettings, WorkShift
+from attendance.simulation import PeriodInputs, compare
+
+class Command(BaseCommand):
+    help = 'Re-scores a period under alternative grace period / penalty rate / shift day rules and reports the deltas. Writes nothing.'
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', required=True, help='First work date (YYYY-MM-DD).')
+        parser.add_argument('--end-date', required=True, help='Last work date (YYYY-MM-DD).')
+        parser.add_argument('--grace-period', type=int, nargs='+', help='Grace period minutes to sweep (defaults to the current setting).')
+        parser.add_argument('--penalty-rate', type=float, nargs='+', help='Penalty rates to sweep (defaults to the current setting).')
+        parser.add_argument('--rule', action='append', default=[], help='Day rule override SHIFT:DAY:HH:MM[:REQUIRED_MINUTES], or SHIFT:DAY:off. Repeatable.')
+        parser.add_argument('--details', action='store_true', help='Also list every affected employee.')
+        parser.add_argument('--json', action='store_true', help='Print the full result as JSON.')
+    def handle(self, *args, **options):
+        try:
+            start_date = datetime.date.fromisoformat(options['start_date']); end_date = datetime.date.fromisoformat(options['end_date'])
+        except ValueError: raise CommandError("Invalid --start-date/--end-date. Use YYYY-MM-DD.")
+        if end_date < start_date: raise CommandError("--end-date must not be before --start-date.")
+        if not GlobalSettings.objects.filter(pk=1).exists(): raise CommandError("FATAL: GlobalSettings not found. Please create the first settings object in the admin panel.")
+        rule_overrides = dict(self.parse_rule(value) for value in options['rule'])
+        started = time.perf_counter()
+        period = PeriodInputs(start_date, end_date); baseline = period.current_policy()
+        loaded = time.perf_counter()
+        results = []
+        for grace, rate in itertools.product(options['grace_period'] or [baseline.grace_period_minutes], options['penalty_rate'] or [baseline.penalty_rate]):
+            results.append({'grace_period_minutes': grace, 'penalty_rate': rate, **compare(period, baseline, period.policy(baseline, grace, rate, rule_overrides))})
+        if options['json']:
+            self.stdout.write(json.dumps({'start_date': start_date.isoformat(), 'end_date': end_date.isoformat(), 'results': results}, default=str)); return
+        self.stdout.write(f"{len(period)} employee-days loaded in {loaded - started:.2f}s; {len(results)} scenario(s) scored in {time.perf_counter() - loaded:.2f}s.")
+        self.stdout.write(f"Current policy: grace {baseline.grace_period_minutes}m, penalty rate {baseline.penalty_rate}.")
+        for result in results:
+            delta = result['aggregate']['delta']
+            self.stdout.write(self.style.SUCCESS(
+                f"grace {result['grace_period_minutes']}m, rate {result['penalty_rate']}: penalty {delta['penalty_minutes']:+}m, shortfall {delta['shortfall_minutes']:+}m, "
+                f"overtime {delta['overtime_minutes']:+}m, {result['aggregate']['employees_affected']} employee(s) affected"
+            ))
+            if options['details']:
+                for row in result['employees']: self.stdout.write(f"  {row['full_name']}: penalty {row['delta']['penalty_minutes']:+}m, shortfall {row['delta']['shortfall_minutes']:+}m, overtime {row['delta']['overtime_minutes']:+}m")
+    def parse_rule(self, value):
+        parts = value.split(':')
+        try:
+            shift = WorkShift.objects.get(name=parts[0]); day_of_week = int(parts[1])
+            if parts[2:] == ['off']: return (shift.pk, day_of_week), {'is_work_day': False}
+            changes = {'is_work_day': True, 'start_time': datetime.time(int(parts[2]), int(parts[3]))}
+            if len(parts) > 4: changes['required_work_minutes'] = int(parts[4])
+            return (shift.pk, day_of_week), changes
+        except WorkShift.DoesNotExist: raise CommandError(f"Unknown shift in --rule {value}.")
+        except (IndexError, ValueError): raise CommandError(f"Invalid --rule {value}. Use SHIFT:DAY:HH:MM[:REQUIRED_MINUTES] or SHIFT:DAY:off.")
\ No newline at end of file
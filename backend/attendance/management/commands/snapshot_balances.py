@@ -0,0 +1,7 @@
+from django.core.management.base import BaseCommand
+from attendance.ledger import take_snapshots
+
+class Command(BaseCommand):
+    help = 'Folds new overtime-bank and leave-balance movements into the per-employee balance snapshots.'
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"{take_snapshots()} balance snapshots written."))
\ No newline at end of file
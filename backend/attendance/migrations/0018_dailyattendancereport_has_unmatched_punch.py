@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0017_remove_leaverequest_requested_minutes_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyattendancereport',
+            name='has_unmatched_punch',
+            field=models.BooleanField(default=False),
+        ),
+    ]
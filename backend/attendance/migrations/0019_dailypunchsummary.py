@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0018_dailyattendancereport_has_unmatched_punch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPunchSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('first_punch', models.DateTimeField()),
+                ('last_punch', models.DateTimeField()),
+                ('punch_count', models.IntegerField(default=0)),
+                ('presence_minutes', models.IntegerField(default=0)),
+                ('has_unmatched_punch', models.BooleanField(default=False)),
+                ('packed_punches', models.BinaryField(default=bytes, help_text='Sorted punch times packed by attendance.intervals.pack_punches')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='punch_summaries', to='attendance.employee')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Punch Summaries',
+                'unique_together': {('employee', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0020_dailypunchsummary_updated_at_holiday_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='One lease per site; only its owner may run the processor', max_length=100, unique=True)),
+                ('owner', models.CharField(blank=True, max_length=255)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('last_full_run_date', models.DateField(blank=True, null=True)),
+                ('last_incremental_at', models.DateTimeField(blank=True, null=True)),
+                ('last_status', models.CharField(blank=True, max_length=20)),
+                ('last_error', models.TextField(blank=True)),
+                ('consecutive_failures', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
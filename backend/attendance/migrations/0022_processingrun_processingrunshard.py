@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0021_schedulerlease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('changed_since', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='RUNNING', max_length=10)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('checkpoint_date', models.DateField(blank=True, help_text='Work date the run continues from', null=True)),
+                ('checkpoint_employee_id', models.BigIntegerField(blank=True, help_text='Last employee id written for checkpoint_date', null=True)),
+                ('employees_processed', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProcessingRunShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('first_employee_id', models.BigIntegerField()),
+                ('last_employee_id', models.BigIntegerField()),
+                ('employee_count', models.IntegerField()),
+                ('completed_at', models.DateTimeField(auto_now_add=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='attendance.processingrun')),
+            ],
+            options={
+                'ordering': ['run', 'date', 'first_employee_id'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0022_processingrun_processingrunshard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PolicyChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('SHIFT_RULE', 'Shift Day Rule'), ('SETTINGS', 'Global Settings'), ('HOLIDAY', 'Holiday'), ('EMPLOYEE_SHIFT', 'Employee Shift')], max_length=20)),
+                ('description', models.CharField(max_length=255)),
+                ('changes', models.JSONField(default=dict, help_text='Changed field -> [old, new]')),
+                ('window_start', models.DateField()),
+                ('window_end', models.DateField()),
+                ('affected', models.JSONField(default=dict, help_text='Work date -> employee ids recomputed')),
+                ('affected_count', models.IntegerField(default=0)),
+                ('reports_changed', models.IntegerField(default=0)),
+                ('rebuild_summaries', models.BooleanField(default=False, help_text='Punch summaries are rebuilt first because overnight day boundaries moved')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('APPLIED', 'Applied'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('applied_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
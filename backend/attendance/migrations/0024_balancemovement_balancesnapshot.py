@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0023_policychange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(choices=[('OVERTIME', 'Overtime Bank'), ('LEAVE', 'Leave Balance')], max_length=10)),
+                ('source', models.CharField(choices=[('REPORT', 'Daily Report'), ('LEAVE_REQUEST', 'Leave Request'), ('ADJUSTMENT', 'Adjustment')], default='ADJUSTMENT', max_length=15)),
+                ('source_id', models.BigIntegerField(blank=True, help_text='Leave request id for leave movements', null=True)),
+                ('date', models.DateField()),
+                ('minutes', models.FloatField(help_text='Positive credits, negative debits')),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_movements', to='attendance.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['employee', 'account', 'date'], name='attendance__employe_99f578_idx'), models.Index(fields=['employee', 'id'], name='attendance__employe_b23902_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(choices=[('OVERTIME', 'Overtime Bank'), ('LEAVE', 'Leave Balance')], max_length=10)),
+                ('as_of_movement_id', models.BigIntegerField(help_text='Last BalanceMovement id included in the balance')),
+                ('balance', models.FloatField(default=0)),
+                ('taken_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='attendance.employee')),
+            ],
+            options={
+                'unique_together': {('employee', 'account')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0024_balancemovement_balancesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeFeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('UPSERT', 'Created or updated'), ('DELETE', 'Deleted')], default='UPSERT', max_length=6)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='change_feed', to='attendance.employee')),
+            ],
+            options={
+                'verbose_name_plural': 'Change feed entries',
+                'indexes': [models.Index(fields=['employee', 'id'], name='attendance__employe_07e5c2_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:48
+
+import attendance.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0025_changefeedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Terminal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('serial', models.CharField(max_length=100, unique=True)),
+                ('api_key', models.CharField(default=attendance.models.generate_terminal_key, help_text='Sent by the device in the X-Terminal-Key header', max_length=64, unique=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('acknowledged_sequence', models.BigIntegerField(default=0, help_text='Every punch up to this device sequence number is stored')),
+                ('clock_offset_seconds', models.FloatField(default=0, help_text='Server time minus device time at the last sync')),
+                ('clock_checked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_seen_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='rawattendancelog',
+            name='device_timestamp',
+            field=models.DateTimeField(blank=True, help_text='Timestamp as reported by the device, before skew correction', null=True),
+        ),
+        migrations.AddField(
+            model_name='rawattendancelog',
+            name='sequence',
+            field=models.BigIntegerField(blank=True, help_text='Device sequence number of the punch', null=True),
+        ),
+        migrations.AddField(
+            model_name='rawattendancelog',
+            name='terminal',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='punches', to='attendance.terminal'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='rawattendancelog',
+            unique_together={('terminal', 'sequence')},
+        ),
+    ]
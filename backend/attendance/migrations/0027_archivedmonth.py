@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0026_terminal_rawattendancelog_device_timestamp_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('path', models.CharField(max_length=500)),
+                ('employee_count', models.IntegerField(default=0)),
+                ('punch_count', models.IntegerField(default=0)),
+                ('compressed', models.BooleanField(default=True)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['year', 'month'],
+                'unique_together': {('year', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0027_archivedmonth'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailyattendancereport',
+            index=models.Index(fields=['date'], name='attendance__date_d6de43_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['date'], name='attendance__date_1a3c68_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['status', 'date'], name='attendance__status_d2d63d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='manuallogrequest',
+            index=models.Index(fields=['date'], name='attendance__date_0bd578_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='manuallogrequest',
+            index=models.Index(fields=['status', 'date'], name='attendance__status_ac2738_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='missionrequest',
+            index=models.Index(fields=['date'], name='attendance__date_4e70f9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='missionrequest',
+            index=models.Index(fields=['status', 'date'], name='attendance__status_9db6c4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='overtimerequest',
+            index=models.Index(fields=['date'], name='attendance__date_e94e22_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='overtimerequest',
+            index=models.Index(fields=['status', 'date'], name='attendance__status_bfffb0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rawattendancelog',
+            index=models.Index(fields=['employee_code', 'timestamp'], name='attendance__employe_990d0b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rawattendancelog',
+            index=models.Index(fields=['timestamp'], name='attendance__timesta_9762dd_idx'),
+        ),
+    ]
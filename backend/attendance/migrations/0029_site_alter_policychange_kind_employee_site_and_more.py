@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:59
+
+import attendance.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0028_dailyattendancereport_attendance__date_d6de43_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Site',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('timezone', models.CharField(default='UTC', help_text="IANA name, e.g. Asia/Tehran; work days of the site's employees are cut at its local midnight", max_length=64, validators=[attendance.models.validate_timezone])),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='policychange',
+            name='kind',
+            field=models.CharField(choices=[('SHIFT_RULE', 'Shift Day Rule'), ('SETTINGS', 'Global Settings'), ('HOLIDAY', 'Holiday'), ('EMPLOYEE_SHIFT', 'Employee Shift'), ('EMPLOYEE_SITE', 'Employee Site'), ('SITE_TIMEZONE', 'Site Time Zone')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='site',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='employees', to='attendance.site'),
+        ),
+        migrations.AddField(
+            model_name='processingrun',
+            name='site',
+            field=models.ForeignKey(blank=True, help_text='Partition processed; empty for employees without a site', null=True, on_delete=django.db.models.deletion.SET_NULL, to='attendance.site'),
+        ),
+        migrations.AddField(
+            model_name='terminal',
+            name='site',
+            field=models.ForeignKey(blank=True, help_text="Naive device timestamps are read in this site's time zone", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='terminals', to='attendance.site'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 20:03
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_assignments(apps, schema_editor):
+    # Every existing employee starts with one assignment for their current shift, which (being the first) covers all history.
+    Employee = apps.get_model('attendance', 'Employee'); ShiftAssignment = apps.get_model('attendance', 'ShiftAssignment')
+    ShiftAssignment.objects.bulk_create([
+        ShiftAssignment(employee_id=employee_id, shift_id=shift_id, effective_from=datetime.date(1970, 1, 1))
+        for employee_id, shift_id in Employee.objects.filter(shift__isnull=False).values_list('id', 'shift_id')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0029_site_alter_policychange_kind_employee_site_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effective_from', models.DateField(help_text="Applies until the employee's next assignment; the first assignment also covers every earlier day")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_assignments', to='attendance.employee')),
+                ('shift', models.ForeignKey(blank=True, help_text='Empty: no shift from this date', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assignments', to='attendance.workshift')),
+            ],
+            options={
+                'ordering': ['employee', 'effective_from'],
+                'unique_together': {('employee', 'effective_from')},
+            },
+        ),
+        migrations.RunPython(seed_assignments, migrations.RunPython.noop),
+    ]
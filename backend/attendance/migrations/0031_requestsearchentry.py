@@ -0,0 +1,75 @@
+# Generated by Django 5.2.6 on 2026-10-19 20:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'attendance_requestsearchentry_fts'
+SQLITE_FTS = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(document, content='attendance_requestsearchentry', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER attendance_requestsearchentry_fts_ai AFTER INSERT ON attendance_requestsearchentry BEGIN INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.id, new.document); END",
+    f"CREATE TRIGGER attendance_requestsearchentry_fts_ad AFTER DELETE ON attendance_requestsearchentry BEGIN INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.id, old.document); END",
+    f"CREATE TRIGGER attendance_requestsearchentry_fts_au AFTER UPDATE OF document ON attendance_requestsearchentry BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.id, old.document); INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.id, new.document); END",
+]
+SQLITE_FTS_DROP = [f"DROP TABLE IF EXISTS {FTS_TABLE}"] + [f"DROP TRIGGER IF EXISTS attendance_requestsearchentry_fts_{suffix}" for suffix in ('ai', 'ad', 'au')]
+POSTGRES_INDEX = "CREATE INDEX attendance_requestsearchentry_document_fts ON attendance_requestsearchentry USING gin (to_tsvector('simple', document))"
+POSTGRES_INDEX_DROP = "DROP INDEX IF EXISTS attendance_requestsearchentry_document_fts"
+
+
+def create_full_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql': schema_editor.execute(POSTGRES_INDEX)
+    elif vendor == 'sqlite':
+        # SQLite builds without FTS5 keep working: attendance.search falls back to substring scans when the table is missing.
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]: return
+        for statement in SQLITE_FTS: schema_editor.execute(statement)
+
+
+def drop_full_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql': schema_editor.execute(POSTGRES_INDEX_DROP)
+    elif vendor == 'sqlite':
+        for statement in SQLITE_FTS_DROP: schema_editor.execute(statement)
+
+
+def index_existing_requests(apps, schema_editor):
+    Entry = apps.get_model('attendance', 'RequestSearchEntry')
+    for kind, name in (('overtime', 'OvertimeRequest'), ('leave', 'LeaveRequest'), ('mission', 'MissionRequest'), ('logs', 'ManualLogRequest')):
+        model = apps.get_model('attendance', name); has_destination = name == 'MissionRequest'
+        entries = [
+            Entry(kind=kind, request_id=row.pk, employee_id=row.employee_id, date=row.date, status=row.status, document='\n'.join(text for text in ((row.destination if has_destination else None), row.reason) if text))
+            for row in model.objects.iterator(chunk_size=2000)
+        ]
+        Entry.objects.bulk_create(entries, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0030_shiftassignment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestSearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('request_id', models.BigIntegerField()),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=10)),
+                ('document', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='attendance.employee')),
+            ],
+            options={
+                'verbose_name_plural': 'Request search entries',
+                'indexes': [models.Index(fields=['kind', 'status', 'date'], name='attendance__kind_72e08c_idx'), models.Index(fields=['employee', 'date'], name='attendance__employe_c255e0_idx')],
+                'unique_together': {('kind', 'request_id')},
+            },
+        ),
+        migrations.RunPython(create_full_text_index, drop_full_text_index),
+        migrations.RunPython(index_existing_requests, migrations.RunPython.noop),
+    ]
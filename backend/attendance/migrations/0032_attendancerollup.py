@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 20:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0031_requestsearchentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('employees', models.PositiveIntegerField(default=0)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('on_leave', models.PositiveIntegerField(default=0)),
+                ('on_mission', models.PositiveIntegerField(default=0)),
+                ('off', models.PositiveIntegerField(default=0, help_text='Holidays and scheduled days off')),
+                ('late', models.PositiveIntegerField(default=0)),
+                ('late_minutes', models.PositiveIntegerField(default=0)),
+                ('arrival_histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('manager', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='team_rollups', to='attendance.employee')),
+                ('shift', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='attendance.workshift')),
+                ('site', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='attendance.site')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'site'], name='attendance__date_c14755_idx'), models.Index(fields=['shift', 'date'], name='attendance__shift_i_d45797_idx'), models.Index(fields=['manager', 'date'], name='attendance__manager_d79e0f_idx')],
+            },
+        ),
+    ]
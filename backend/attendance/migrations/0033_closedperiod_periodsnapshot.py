@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-19 20:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0032_attendancerollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosedPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('employee_count', models.IntegerField(default=0)),
+                ('report_count', models.IntegerField(default=0)),
+                ('totals', models.JSONField(default=dict)),
+                ('checksum', models.CharField(help_text="SHA-256 of the snapshots' packed reports, in employee order", max_length=64)),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='closed_periods', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['year', 'month'],
+                'unique_together': {('year', 'month')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PeriodSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_count', models.IntegerField(default=0)),
+                ('packed_reports', models.BinaryField()),
+                ('totals', models.JSONField(default=dict)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='period_snapshots', to='attendance.employee')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='attendance.closedperiod')),
+            ],
+            options={
+                'unique_together': {('period', 'employee')},
+            },
+        ),
+    ]
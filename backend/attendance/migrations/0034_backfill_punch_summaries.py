@@ -0,0 +1,49 @@
+import datetime
+import zoneinfo
+from collections import defaultdict
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill_summaries(apps, schema_editor):
+    # Punches written straight to RawAttendanceLog (terminal imports, fixtures, the admin) before every write kept the summaries
+    # in sync. Each employee's stored punches are bucketed in their site's time zone under the shift assigned on each date; days
+    # of archived months are left alone, their punches are no longer all in the table.
+    from attendance.assignments import ShiftHistory
+    from attendance.intervals import pack_punches, pair_punches, work_date_for
+    Employee = apps.get_model('attendance', 'Employee'); ShiftDayRule = apps.get_model('attendance', 'ShiftDayRule'); ShiftAssignment = apps.get_model('attendance', 'ShiftAssignment')
+    RawAttendanceLog = apps.get_model('attendance', 'RawAttendanceLog'); DailyPunchSummary = apps.get_model('attendance', 'DailyPunchSummary'); ArchivedMonth = apps.get_model('attendance', 'ArchivedMonth')
+    rules_by_shift = defaultdict(dict); assignments = defaultdict(list)
+    for rule in ShiftDayRule.objects.all(): rules_by_shift[rule.shift_id][rule.day_of_week] = rule
+    for employee_id, effective_from, shift_id in ShiftAssignment.objects.order_by('employee_id', 'effective_from').values_list('employee_id', 'effective_from', 'shift_id'): assignments[employee_id].append((effective_from, shift_id))
+    archived = list(ArchivedMonth.objects.values_list('period_start', 'period_end'))
+    for employee in Employee.objects.select_related('site'):
+        # As ShiftTimeline.history: without assignments, the current shift covers every date.
+        timeline = assignments[employee.pk] or ([(datetime.date.min, employee.shift_id)] if employee.shift_id else [])
+        history = ShiftHistory([start for start, _ in timeline], [shift_id for _, shift_id in timeline], rules_by_shift)
+        by_date = defaultdict(list)
+        with timezone.override(zoneinfo.ZoneInfo(employee.site.timezone) if employee.site_id else timezone.get_default_timezone()):
+            for timestamp in RawAttendanceLog.objects.filter(employee_code=employee.employee_code).order_by('timestamp').values_list('timestamp', flat=True).iterator(chunk_size=5000):
+                if not any(start <= timestamp < end for start, end in archived): by_date[work_date_for(timestamp, history)].append(timestamp)
+        existing = {summary.date: summary for summary in DailyPunchSummary.objects.filter(employee=employee, date__in=list(by_date))}
+        created = []
+        for work_date, timestamps in by_date.items():
+            punches = pair_punches(timestamps)
+            values = {'first_punch': punches.first, 'last_punch': punches.last, 'punch_count': punches.count, 'presence_minutes': punches.presence_minutes, 'has_unmatched_punch': punches.has_unmatched_punch, 'packed_punches': pack_punches(punches.punches)}
+            summary = existing.get(work_date)
+            if summary is None: created.append(DailyPunchSummary(employee=employee, date=work_date, **values))
+            elif bytes(summary.packed_punches) != values['packed_punches']:
+                for name, value in values.items(): setattr(summary, name, value)
+                summary.save()
+        DailyPunchSummary.objects.bulk_create(created, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0033_closedperiod_periodsnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
\ No newline at end of file
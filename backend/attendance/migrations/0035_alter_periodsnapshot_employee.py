@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 20:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0034_backfill_punch_summaries'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='periodsnapshot',
+            name='employee',
+            field=models.ForeignKey(help_text="Kept when the employee is deleted: the snapshot is part of the month's checksum", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='period_snapshots', to='attendance.employee'),
+        ),
+    ]
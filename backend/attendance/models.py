@@ -1,12 +1,25 @@
 from django.db import models
 from django.contrib.auth.models import User
 import datetime
+import secrets
+import zoneinfo
+from django.conf import settings
+from django.core.exceptions import ValidationError
 
 class GlobalSettings(models.Model):
     grace_period_minutes = models.IntegerField(default=90)
     penalty_rate = models.DecimalField(default=1.4, max_digits=3, decimal_places=2)
     def __str__(self): return "Company-Wide Settings"
     class Meta: verbose_name_plural = "Global Settings"
+def validate_timezone(value):
+    if value not in zoneinfo.available_timezones(): raise ValidationError(f"{value} is not an IANA time zone name.")
+class Site(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    timezone = models.CharField(max_length=64, default=settings.TIME_ZONE, validators=[validate_timezone], help_text="IANA name, e.g. Asia/Tehran; work days of the site's employees are cut at its local midnight")
+    updated_at = models.DateTimeField(auto_now=True)
+    def __str__(self): return f"{self.name} ({self.timezone})"
+    @property
+    def tzinfo(self): return zoneinfo.ZoneInfo(self.timezone)
 class WorkShift(models.Model):
     name = models.CharField(max_length=100, unique=True)
     def __str__(self): return self.name
@@ -18,6 +31,7 @@ class ShiftDayRule(models.Model):
     start_time = models.TimeField(default=datetime.time(8, 0))
     end_time = models.TimeField(default=datetime.time(16, 45))
     required_work_minutes = models.IntegerField(default=525)
+    updated_at = models.DateTimeField(auto_now=True)
     class Meta: unique_together = ('shift', 'day_of_week'); ordering = ['day_of_week']
     def __str__(self): return f"{self.shift.name} - {self.get_day_of_week_display()}"
 class Employee(models.Model):
@@ -26,7 +40,15 @@ class Employee(models.Model):
     employee_code = models.CharField(max_length=50, unique=True)
     shift = models.ForeignKey(WorkShift, on_delete=models.SET_NULL, null=True, blank=True)
     manager = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='subordinates')
+    site = models.ForeignKey(Site, on_delete=models.SET_NULL, null=True, blank=True, related_name='employees')
     def __str__(self): return self.full_name
+class ShiftAssignment(models.Model):
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='shift_assignments')
+    shift = models.ForeignKey(WorkShift, on_delete=models.SET_NULL, null=True, blank=True, related_name='assignments', help_text="Empty: no shift from this date")
+    effective_from = models.DateField(help_text="Applies until the employee's next assignment; the first assignment also covers every earlier day")
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta: unique_together = ('employee', 'effective_from'); ordering = ['employee', 'effective_from']
+    def __str__(self): return f"{self.employee.full_name}: {self.shift or 'no shift'} from {self.effective_from}"
 class OvertimeRequest(models.Model):
     STATUS_PENDING = 'PENDING'; STATUS_APPROVED = 'APPROVED'; STATUS_REJECTED = 'REJECTED'
     STATUS_CHOICES = [(STATUS_PENDING, 'Pending'), (STATUS_APPROVED, 'Approved'), (STATUS_REJECTED, 'Rejected')]
@@ -35,11 +57,37 @@ class OvertimeRequest(models.Model):
     requested_minutes = models.IntegerField(default=0)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
     reason = models.TextField(blank=True, null=True)
-    class Meta: unique_together = ('employee', 'date')
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta: unique_together = ('employee', 'date'); indexes = [models.Index(fields=['date']), models.Index(fields=['status', 'date'])]
     def __str__(self): return f"{self.employee.full_name} on {self.date} - Status: {self.get_status_display()}"
+def generate_terminal_key(): return secrets.token_hex(20)
+class Terminal(models.Model):
+    name = models.CharField(max_length=100)
+    serial = models.CharField(max_length=100, unique=True)
+    site = models.ForeignKey(Site, on_delete=models.SET_NULL, null=True, blank=True, related_name='terminals', help_text="Naive device timestamps are read in this site's time zone")
+    api_key = models.CharField(max_length=64, unique=True, default=generate_terminal_key, help_text="Sent by the device in the X-Terminal-Key header")
+    is_active = models.BooleanField(default=True)
+    acknowledged_sequence = models.BigIntegerField(default=0, help_text="Every punch up to this device sequence number is stored")
+    clock_offset_seconds = models.FloatField(default=0, help_text="Server time minus device time at the last sync")
+    clock_checked_at = models.DateTimeField(null=True, blank=True); last_seen_at = models.DateTimeField(null=True, blank=True)
+    def __str__(self): return f"{self.name} ({self.serial})"
 class RawAttendanceLog(models.Model):
     employee_code = models.CharField(max_length=50)
     timestamp = models.DateTimeField()
+    terminal = models.ForeignKey(Terminal, on_delete=models.PROTECT, null=True, blank=True, related_name='punches')
+    sequence = models.BigIntegerField(null=True, blank=True, help_text="Device sequence number of the punch")
+    device_timestamp = models.DateTimeField(null=True, blank=True, help_text="Timestamp as reported by the device, before skew correction")
+    class Meta: unique_together = ('terminal', 'sequence'); indexes = [models.Index(fields=['employee_code', 'timestamp']), models.Index(fields=['timestamp'])]
+class DailyPunchSummary(models.Model):
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='punch_summaries')
+    date = models.DateField()
+    first_punch = models.DateTimeField(); last_punch = models.DateTimeField()
+    punch_count = models.IntegerField(default=0); presence_minutes = models.IntegerField(default=0)
+    has_unmatched_punch = models.BooleanField(default=False)
+    packed_punches = models.BinaryField(default=bytes, help_text="Sorted punch times packed by attendance.intervals.pack_punches")
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta: unique_together = ('employee', 'date'); verbose_name_plural = "Daily Punch Summaries"
+    def __str__(self): return f"{self.employee_id} on {self.date} ({self.punch_count} punches)"
 class DailyAttendanceReport(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
     date = models.DateField()
@@ -47,7 +95,9 @@ class DailyAttendanceReport(models.Model):
     total_lateness_minutes = models.IntegerField(default=0); penalty_minutes = models.FloatField(default=0)
     required_work_minutes_today = models.FloatField(default=525); total_worked_minutes = models.IntegerField(default=0)
     work_shortfall_minutes = models.IntegerField(default=0); work_overtime_minutes = models.IntegerField(default=0)
-    class Meta: unique_together = ('employee', 'date')
+    has_unmatched_punch = models.BooleanField(default=False)
+    class Meta: unique_together = ('employee', 'date'); indexes = [models.Index(fields=['date'])]
+    def __str__(self): return f"{self.employee.full_name} on {self.date}"
 class LeaveRequest(models.Model):
     STATUS_PENDING = 'PENDING'; STATUS_APPROVED = 'APPROVED'; STATUS_REJECTED = 'REJECTED'
     STATUS_CHOICES = [(STATUS_PENDING, 'Pending'), (STATUS_APPROVED, 'Approved'), (STATUS_REJECTED, 'Rejected')]
@@ -60,11 +110,13 @@ class LeaveRequest(models.Model):
     start_time = models.TimeField(null=True, blank=True)
     end_time = models.TimeField(null=True, blank=True)
     reason = models.TextField(blank=True, null=True)
-    class Meta: unique_together = ('employee', 'date')
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta: unique_together = ('employee', 'date'); indexes = [models.Index(fields=['date']), models.Index(fields=['status', 'date'])]
     def __str__(self): return f"{self.employee.full_name} on {self.date} ({self.get_leave_type_display()}) - {self.get_status_display()}"
 class Holiday(models.Model):
     date = models.DateField(unique=True)
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
     def __str__(self): return f"{self.date} - {self.name}"
     class Meta: ordering = ['date']
 class MissionRequest(models.Model):
@@ -80,7 +132,8 @@ class MissionRequest(models.Model):
     end_time = models.TimeField(null=True, blank=True, help_text="End time for hourly mission")
     destination = models.CharField(max_length=255, blank=True, null=True)
     reason = models.TextField(blank=True, null=True)
-    class Meta: unique_together = ('employee', 'date')
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta: unique_together = ('employee', 'date'); indexes = [models.Index(fields=['date']), models.Index(fields=['status', 'date'])]
     def __str__(self): return f"{self.employee.full_name} on {self.date} ({self.get_mission_type_display()}) - {self.get_status_display()}"
 class ManualLogRequest(models.Model):
     STATUS_PENDING = 'PENDING'; STATUS_APPROVED = 'APPROVED'; STATUS_REJECTED = 'REJECTED'
@@ -93,4 +146,145 @@ class ManualLogRequest(models.Model):
     log_type = models.CharField(max_length=3, choices=LOG_TYPE_CHOICES)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
     reason = models.TextField(blank=True, null=True)
-    def __str__(self): return f"{self.employee.full_name} - {self.date} @ {self.time} ({self.get_log_type_display()}) - {self.get_status_display()}"
\ No newline at end of file
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta: indexes = [models.Index(fields=['date']), models.Index(fields=['status', 'date'])]
+    def __str__(self): return f"{self.employee.full_name} - {self.date} @ {self.time} ({self.get_log_type_display()}) - {self.get_status_display()}"
+class SchedulerLease(models.Model):
+    name = models.CharField(max_length=100, unique=True, help_text="One lease per site; only its owner may run the processor")
+    owner = models.CharField(max_length=255, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True); heartbeat_at = models.DateTimeField(null=True, blank=True)
+    last_full_run_date = models.DateField(null=True, blank=True); last_incremental_at = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=20, blank=True); last_error = models.TextField(blank=True)
+    consecutive_failures = models.IntegerField(default=0)
+    def __str__(self): return f"{self.name} ({self.owner or 'free'})"
+class ProcessingRun(models.Model):
+    STATUS_RUNNING = 'RUNNING'; STATUS_COMPLETED = 'COMPLETED'; STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [(STATUS_RUNNING, 'Running'), (STATUS_COMPLETED, 'Completed'), (STATUS_FAILED, 'Failed')]
+    start_date = models.DateField(); end_date = models.DateField()
+    changed_since = models.DateTimeField(null=True, blank=True)
+    site = models.ForeignKey(Site, on_delete=models.SET_NULL, null=True, blank=True, help_text="Partition processed; empty for employees without a site")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    started_at = models.DateTimeField(auto_now_add=True); finished_at = models.DateTimeField(null=True, blank=True)
+    checkpoint_date = models.DateField(null=True, blank=True, help_text="Work date the run continues from")
+    checkpoint_employee_id = models.BigIntegerField(null=True, blank=True, help_text="Last employee id written for checkpoint_date")
+    employees_processed = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    def __str__(self): return f"Run {self.pk} {self.start_date}..{self.end_date} - {self.get_status_display()}"
+class ProcessingRunShard(models.Model):
+    run = models.ForeignKey(ProcessingRun, on_delete=models.CASCADE, related_name='shards')
+    date = models.DateField()
+    first_employee_id = models.BigIntegerField(); last_employee_id = models.BigIntegerField()
+    employee_count = models.IntegerField()
+    completed_at = models.DateTimeField(auto_now_add=True)
+    class Meta: ordering = ['run', 'date', 'first_employee_id']
+
+class PolicyChange(models.Model):
+    KIND_SHIFT_RULE = 'SHIFT_RULE'; KIND_SETTINGS = 'SETTINGS'; KIND_HOLIDAY = 'HOLIDAY'; KIND_EMPLOYEE_SHIFT = 'EMPLOYEE_SHIFT'; KIND_EMPLOYEE_SITE = 'EMPLOYEE_SITE'; KIND_SITE_TIMEZONE = 'SITE_TIMEZONE'
+    KIND_CHOICES = [(KIND_SHIFT_RULE, 'Shift Day Rule'), (KIND_SETTINGS, 'Global Settings'), (KIND_HOLIDAY, 'Holiday'), (KIND_EMPLOYEE_SHIFT, 'Employee Shift'), (KIND_EMPLOYEE_SITE, 'Employee Site'), (KIND_SITE_TIMEZONE, 'Site Time Zone')]
+    STATUS_PENDING = 'PENDING'; STATUS_APPLIED = 'APPLIED'; STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [(STATUS_PENDING, 'Pending'), (STATUS_APPLIED, 'Applied'), (STATUS_FAILED, 'Failed')]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    description = models.CharField(max_length=255)
+    changes = models.JSONField(default=dict, help_text="Changed field -> [old, new]")
+    window_start = models.DateField(); window_end = models.DateField()
+    affected = models.JSONField(default=dict, help_text="Work date -> employee ids recomputed")
+    affected_count = models.IntegerField(default=0); reports_changed = models.IntegerField(default=0)
+    rebuild_summaries = models.BooleanField(default=False, help_text="Punch summaries are rebuilt first because overnight day boundaries moved")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True); applied_at = models.DateTimeField(null=True, blank=True)
+    class Meta: ordering = ['-created_at']
+    def __str__(self): return f"{self.get_kind_display()}: {self.description} - {self.get_status_display()}"
+class BalanceMovement(models.Model):
+    ACCOUNT_OVERTIME = 'OVERTIME'; ACCOUNT_LEAVE = 'LEAVE'
+    ACCOUNT_CHOICES = [(ACCOUNT_OVERTIME, 'Overtime Bank'), (ACCOUNT_LEAVE, 'Leave Balance')]
+    SOURCE_REPORT = 'REPORT'; SOURCE_LEAVE_REQUEST = 'LEAVE_REQUEST'; SOURCE_ADJUSTMENT = 'ADJUSTMENT'
+    SOURCE_CHOICES = [(SOURCE_REPORT, 'Daily Report'), (SOURCE_LEAVE_REQUEST, 'Leave Request'), (SOURCE_ADJUSTMENT, 'Adjustment')]
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='balance_movements')
+    account = models.CharField(max_length=10, choices=ACCOUNT_CHOICES)
+    source = models.CharField(max_length=15, choices=SOURCE_CHOICES, default=SOURCE_ADJUSTMENT)
+    source_id = models.BigIntegerField(null=True, blank=True, help_text="Leave request id for leave movements")
+    date = models.DateField()
+    minutes = models.FloatField(help_text="Positive credits, negative debits")
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta: indexes = [models.Index(fields=['employee', 'account', 'date']), models.Index(fields=['employee', 'id'])]
+    def __str__(self): return f"{self.employee.full_name} {self.get_account_display()} {self.minutes:+g}m on {self.date}"
+class BalanceSnapshot(models.Model):
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='balance_snapshots')
+    account = models.CharField(max_length=10, choices=BalanceMovement.ACCOUNT_CHOICES)
+    as_of_movement_id = models.BigIntegerField(help_text="Last BalanceMovement id included in the balance")
+    balance = models.FloatField(default=0)
+    taken_at = models.DateTimeField(auto_now=True)
+    class Meta: unique_together = ('employee', 'account')
+    def __str__(self): return f"{self.employee.full_name} {self.get_account_display()}: {self.balance:g}m"
+class ChangeFeedEntry(models.Model):
+    ACTION_UPSERT = 'UPSERT'; ACTION_DELETE = 'DELETE'
+    ACTION_CHOICES = [(ACTION_UPSERT, 'Created or updated'), (ACTION_DELETE, 'Deleted')]
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='change_feed')
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES, default=ACTION_UPSERT)
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta: indexes = [models.Index(fields=['employee', 'id'])]; verbose_name_plural = "Change feed entries"
+    def __str__(self): return f"#{self.pk} {self.kind} {self.object_id} {self.action}"
+class RequestSearchEntry(models.Model):
+    """The searchable text of one request (reason, mission destination) with its filters, kept in sync by attendance.search.
+    The full-text index is built over `document` outside the ORM: FTS5 on SQLite, a GIN tsvector index on PostgreSQL."""
+    kind = models.CharField(max_length=20)
+    request_id = models.BigIntegerField()
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='search_entries')
+    date = models.DateField()
+    status = models.CharField(max_length=10)
+    document = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta: unique_together = ('kind', 'request_id'); indexes = [models.Index(fields=['kind', 'status', 'date']), models.Index(fields=['employee', 'date'])]; verbose_name_plural = "Request search entries"
+    def __str__(self): return f"{self.kind} #{self.request_id}"
+class AttendanceRollup(models.Model):
+    """Counters of one (site, shift, manager) group on one work date, rebuilt whenever that date's reports are computed (see
+    attendance.analytics). `arrival_histogram` counts arrivals per ARRIVAL_BUCKETS bucket, in minutes relative to the shift start."""
+    date = models.DateField()
+    site = models.ForeignKey(Site, on_delete=models.CASCADE, null=True, blank=True, related_name='rollups')
+    shift = models.ForeignKey(WorkShift, on_delete=models.CASCADE, null=True, blank=True, related_name='rollups')
+    manager = models.ForeignKey(Employee, on_delete=models.CASCADE, null=True, blank=True, related_name='team_rollups')
+    employees = models.PositiveIntegerField(default=0)
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    on_leave = models.PositiveIntegerField(default=0)
+    on_mission = models.PositiveIntegerField(default=0)
+    off = models.PositiveIntegerField(default=0, help_text="Holidays and scheduled days off")
+    late = models.PositiveIntegerField(default=0)
+    late_minutes = models.PositiveIntegerField(default=0)
+    arrival_histogram = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta: indexes = [models.Index(fields=['date', 'site']), models.Index(fields=['shift', 'date']), models.Index(fields=['manager', 'date'])]
+    def __str__(self): return f"{self.date} {self.site or '-'} / {self.shift or '-'} / {self.manager or '-'}"
+class ArchivedMonth(models.Model):
+    year = models.IntegerField(); month = models.IntegerField()
+    period_start = models.DateTimeField(); period_end = models.DateTimeField()
+    path = models.CharField(max_length=500)
+    employee_count = models.IntegerField(default=0); punch_count = models.IntegerField(default=0)
+    compressed = models.BooleanField(default=True)
+    archived_at = models.DateTimeField(auto_now=True)
+    class Meta: unique_together = ('year', 'month'); ordering = ['year', 'month']
+    def __str__(self): return f"{self.year:04d}-{self.month:02d} ({self.punch_count} punches)"
+class ClosedPeriod(models.Model):
+    """A finalized month. Its DailyAttendanceReport rows live on packed in PeriodSnapshot rows (see attendance.periods): nothing
+    recomputes the month any more and every read of it comes from the snapshots."""
+    year = models.IntegerField(); month = models.IntegerField()
+    period_start = models.DateField(); period_end = models.DateField()
+    closed_at = models.DateTimeField(auto_now_add=True)
+    closed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='closed_periods')
+    employee_count = models.IntegerField(default=0); report_count = models.IntegerField(default=0)
+    totals = models.JSONField(default=dict)
+    checksum = models.CharField(max_length=64, help_text="SHA-256 of the snapshots' packed reports, in employee order")
+    class Meta: unique_together = ('year', 'month'); ordering = ['year', 'month']
+    def __str__(self): return f"{self.year:04d}-{self.month:02d} ({self.report_count} reports)"
+class PeriodSnapshot(models.Model):
+    period = models.ForeignKey(ClosedPeriod, on_delete=models.CASCADE, related_name='snapshots')
+    employee = models.ForeignKey(Employee, on_delete=models.SET_NULL, null=True, related_name='period_snapshots', help_text="Kept when the employee is deleted: the snapshot is part of the month's checksum")
+    report_count = models.IntegerField(default=0)
+    packed_reports = models.BinaryField()
+    totals = models.JSONField(default=dict)
+    class Meta: unique_together = ('period', 'employee')
+    def __str__(self): return f"{self.employee.full_name if self.employee else 'Deleted employee'} in {self.period}"
\ No newline at end of file
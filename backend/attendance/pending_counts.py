@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Value, CharField
+from .models import Employee, OvertimeRequest, LeaveRequest, MissionRequest, ManualLogRequest
+
+REQUEST_KINDS = (('logs', ManualLogRequest), ('overtime', OvertimeRequest), ('leave', LeaveRequest), ('mission', MissionRequest))
+CACHE_TIMEOUT = 300
+
+def _cache_key(manager_id): return f"pending-counts:{manager_id}"
+
+def compute_pending_counts(team_ids):
+    """Per-employee pending counts for every request kind, from one UNION ALL of grouped aggregates."""
+    grouped = [
+        model.objects.filter(employee_id__in=team_ids, status=model.STATUS_PENDING).order_by().values('employee_id')
+        .annotate(kind=Value(kind, output_field=CharField()), total=Count('id')).values_list('kind', 'employee_id', 'total')
+        for kind, model in REQUEST_KINDS
+    ]
+    by_employee = {}
+    for kind, employee_id, total in grouped[0].union(*grouped[1:], all=True):
+        by_employee.setdefault(employee_id, {name: 0 for name, _ in REQUEST_KINDS})[kind] = total
+    return by_employee
+
+def pending_counts(manager_employee, team_ids):
+    key = _cache_key(manager_employee.id); by_employee = cache.get(key)
+    if by_employee is None:
+        by_employee = compute_pending_counts(team_ids); cache.set(key, by_employee, CACHE_TIMEOUT)
+    return by_employee
+
+def invalidate_pending_counts(employee_ids):
+    """Drops the cached counts of every manager whose team contains one of these employees (a manager is in their own team).
+    The drop waits for the surrounding transaction to commit, so no other worker can re-cache the counts from before it."""
+    employee_ids = set(employee_ids)
+    manager_ids = set(Employee.objects.filter(id__in=employee_ids, manager__isnull=False).values_list('manager_id', flat=True))
+    keys = [_cache_key(manager_id) for manager_id in employee_ids | manager_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
\ No newline at end of file
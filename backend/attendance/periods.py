@@ -0,0 +1,135 @@
+"""Closed (finalized) months. Closing a month packs its DailyAttendanceReport rows into one PeriodSnapshot per employee,
+records the totals and moves the live rows out; from then on nothing recomputes the month and reads of it come from the snapshots.
+
+A snapshot holds the zlib-compressed REPORT_ROW records of one employee's month, ordered by date."""
+import datetime
+import hashlib
+import struct
+import zlib
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import ClosedPeriod, PeriodSnapshot, DailyAttendanceReport
+from .archive import moving_rows
+from .reports import iter_dates
+
+# Day of month, check-in and check-out in microseconds since midnight (-1 when missing), lateness, penalty, required, worked,
+# shortfall and overtime minutes, unmatched punch flag.
+REPORT_ROW = struct.Struct('<Bqqiddiii?')
+REPORT_FIELDS = ('first_check_in', 'last_check_out', 'total_lateness_minutes', 'penalty_minutes', 'required_work_minutes_today', 'total_worked_minutes', 'work_shortfall_minutes', 'work_overtime_minutes', 'has_unmatched_punch')
+TOTALS = {'worked_minutes': 'total_worked_minutes', 'required_minutes': 'required_work_minutes_today', 'lateness_minutes': 'total_lateness_minutes', 'penalty_minutes': 'penalty_minutes', 'shortfall_minutes': 'work_shortfall_minutes', 'overtime_minutes': 'work_overtime_minutes'}
+CLOSED_RANGES_KEY = 'closed-periods'
+CLOSED_RANGES_TIMEOUT = 300
+
+class PeriodClosed(Exception):
+    """Something tried to change a closed month."""
+
+def month_dates(year, month):
+    start = datetime.date(year, month, 1)
+    return start, (start + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+
+# --- Which dates are closed ---
+
+def closed_ranges():
+    """(first, last) date of every closed month, cached; closing a month drops the cache once it commits."""
+    ranges = cache.get(CLOSED_RANGES_KEY)
+    if ranges is None: ranges = list(ClosedPeriod.objects.order_by('period_start').values_list('period_start', 'period_end')); cache.set(CLOSED_RANGES_KEY, ranges, CLOSED_RANGES_TIMEOUT)
+    return ranges
+
+def is_closed(day): return any(start <= day <= end for start, end in closed_ranges())
+
+def ensure_open(day):
+    """The write guard reads the database: a cached range list could still miss a month another process just closed."""
+    if ClosedPeriod.objects.filter(period_start__lte=day, period_end__gte=day).exists(): raise PeriodClosed(f"{day:%Y-%m} is closed.")
+
+def closed_dates(start_date, end_date):
+    """Closed dates of the range, read from the database rather than the cache: callers use it right before writing."""
+    dates = set()
+    for start, end in ClosedPeriod.objects.filter(period_start__lte=end_date, period_end__gte=start_date).values_list('period_start', 'period_end'):
+        dates.update(iter_dates(max(start, start_date), min(end, end_date)))
+    return dates
+
+# --- Packing ---
+
+def _micros(value): return -1 if value is None else ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
+
+def _time(micros):
+    if micros < 0: return None
+    seconds, microsecond = divmod(micros, 1000000); minutes, second = divmod(seconds, 60)
+    return datetime.time(minutes // 60, minutes % 60, second, microsecond)
+
+def pack_reports(rows):
+    """`rows` are (date, *REPORT_FIELDS) tuples of one employee and month, by date."""
+    return zlib.compress(b''.join(REPORT_ROW.pack(day.day, _micros(check_in), _micros(check_out), *rest) for day, check_in, check_out, *rest in rows), 6)
+
+def unpack_reports(period, packed):
+    for day, check_in, check_out, *rest in REPORT_ROW.iter_unpack(zlib.decompress(packed)):
+        yield (period.period_start.replace(day=day), _time(check_in), _time(check_out), *rest)
+
+def report_totals(rows):
+    positions = {name: REPORT_FIELDS.index(field) + 1 for name, field in TOTALS.items()}; unmatched = REPORT_FIELDS.index('has_unmatched_punch') + 1
+    totals = {'days': len(rows), **{name: sum(row[position] for row in rows) for name, position in positions.items()}, 'unmatched_days': sum(1 for row in rows if row[unmatched])}
+    return {name: round(value, 2) if isinstance(value, float) else value for name, value in totals.items()}
+
+def checksum(packed_blobs):
+    digest = hashlib.sha256()
+    for packed in packed_blobs: digest.update(packed)
+    return digest.hexdigest()
+
+# --- Closing ---
+
+def close_period(year, month, user=None, keep_rows=True, batch_size=5000):
+    """Freezes a month that has ended: one snapshot per employee with reports and the totals, all in one transaction. The live rows
+    stay for the readers that query DailyAttendanceReport directly (report lists, ETags, rollups); `keep_rows=False` removes them.
+    Raises PeriodClosed when the month already is closed, ValueError when it has not ended."""
+    start, end = month_dates(year, month)
+    if end >= timezone.localdate(): raise ValueError(f"{year:04d}-{month:02d} has not ended yet.")
+    with transaction.atomic():
+        if ClosedPeriod.objects.filter(year=year, month=month).exists(): raise PeriodClosed(f"{year:04d}-{month:02d} is already closed.")
+        report_ids = []; by_employee = defaultdict(list)
+        for row in DailyAttendanceReport.objects.filter(date__range=(start, end)).order_by('employee_id', 'date').values_list('id', 'employee_id', 'date', *REPORT_FIELDS).iterator(chunk_size=batch_size):
+            report_ids.append(row[0]); by_employee[row[1]].append(row[2:])
+        snapshots = [PeriodSnapshot(employee_id=employee_id, report_count=len(rows), packed_reports=pack_reports(rows), totals=report_totals(rows)) for employee_id, rows in by_employee.items()]
+        totals = report_totals([row for rows in by_employee.values() for row in rows]); totals['employees'] = len(snapshots)
+        if not keep_rows:
+            # The rows move into the snapshots: the change feed does not announce it and the overtime they posted to the ledger stays.
+            # They go before the month is marked closed, which the write guard would refuse.
+            with moving_rows():
+                for offset in range(0, len(report_ids), batch_size): DailyAttendanceReport.objects.filter(id__in=report_ids[offset:offset + batch_size]).delete()
+        period = ClosedPeriod.objects.create(
+            year=year, month=month, period_start=start, period_end=end, closed_by=user, employee_count=len(snapshots), report_count=len(report_ids),
+            totals=totals, checksum=checksum(snapshot.packed_reports for snapshot in snapshots),
+        )
+        for snapshot in snapshots: snapshot.period = period
+        PeriodSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+        transaction.on_commit(lambda: cache.delete(CLOSED_RANGES_KEY))
+    return period
+
+def verify_period(period):
+    """True when the stored snapshots still hash to the checksum taken at closing."""
+    # Snapshots are inserted by employee, so their ids keep that order after a deleted employee's snapshot loses its employee_id.
+    return checksum(bytes(packed) for packed in period.snapshots.order_by('id').values_list('packed_reports', flat=True)) == period.checksum
+
+# --- Reading ---
+
+def snapshot_reports(employee_ids, start_date, end_date):
+    """Frozen reports of the range as (employee_id, date, *REPORT_FIELDS) tuples; only the snapshots of the requested employees
+    and months are decompressed. `employee_ids` None means everyone."""
+    snapshots = PeriodSnapshot.objects.filter(period__period_start__lte=end_date, period__period_end__gte=start_date).select_related('period')
+    if employee_ids is not None: snapshots = snapshots.filter(employee_id__in=employee_ids)
+    for snapshot in snapshots.order_by('employee_id', 'period__period_start').iterator(chunk_size=1000):
+        for row in unpack_reports(snapshot.period, snapshot.packed_reports):
+            if start_date <= row[0] <= end_date: yield (snapshot.employee_id, *row)
+
+def period_reports(employee_ids, start_date, end_date):
+    """Reports of the range as (employee_id, date, *REPORT_FIELDS) tuples by employee and date: closed months come from the
+    snapshots, whatever live rows they may have kept, the open dates from DailyAttendanceReport."""
+    live = DailyAttendanceReport.objects.filter(date__range=(start_date, end_date))
+    if employee_ids is not None: live = live.filter(employee_id__in=employee_ids)
+    closed = list(ClosedPeriod.objects.filter(period_start__lte=end_date, period_end__gte=start_date).values_list('period_start', 'period_end'))
+    for start, end in closed: live = live.exclude(date__range=(start, end))
+    rows = list(live.order_by().values_list('employee_id', 'date', *REPORT_FIELDS))
+    if closed: rows.extend(snapshot_reports(employee_ids, start_date, end_date))
+    rows.sort(key=lambda row: (row[0], row[1]))
+    return rows
\ No newline at end of file
@@ -5,6 +5,11 @@ class IsManager(BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.groups.filter(name='Manager').exists()
 
+class IsHR(BasePermission):
+    """Staff or members of the HR group, who investigate requests across the whole company."""
+    def has_permission(self, request, view):
+        return request.user and request.user.is_authenticated and (request.user.is_staff or request.user.groups.filter(name='HR').exists())
+
 class IsOwnerOfRequestAndPending(BasePermission):
     
     def has_object_permission(self, request, view, obj):
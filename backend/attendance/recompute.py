@@ -0,0 +1,183 @@
+import datetime
+import logging
+from io import StringIO
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.db.models import Q
+from .models import Employee, DailyAttendanceReport, GlobalSettings, PolicyChange, ShiftAssignment, ShiftDayRule, ProcessingRun, Site
+from .intervals import is_overnight
+from .assignments import ShiftTimeline
+from .reports import iter_dates
+from .summaries import rebuild_summaries
+from .periods import closed_dates
+
+logger = logging.getLogger(__name__)
+REPORT_FIELDS = ('first_check_in', 'last_check_out', 'total_lateness_minutes', 'penalty_minutes', 'required_work_minutes_today', 'total_worked_minutes', 'work_shortfall_minutes', 'work_overtime_minutes', 'has_unmatched_punch')
+SHIFT_RULE_FIELDS = ('is_work_day', 'start_time', 'end_time', 'required_work_minutes')
+
+def recompute_window():
+    end = timezone.localdate()
+    return end - datetime.timedelta(days=getattr(settings, 'RECOMPUTE_LOOKBACK_DAYS', 62)), end
+
+def diff_fields(old, new, fields):
+    """{field: [old, new]} for the fields whose value changed, JSON-ready."""
+    plain = lambda value: value if isinstance(value, (bool, int, float, type(None))) else str(value)
+    return {field: [plain(getattr(old, field)), plain(getattr(new, field))] for field in fields if getattr(old, field) != getattr(new, field)}
+
+def has_overnight_rules(shift_ids):
+    return ShiftDayRule.objects.filter(shift_id__in=[pk for pk in shift_ids if pk], is_work_day=True, end_time__lte=F('start_time')).exists()
+
+def processed_dates(window):
+    """Dates of the window that were ever processed; the rest have no reports to correct and are left to the regular runs."""
+    dates = set(DailyAttendanceReport.objects.filter(date__range=window).values_list('date', flat=True).distinct())
+    for start, end in ProcessingRun.objects.filter(start_date__lte=window[1], end_date__gte=window[0]).values_list('start_date', 'end_date'):
+        dates.update(iter_dates(max(start, window[0]), min(end, window[1])))
+    return dates
+
+# --- Affected (work date -> employee ids) sets ---
+
+def shift_rule_affected(rule, window, every_day=False):
+    # Everyone who currently has the shift or was ever assigned it; days they spent on another shift recompute unchanged.
+    employee_ids = list(Employee.objects.filter(Q(shift_id=rule.shift_id) | Q(shift_assignments__shift_id=rule.shift_id)).distinct().values_list('id', flat=True))
+    if not employee_ids: return {}
+    return {day: employee_ids for day in iter_dates(*window) if every_day or day.weekday() == rule.day_of_week}
+
+def settings_affected(old_grace, new_grace, window):
+    """Only days late beyond the smaller grace period carry a penalty under either policy, so only those can change."""
+    affected = {}
+    for day, employee_id in DailyAttendanceReport.objects.filter(date__range=window, total_lateness_minutes__gt=min(old_grace, new_grace)).values_list('date', 'employee_id'):
+        affected.setdefault(day, []).append(employee_id)
+    return affected
+
+def scheduled_affected(dates, employees):
+    """The employees with a shift on each date, from the assignment timeline: one without a shift today may have had one then."""
+    employees = list(employees.filter(Q(shift__isnull=False) | Q(shift_assignments__shift__isnull=False)).distinct().only('id', 'shift_id'))
+    timeline = ShiftTimeline([emp.pk for emp in employees]); affected = {}
+    for emp in employees:
+        history = timeline.history(emp)
+        for day in dates:
+            if history.shift_id_on(day) is not None: affected.setdefault(day, []).append(emp.pk)
+    return affected
+
+def holiday_affected(dates, window):
+    dates = [day for day in dates if window[0] <= day <= window[1]]
+    if not dates: return {}
+    return scheduled_affected(dates, Employee.objects.all())
+
+def employee_affected(employee_id, window):
+    return {day: [employee_id] for day in iter_dates(*window)}
+
+def assignment_span(employee_id, dates):
+    """(first, last) work dates whose shift can change when assignments starting on `dates` are added, moved or removed:
+    from the earliest date (or open-ended when no assignment precedes it, as the first one also covers earlier days)
+    to the day before the next assignment (open-ended when there is none)."""
+    assignments = ShiftAssignment.objects.filter(employee_id=employee_id)
+    first = min(dates) if assignments.filter(effective_from__lt=min(dates)).exists() else None
+    following = assignments.filter(effective_from__gt=max(dates)).order_by('effective_from').values_list('effective_from', flat=True).first()
+    return first, following - datetime.timedelta(days=1) if following else None
+
+# --- Recording and applying ---
+
+def record_change(kind, description, changes, affected, window, rebuild=False):
+    """Audits a policy change as PENDING. Recomputing its affected employee-days can take minutes, so it is left to the
+    scheduler (apply_pending_changes on every tick) or the apply_policy_changes command instead of the saving request."""
+    # Closed months are frozen: changes only reach the open dates.
+    processed = processed_dates(window) - closed_dates(*window); affected = {day: ids for day, ids in affected.items() if day in processed}
+    change = PolicyChange.objects.create(
+        kind=kind, description=description[:255], changes=changes, window_start=window[0], window_end=window[1], rebuild_summaries=rebuild,
+        affected={day.isoformat(): sorted(set(ids)) for day, ids in sorted(affected.items())}, affected_count=sum(len(set(ids)) for ids in affected.values()),
+    )
+    return change
+
+def record_shift_rule_change(previous, rule):
+    changes = diff_fields(previous, rule, SHIFT_RULE_FIELDS)
+    if not changes: return None
+    window = recompute_window(); rebuild = is_overnight(previous) or is_overnight(rule)
+    # Moving an overnight boundary re-buckets punches into the neighbouring work dates, so then every day of the window is affected.
+    return record_change(PolicyChange.KIND_SHIFT_RULE, str(rule), changes, shift_rule_affected(rule, window, every_day=rebuild), window, rebuild=rebuild)
+
+def record_settings_change(previous, global_settings):
+    changes = diff_fields(previous, global_settings, ('grace_period_minutes', 'penalty_rate'))
+    if not changes: return None
+    window = recompute_window()
+    return record_change(PolicyChange.KIND_SETTINGS, "Grace period / penalty rate", changes, settings_affected(previous.grace_period_minutes, global_settings.grace_period_minutes, window), window)
+
+def record_holiday_change(dates, description, changes):
+    window = recompute_window()
+    return record_change(PolicyChange.KIND_HOLIDAY, description, changes, holiday_affected(dates, window), window)
+
+def record_shift_assignment_change(assignment, previous=None, deleted=False):
+    """Recomputes the dates an added, edited or deleted assignment moves to another shift. `previous` is the row before an edit."""
+    if deleted: changes = {'shift': [assignment.shift_id, None], 'effective_from': [str(assignment.effective_from), None]}
+    elif previous is None: changes = {'shift': [None, assignment.shift_id], 'effective_from': [None, str(assignment.effective_from)]}
+    else: changes = {('shift' if field == 'shift_id' else field): values for field, values in diff_fields(previous, assignment, ('shift_id', 'effective_from')).items()}
+    if not changes: return None
+    dates = [assignment.effective_from] + ([previous.effective_from] if previous else [])
+    first, last = assignment_span(assignment.employee_id, dates); window = recompute_window()
+    start = max(first or window[0], window[0]); end = min(last or window[1], window[1])
+    affected = {day: [assignment.employee_id] for day in iter_dates(start, end)} if start <= end else {}
+    # The shifts on either side of the edit decide whether overnight day boundaries moved.
+    shift_ids = set(ShiftAssignment.objects.filter(employee_id=assignment.employee_id).values_list('shift_id', flat=True)) | {assignment.shift_id, previous.shift_id if previous else None}
+    return record_change(
+        PolicyChange.KIND_EMPLOYEE_SHIFT, f"{assignment.employee.full_name} shift from {min(dates)}", changes, affected, window, rebuild=has_overnight_rules(shift_ids),
+    )
+
+def record_employee_site_change(employee, previous_site_id):
+    # Punches are bucketed into work dates at the site's local midnight, so only a move to another time zone changes anything.
+    names = dict(Site.objects.filter(id__in=[pk for pk in (previous_site_id, employee.site_id) if pk]).values_list('id', 'timezone'))
+    previous = names.get(previous_site_id, settings.TIME_ZONE); current = names.get(employee.site_id, settings.TIME_ZONE)
+    if previous == current: return None
+    window = recompute_window()
+    return record_change(PolicyChange.KIND_EMPLOYEE_SITE, f"{employee.full_name} site", {'timezone': [previous, current]}, employee_affected(employee.pk, window), window, rebuild=True)
+
+def record_site_timezone_change(previous, site):
+    changes = diff_fields(previous, site, ('timezone',))
+    if not changes: return None
+    window = recompute_window()
+    return record_change(PolicyChange.KIND_SITE_TIMEZONE, f"{site.name} time zone", changes, scheduled_affected(list(iter_dates(*window)), site.employees.all()), window, rebuild=True)
+
+def _report_rows(affected):
+    rows = {}
+    for day, employee_ids in affected.items():
+        for row in DailyAttendanceReport.objects.filter(date=day, employee_id__in=employee_ids).values_list('employee_id', *REPORT_FIELDS): rows[row[0], day] = row[1:]
+    return rows
+
+def apply_pending_changes():
+    """Applies pending changes oldest first. Each is claimed with a skip-locked row lock (on databases that have one), so
+    schedulers of several sites never recompute the same change twice. Returns the changes processed."""
+    processed = []
+    while True:
+        with transaction.atomic():
+            change = PolicyChange.objects.select_for_update(skip_locked=True).filter(status=PolicyChange.STATUS_PENDING).exclude(pk__in=[change.pk for change in processed]).order_by('created_at', 'pk').first()
+            if change is None: return processed
+            processed.append(apply_change(change))
+
+def apply_change(change):
+    """Recomputes the change's affected employee-days in one transaction. Reports are updated in place, so unchanged days post and
+    announce nothing; only reports that no longer apply are removed. Failures are recorded, not raised."""
+    from .management.commands.process_attendance import Command
+    affected = {datetime.date.fromisoformat(day): employee_ids for day, employee_ids in change.affected.items()}
+    try:
+        # A month closed between recording the change and applying it stays as it was frozen.
+        if affected: closed = closed_dates(min(affected), max(affected)); affected = {day: ids for day, ids in affected.items() if day not in closed}
+        global_settings = GlobalSettings.objects.get(pk=1)
+        with transaction.atomic():
+            if change.rebuild_summaries:
+                employee_ids = {employee_id for ids in affected.values() for employee_id in ids}; timeline = ShiftTimeline(employee_ids)
+                for employee in Employee.objects.filter(id__in=employee_ids).select_related('site'): rebuild_summaries(employee, change.window_start, change.window_end, timeline.history(employee))
+            before = _report_rows(affected)
+            command = Command(stdout=StringIO())
+            for day, employee_ids in sorted(affected.items()):
+                reported = command.recompute_employees(day, employee_ids, global_settings)
+                DailyAttendanceReport.objects.filter(date=day, employee_id__in=employee_ids).exclude(employee_id__in=reported).delete()
+            after = _report_rows(affected)
+            change.reports_changed = sum(1 for key in before.keys() | after.keys() if before.get(key) != after.get(key))
+            change.status = PolicyChange.STATUS_APPLIED; change.error = ''; change.applied_at = timezone.now()
+            change.save(update_fields=['reports_changed', 'status', 'error', 'applied_at'])
+    except Exception as exc:
+        logger.exception("Recompute for policy change %s failed", change.pk)
+        change.status = PolicyChange.STATUS_FAILED; change.error = str(exc) or exc.__class__.__name__
+        change.save(update_fields=['status', 'error'])
+    return change
\ No newline at end of file
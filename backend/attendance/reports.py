@@ -0,0 +1,71 @@
+import datetime
+from collections import defaultdict
+from django.utils import timezone
+from .models import DailyPunchSummary, LeaveRequest, MissionRequest, OvertimeRequest, Holiday
+from .intervals import unpack_punches
+from .assignments import ShiftTimeline
+from .sites import employee_timezone
+
+def resolve_day_status(holiday_name, leave, day_rule, punch_count, mission=None):
+    """Returns (status, status_info) for one employee-day, using the precedence of the activity grid."""
+    if holiday_name is not None: return "HOLIDAY", holiday_name
+    if leave is not None: return ("LEAVE_FULL" if leave.leave_type == LeaveRequest.TYPE_FULL_DAY else "LEAVE_HOURLY"), (leave.reason or "Leave")
+    if mission is not None and mission.mission_type == MissionRequest.TYPE_FULL_DAY: return "MISSION_FULL", (mission.destination or "Mission")
+    if not day_rule or not day_rule.is_work_day: return "WEEKEND_OFF", "Scheduled Day Off"
+    if not punch_count: return "ABSENT", "No logs recorded"
+    return "PRESENT", f"{punch_count} logs recorded"
+
+def arrival_lateness_minutes(day, day_rule, first_punch, tz=None):
+    """Minutes the first punch came after the rule's start, on the wall clock of `tz`: the employee's, not the viewer's."""
+    first_punch = timezone.localtime(first_punch, tz)
+    arrival_minutes = (first_punch.date() - day).days * 24 * 60 + first_punch.hour * 60 + first_punch.minute
+    return max(0, arrival_minutes - (day_rule.start_time.hour * 60 + day_rule.start_time.minute))
+
+def iter_dates(start_date, end_date):
+    current_date = start_date
+    while current_date <= end_date:
+        yield current_date; current_date += datetime.timedelta(days=1)
+
+def daily_work_chart(start_date, end_date, worked_by_date):
+    """Chart points for every date; `worked_by_date` maps date -> (worked_minutes, has_unmatched_punch)."""
+    chart_data = []
+    for day in iter_dates(start_date, end_date):
+        worked_minutes, has_unmatched_punch = worked_by_date.get(day, (0, False))
+        chart_data.append({ "date": day.strftime('%Y-%m-%d'), "day": day.strftime('%d'), "worked_minutes": worked_minutes, "has_unmatched_punch": has_unmatched_punch })
+    return chart_data
+
+def grouped_log_day(day, day_summary, holiday_name, leave, day_rule):
+    """One day of the activity grid: status, local punch times and worked minutes."""
+    day_logs = [timezone.localtime(ts).strftime("%H:%M:%S") for ts in unpack_punches(day_summary.packed_punches)] if day_summary else []
+    day_status, day_type_info = resolve_day_status(holiday_name, leave, day_rule, len(day_logs))
+    return {"date": day.isoformat(), "status": day_status, "status_info": day_type_info, "logs": day_logs, "worked_minutes": day_summary.presence_minutes if day_summary else 0, "has_unmatched_punch": bool(day_summary and day_summary.has_unmatched_punch)}
+
+def team_matrix_rows(employees, start_date, end_date):
+    """Yields one row per employee with a cell per date, from a fixed number of bulk queries.
+
+    Each date is judged under the shift assigned on that date, and lateness on the employee's wall clock; pass the employees
+    with `site` selected."""
+    employees = list(employees); employee_ids = [emp.id for emp in employees]; timeline = ShiftTimeline(employee_ids)
+    date_range = [start_date, end_date]
+    summaries = {(row[0], row[1]): row[2:] for row in DailyPunchSummary.objects.filter(employee_id__in=employee_ids, date__range=date_range).values_list('employee_id', 'date', 'punch_count', 'presence_minutes', 'has_unmatched_punch', 'first_punch')}
+    leaves = {(leave.employee_id, leave.date): leave for leave in LeaveRequest.objects.filter(employee_id__in=employee_ids, date__range=date_range, status=LeaveRequest.STATUS_APPROVED)}
+    missions = {(mission.employee_id, mission.date): mission for mission in MissionRequest.objects.filter(employee_id__in=employee_ids, date__range=date_range, status=MissionRequest.STATUS_APPROVED)}
+    overtime = set(OvertimeRequest.objects.filter(employee_id__in=employee_ids, date__range=date_range, status=OvertimeRequest.STATUS_APPROVED).values_list('employee_id', 'date'))
+    holidays = dict(Holiday.objects.filter(date__range=date_range).values_list('date', 'name'))
+    dates = list(iter_dates(start_date, end_date))
+    for emp in employees:
+        shift_rules = timeline.history(emp); tz = employee_timezone(emp)
+        cells = []
+        for day in dates:
+            key = (emp.id, day); day_rule = shift_rules.on(day)
+            punch_count, worked_minutes, has_unmatched_punch, first_punch = summaries.get(key, (0, 0, False, None))
+            leave = leaves.get(key); mission = missions.get(key)
+            day_status, _ = resolve_day_status(holidays.get(day), leave, day_rule, punch_count, mission)
+            flags = []
+            if day_status == "PRESENT" and arrival_lateness_minutes(day, day_rule, first_punch, tz): flags.append("LATE")
+            if has_unmatched_punch: flags.append("UNMATCHED_PUNCH")
+            if leave and leave.leave_type == LeaveRequest.TYPE_HOURLY: flags.append("HOURLY_LEAVE")
+            if mission and mission.mission_type == MissionRequest.TYPE_HOURLY: flags.append("HOURLY_MISSION")
+            if key in overtime: flags.append("OVERTIME_APPROVED")
+            cells.append({"status": day_status, "worked_minutes": worked_minutes, "flags": flags})
+        yield {"employee_id": emp.id, "full_name": emp.full_name, "days": cells}
@@ -0,0 +1,39 @@
+import datetime
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import SchedulerLease, DailyPunchSummary, OvertimeRequest, LeaveRequest, MissionRequest, ManualLogRequest
+
+# Rows whose `updated_at` marks an employee-day whose report needs recomputing (the same inputs process_attendance --changed-since checks).
+CHANGE_SOURCES = (DailyPunchSummary, OvertimeRequest, LeaveRequest, MissionRequest, ManualLogRequest)
+
+def acquire_lease(name, owner, ttl_seconds):
+    """Takes or renews the named lease with one conditional UPDATE. Returns the lease row, or None if another owner holds it."""
+    SchedulerLease.objects.get_or_create(name=name)
+    now = timezone.now()
+    claimed = SchedulerLease.objects.filter(Q(owner=owner) | Q(owner='') | Q(expires_at__isnull=True) | Q(expires_at__lt=now), name=name).update(
+        owner=owner, expires_at=now + datetime.timedelta(seconds=ttl_seconds), heartbeat_at=now
+    )
+    return SchedulerLease.objects.get(name=name) if claimed else None
+
+def release_lease(name, owner):
+    SchedulerLease.objects.filter(name=name, owner=owner).update(owner='', expires_at=None)
+
+def record_run(name, owner, error=None, **fields):
+    """Records the outcome of a pass on the lease, only while `owner` still holds it. Returns the lease, or None when another
+    runner took it over during the pass; the outcome is then dropped and the new owner's own bookkeeping stands."""
+    values = {'heartbeat_at': timezone.now(), **fields}
+    if error is None: values.update(last_status='OK', last_error='', consecutive_failures=0)
+    else: values.update(last_status='FAILED', last_error=str(error)[:2000], consecutive_failures=F('consecutive_failures') + 1)
+    if not SchedulerLease.objects.filter(name=name, owner=owner).update(**values): return None
+    return SchedulerLease.objects.filter(name=name, owner=owner).first()
+
+def changed_work_dates(changed_since, through_date, site=None):
+    """Work dates up to `through_date` (within the recompute lookback) with punch summaries or requests changed after
+    `changed_since`: overnight OUT punches stored after midnight, late terminal syncs, requests approved or edited afterwards."""
+    first_date = through_date - datetime.timedelta(days=getattr(settings, 'RECOMPUTE_LOOKBACK_DAYS', 62)); dates = set()
+    for model in CHANGE_SOURCES:
+        rows = model.objects.filter(updated_at__gte=changed_since, date__range=(first_date, through_date))
+        if site is not None: rows = rows.filter(employee__site=site)
+        dates.update(rows.order_by().values_list('date', flat=True).distinct())
+    return dates
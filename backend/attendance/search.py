@@ -0,0 +1,75 @@
+import re
+from django.db import connections
+from .models import RequestSearchEntry, OvertimeRequest, LeaveRequest, MissionRequest, ManualLogRequest
+
+SEARCH_SOURCES = {'overtime': OvertimeRequest, 'leave': LeaveRequest, 'mission': MissionRequest, 'logs': ManualLogRequest}
+KIND_BY_MODEL = {model: kind for kind, model in SEARCH_SOURCES.items()}
+# FTS5 table over RequestSearchEntry.document on SQLite, kept current by triggers (see migration 0031).
+FTS_TABLE = 'attendance_requestsearchentry_fts'
+MAX_TERMS = 8
+_fts_available = {}
+
+# --- Keeping entries in sync ---
+
+def document(instance):
+    return '\n'.join(text for text in (getattr(instance, 'destination', None), instance.reason) if text)
+
+def entry_for(instance):
+    return RequestSearchEntry(kind=KIND_BY_MODEL[type(instance)], request_id=instance.pk, employee_id=instance.employee_id, date=instance.date, status=instance.status, document=document(instance))
+
+def index_requests(instances):
+    """Upserts the entries of saved requests; also called for rows written with bulk_create or queryset.update(), which send no signals."""
+    entries = [entry_for(instance) for instance in instances]
+    if entries: RequestSearchEntry.objects.bulk_create(entries, update_conflicts=True, unique_fields=['kind', 'request_id'], update_fields=['employee', 'date', 'status', 'document', 'updated_at'])
+
+def unindex_request(instance):
+    RequestSearchEntry.objects.filter(kind=KIND_BY_MODEL[type(instance)], request_id=instance.pk).delete()
+
+def rebuild_index(batch_size=2000):
+    """Re-creates every entry from the request tables and drops entries of requests that no longer exist. Returns the number indexed."""
+    indexed = 0
+    for kind, model in SEARCH_SOURCES.items():
+        ids = set()
+        batch = []
+        for instance in model.objects.order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(instance); ids.add(instance.pk)
+            if len(batch) >= batch_size: index_requests(batch); indexed += len(batch); batch = []
+        index_requests(batch); indexed += len(batch)
+        stale = set(RequestSearchEntry.objects.filter(kind=kind).values_list('request_id', flat=True)) - ids
+        RequestSearchEntry.objects.filter(kind=kind, request_id__in=stale).delete()
+    connection = connections[RequestSearchEntry.objects.db]
+    if has_fts(connection):
+        with connection.cursor() as cursor: cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return indexed
+
+# --- Querying ---
+
+def has_fts(connection):
+    if connection.vendor != 'sqlite': return False
+    if connection.alias not in _fts_available: _fts_available[connection.alias] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available[connection.alias]
+
+def terms(query): return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+def match(queryset, query):
+    """Entries whose document contains every word of `query` as a word prefix, answered by the full-text index of the database
+    the queryset reads from. Without one (an SQLite build lacking FTS5) it falls back to substring scans."""
+    words = terms(query)
+    if not words: return queryset.none()
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        return queryset.extra(where=["to_tsvector('simple', document) @@ to_tsquery('simple', %s)"], params=[' & '.join(f"{word}:*" for word in words)])
+    if has_fts(connection):
+        return queryset.extra(where=[f"attendance_requestsearchentry.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)"], params=[' '.join(f'"{word}"*' for word in words)])
+    for word in words: queryset = queryset.filter(document__icontains=word)
+    return queryset
+
+def search_requests(query, kinds=None, statuses=None, employee_ids=None, start_date=None, end_date=None):
+    """Matching entries, newest request date first."""
+    entries = RequestSearchEntry.objects.all()
+    if kinds: entries = entries.filter(kind__in=kinds)
+    if statuses: entries = entries.filter(status__in=statuses)
+    if employee_ids: entries = entries.filter(employee_id__in=employee_ids)
+    if start_date: entries = entries.filter(date__gte=start_date)
+    if end_date: entries = entries.filter(date__lte=end_date)
+    return match(entries, query).order_by('-date', '-id')
\ No newline at end of file
@@ -1,3 +1,4 @@
+import datetime
 from rest_framework import serializers
 from .models import (
     RawAttendanceLog, OvertimeRequest, DailyAttendanceReport, Employee, 
@@ -5,6 +6,24 @@ from .models import (
     Holiday
 )
 from rest_framework.validators import UniqueValidator
+from .periods import is_closed
+
+class ValueRowSerializer:
+    """Serializes a queryset straight from values_list(), matching the equivalent ModelSerializer's output without building model instances."""
+    def __init__(self, model, fields, sources=None, display_fields=()):
+        self.fields = list(fields); self.sources = [(sources or {}).get(field, field) for field in self.fields]
+        self.displays = {field: dict(model._meta.get_field(field).flatchoices) for field in display_fields}
+    def serialize(self, queryset):
+        rows = []
+        for values in queryset.values_list(*self.sources):
+            row = {}
+            for field, value in zip(self.fields, values):
+                if field in self.displays: value = self.displays[field].get(value, value)
+                elif isinstance(value, datetime.datetime): value = serializers.DateTimeField().to_representation(value)
+                elif isinstance(value, (datetime.date, datetime.time)): value = value.isoformat()
+                row[field] = value
+            rows.append(row)
+        return rows
 
 class EmployeeListSerializer(serializers.ModelSerializer):
     class Meta:
@@ -34,31 +53,48 @@ class WorkShiftDetailSerializer(serializers.ModelSerializer):
 
 class RawAttendanceLogSerializer(serializers.ModelSerializer):
     class Meta: model = RawAttendanceLog; fields = ['employee_code', 'timestamp']
+raw_attendance_log_rows = ValueRowSerializer(RawAttendanceLog, ['id', 'employee_code', 'timestamp'])
 
-class OvertimeRequestCreateSerializer(serializers.ModelSerializer):
+class TerminalPunchSerializer(serializers.Serializer):
+    sequence = serializers.IntegerField(min_value=1); employee_code = serializers.CharField(max_length=50); timestamp = serializers.DateTimeField()
+
+class TerminalSyncSerializer(serializers.Serializer):
+    MAX_PAGE = 5000
+    device_time = serializers.DateTimeField(help_text="The terminal's clock when the page was sent")
+    punches = TerminalPunchSerializer(many=True, max_length=MAX_PAGE)
+
+class OpenPeriodMixin:
+    """Requests can no longer be filed for a date of a closed month."""
+    def validate_date(self, value):
+        if is_closed(value): raise serializers.ValidationError(f"{value:%Y-%m} is closed.")
+        return value
+
+class OvertimeRequestCreateSerializer(OpenPeriodMixin, serializers.ModelSerializer):
     class Meta: model = OvertimeRequest; fields = ['id', 'date', 'requested_minutes', 'reason']
     def validate(self, data):
         employee = self.context['request'].user.employee
         queryset = OvertimeRequest.objects.filter(employee=employee, date=data['date'])
         if self.instance: queryset = queryset.exclude(pk=self.instance.pk)
-        if queryset.exists(): raise serializers.ValidationError("An overtime request for this date already exists.")
+        if not self.context.get('bulk') and queryset.exists(): raise serializers.ValidationError("An overtime request for this date already exists.")
         return data
 
 class OvertimeRequestListSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True); status = serializers.CharField(source='get_status_display', read_only=True) 
     class Meta: model = OvertimeRequest; fields = ['id', 'date', 'employee_name', 'requested_minutes', 'reason', 'status'] 
+overtime_request_rows = ValueRowSerializer(OvertimeRequest, OvertimeRequestListSerializer.Meta.fields, sources={'employee_name': 'employee__full_name'}, display_fields=['status'])
 
 class DailyAttendanceReportSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
-    class Meta: model = DailyAttendanceReport; fields = ['id', 'employee_name', 'date', 'first_check_in', 'last_check_out', 'total_lateness_minutes', 'penalty_minutes', 'required_work_minutes_today', 'total_worked_minutes', 'work_shortfall_minutes', 'work_overtime_minutes']
+    class Meta: model = DailyAttendanceReport; fields = ['id', 'employee_name', 'date', 'first_check_in', 'last_check_out', 'total_lateness_minutes', 'penalty_minutes', 'required_work_minutes_today', 'total_worked_minutes', 'work_shortfall_minutes', 'work_overtime_minutes', 'has_unmatched_punch']
+daily_attendance_report_rows = ValueRowSerializer(DailyAttendanceReport, DailyAttendanceReportSerializer.Meta.fields, sources={'employee_name': 'employee__full_name'})
 
-class LeaveRequestCreateSerializer(serializers.ModelSerializer):
+class LeaveRequestCreateSerializer(OpenPeriodMixin, serializers.ModelSerializer):
     class Meta: model = LeaveRequest; fields = ['id', 'date', 'leave_type', 'start_time', 'end_time', 'reason']
     def validate(self, data):
         employee = self.context['request'].user.employee
         queryset = LeaveRequest.objects.filter(employee=employee, date=data['date'])
         if self.instance: queryset = queryset.exclude(pk=self.instance.pk)
-        if queryset.exists(): raise serializers.ValidationError("A leave request for this date already exists.")
+        if not self.context.get('bulk') and queryset.exists(): raise serializers.ValidationError("A leave request for this date already exists.")
         if data.get('leave_type') == LeaveRequest.TYPE_HOURLY:
             if not data.get('start_time') or not data.get('end_time'): raise serializers.ValidationError("Start and End time are required for hourly leave.")
             if data.get('start_time') >= data.get('end_time'): raise serializers.ValidationError("End time must be after start time.")
@@ -69,14 +105,15 @@ class LeaveRequestCreateSerializer(serializers.ModelSerializer):
 class LeaveRequestListSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True); status = serializers.CharField(source='get_status_display', read_only=True); leave_type = serializers.CharField(source='get_leave_type_display', read_only=True)
     class Meta: model = LeaveRequest; fields = ['id', 'date', 'employee_name', 'leave_type', 'start_time', 'end_time', 'reason', 'status']
+leave_request_rows = ValueRowSerializer(LeaveRequest, LeaveRequestListSerializer.Meta.fields, sources={'employee_name': 'employee__full_name'}, display_fields=['leave_type', 'status'])
 
-class MissionRequestCreateSerializer(serializers.ModelSerializer):
+class MissionRequestCreateSerializer(OpenPeriodMixin, serializers.ModelSerializer):
     class Meta: model = MissionRequest; fields = ['id', 'date', 'mission_type', 'start_time', 'end_time', 'destination', 'reason']
     def validate(self, data):
         employee = self.context['request'].user.employee
         queryset = MissionRequest.objects.filter(employee=employee, date=data['date'])
         if self.instance: queryset = queryset.exclude(pk=self.instance.pk)
-        if queryset.exists(): raise serializers.ValidationError("A mission request for this date already exists.")
+        if not self.context.get('bulk') and queryset.exists(): raise serializers.ValidationError("A mission request for this date already exists.")
         if data.get('mission_type') == MissionRequest.TYPE_HOURLY:
             if not data.get('start_time') or not data.get('end_time'): raise serializers.ValidationError("Start and End time are required for hourly missions.")
             if data.get('start_time') >= data.get('end_time'): raise serializers.ValidationError("End time must be after start time.")
@@ -86,19 +123,57 @@ class MissionRequestCreateSerializer(serializers.ModelSerializer):
 class MissionRequestListSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True); status = serializers.CharField(source='get_status_display', read_only=True); mission_type = serializers.CharField(source='get_mission_type_display', read_only=True)
     class Meta: model = MissionRequest; fields = ['id', 'date', 'employee_name', 'mission_type', 'start_time', 'end_time', 'destination', 'reason', 'status']
+mission_request_rows = ValueRowSerializer(MissionRequest, MissionRequestListSerializer.Meta.fields, sources={'employee_name': 'employee__full_name'}, display_fields=['mission_type', 'status'])
 
-class ManualLogRequestCreateSerializer(serializers.ModelSerializer):
+class ManualLogRequestCreateSerializer(OpenPeriodMixin, serializers.ModelSerializer):
     class Meta: model = ManualLogRequest; fields = ['date', 'time', 'log_type', 'reason']
 
-class ManualLogRequestPairCreateSerializer(serializers.Serializer):
+class ManualLogRequestPairCreateSerializer(OpenPeriodMixin, serializers.Serializer):
     date = serializers.DateField(); start_time = serializers.TimeField(); end_time = serializers.TimeField(); reason = serializers.CharField(required=False, allow_blank=True)
     def validate(self, data):
         if data['start_time'] >= data['end_time']: raise serializers.ValidationError("End time must be after start time.")
         return data
 
+class BulkRequestSerializer(serializers.Serializer):
+    MAX_ITEMS = 366
+    items = serializers.ListField(child=serializers.DictField(), required=False, max_length=MAX_ITEMS)
+    start_date = serializers.DateField(required=False); end_date = serializers.DateField(required=False)
+    defaults = serializers.DictField(required=False, default=dict)
+    skip_off_days = serializers.BooleanField(default=False)
+    def validate(self, data):
+        if 'items' in data:
+            if 'start_date' in data or 'end_date' in data: raise serializers.ValidationError("Send either items or a start_date/end_date range, not both.")
+            return data
+        if 'start_date' not in data or 'end_date' not in data: raise serializers.ValidationError("Either items or both start_date and end_date are required.")
+        if data['start_date'] > data['end_date']: raise serializers.ValidationError("End date must not be before start date.")
+        if (data['end_date'] - data['start_date']).days >= self.MAX_ITEMS: raise serializers.ValidationError(f"A range may cover at most {self.MAX_ITEMS} days.")
+        return data
+
 class ManualLogRequestListSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True); status = serializers.CharField(source='get_status_display', read_only=True); log_type = serializers.CharField(source='get_log_type_display', read_only=True)
     class Meta: model = ManualLogRequest; fields = ['id', 'date', 'time', 'employee_name', 'log_type', 'reason', 'status']
+manual_log_request_rows = ValueRowSerializer(ManualLogRequest, ManualLogRequestListSerializer.Meta.fields, sources={'employee_name': 'employee__full_name'}, display_fields=['log_type', 'status'])
 
 class GlobalSettingsSerializer(serializers.ModelSerializer):
-    class Meta: model = GlobalSettings; fields = ['grace_period_minutes', 'penalty_rate']
\ No newline at end of file
+    class Meta: model = GlobalSettings; fields = ['grace_period_minutes', 'penalty_rate']
+
+class SimulatedDayRuleSerializer(serializers.Serializer):
+    shift = serializers.PrimaryKeyRelatedField(queryset=WorkShift.objects.all()); day_of_week = serializers.ChoiceField(choices=ShiftDayRule.DAY_CHOICES)
+    is_work_day = serializers.BooleanField(required=False); start_time = serializers.TimeField(required=False); required_work_minutes = serializers.IntegerField(required=False, min_value=0)
+
+class PolicyScenarioSerializer(serializers.Serializer):
+    grace_period_minutes = serializers.IntegerField(required=False, min_value=0)
+    penalty_rate = serializers.DecimalField(required=False, max_digits=3, decimal_places=2, min_value=0)
+    day_rules = SimulatedDayRuleSerializer(many=True, required=False, default=list)
+    def validate(self, data):
+        data['rule_overrides'] = {(rule['shift'].pk, rule['day_of_week']): {field: value for field, value in rule.items() if field not in ('shift', 'day_of_week')} for rule in data['day_rules']}
+        return data
+
+class PolicySimulationSerializer(serializers.Serializer):
+    MAX_DAYS = 186; MAX_SCENARIOS = 20
+    start_date = serializers.DateField(); end_date = serializers.DateField()
+    scenarios = PolicyScenarioSerializer(many=True, allow_empty=False, max_length=MAX_SCENARIOS)
+    def validate(self, data):
+        if data['start_date'] > data['end_date']: raise serializers.ValidationError("End date must not be before start date.")
+        if (data['end_date'] - data['start_date']).days >= self.MAX_DAYS: raise serializers.ValidationError(f"A simulation may cover at most {self.MAX_DAYS} days.")
+        return data
\ No newline at end of file
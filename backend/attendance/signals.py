@@ -0,0 +1,180 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .models import OvertimeRequest, LeaveRequest, MissionRequest, ManualLogRequest, ShiftDayRule, GlobalSettings, Holiday, Employee, DailyAttendanceReport, RawAttendanceLog, Site, ShiftAssignment, ClosedPeriod, PeriodSnapshot
+from .pending_counts import invalidate_pending_counts
+from .ledger import post_report, post_leave_request
+from .changefeed import record_change, stored_values
+from .search import index_requests, unindex_request
+from .recompute import record_shift_rule_change, record_settings_change, record_holiday_change, record_shift_assignment_change, record_employee_site_change, record_site_timezone_change
+from .assignments import assign_from_today, sync_current_shifts
+from .sites import user_timezone_key
+from .summaries import record_raw_log, refresh_punch_day
+from .periods import PeriodClosed, ensure_open
+from .archive import rows_moving
+
+def deleted_with_employee(origin):
+    """Rows cascading from an employee's deletion: the feed, ledger and closed-period bookkeeping of that employee goes with them."""
+    return isinstance(origin, Employee) or getattr(origin, 'model', None) is Employee
+
+@receiver([post_save, post_delete], sender=OvertimeRequest)
+@receiver([post_save, post_delete], sender=LeaveRequest)
+@receiver([post_save, post_delete], sender=MissionRequest)
+@receiver([post_save, post_delete], sender=ManualLogRequest)
+def request_changed(sender, instance, **kwargs):
+    invalidate_pending_counts([instance.employee_id])
+
+# --- Retroactive recompute: remember the stored row before saving, compare after ---
+
+@receiver(pre_save, sender=ShiftDayRule)
+@receiver(pre_save, sender=GlobalSettings)
+@receiver(pre_save, sender=Holiday)
+@receiver(pre_save, sender=Site)
+@receiver(pre_save, sender=ShiftAssignment)
+def remember_previous(sender, instance, raw=False, **kwargs):
+    instance._previous = None if raw or instance.pk is None else sender.objects.filter(pk=instance.pk).first()
+
+@receiver(pre_save, sender=Employee)
+def remember_previous_shift(sender, instance, raw=False, **kwargs):
+    previous = None if raw or instance.pk is None else sender.objects.filter(pk=instance.pk).values_list('shift_id', 'site_id').first()
+    instance._previous_shift_id, instance._previous_site_id = previous or (None, None)
+
+@receiver(post_save, sender=ShiftDayRule)
+def shift_rule_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw and getattr(instance, '_previous', None) is not None: record_shift_rule_change(instance._previous, instance)
+
+@receiver(post_save, sender=GlobalSettings)
+def settings_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw and getattr(instance, '_previous', None) is not None: record_settings_change(instance._previous, instance)
+
+@receiver(post_save, sender=Holiday)
+def holiday_saved(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if raw or (previous is not None and previous.date == instance.date): return
+    dates = [instance.date] if previous is None else [previous.date, instance.date]
+    record_holiday_change(dates, str(instance), {'date': [previous.date.isoformat() if previous else None, instance.date.isoformat()]})
+
+@receiver(post_delete, sender=Holiday)
+def holiday_deleted(sender, instance, **kwargs):
+    record_holiday_change([instance.date], f"Removed {instance}", {'date': [instance.date.isoformat(), None]})
+
+@receiver(post_save, sender=Employee)
+def employee_saved(sender, instance, created, raw=False, **kwargs):
+    if instance.user_id: transaction.on_commit(lambda: cache.delete(user_timezone_key(instance.user_id)))
+    if raw or created: return
+    if getattr(instance, '_previous_shift_id', None) != instance.shift_id: assign_from_today(instance, instance._previous_shift_id)
+    if getattr(instance, '_previous_site_id', None) != instance.site_id: record_employee_site_change(instance, instance._previous_site_id)
+
+@receiver(post_save, sender=ShiftAssignment)
+def shift_assignment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw: return
+    record_shift_assignment_change(instance, getattr(instance, '_previous', None)); sync_current_shifts([instance.employee])
+
+@receiver(post_delete, sender=ShiftAssignment)
+def shift_assignment_deleted(sender, instance, origin=None, **kwargs):
+    # Assignments deleted along with their employee need no recompute.
+    if deleted_with_employee(origin): return
+    record_shift_assignment_change(instance, deleted=True); sync_current_shifts([instance.employee])
+
+@receiver(post_save, sender=Site)
+def site_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or getattr(instance, '_previous', None) is None: return
+    keys = [user_timezone_key(user_id) for user_id in instance.employees.filter(user__isnull=False).values_list('user_id', flat=True)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+    record_site_timezone_change(instance._previous, instance)
+
+# --- Punch summaries: every stored punch, however it was written, reaches the calculation ---
+
+@receiver(pre_save, sender=RawAttendanceLog)
+def remember_previous_punch(sender, instance, **kwargs):
+    instance._previous_punch = None if instance.pk is None else sender.objects.filter(pk=instance.pk).values_list('employee_code', 'timestamp').first()
+
+@receiver(post_save, sender=RawAttendanceLog)
+def punch_saved(sender, instance, **kwargs):
+    # Fixture and import loads (raw) are summarized too. Bulk inserts send no signals; their callers refresh the summaries.
+    previous = getattr(instance, '_previous_punch', None)
+    if previous is None: record_raw_log(instance)
+    elif previous != (instance.employee_code, instance.timestamp):
+        refresh_punch_day(*previous); refresh_punch_day(instance.employee_code, instance.timestamp)
+
+@receiver(post_delete, sender=RawAttendanceLog)
+def punch_deleted(sender, instance, **kwargs):
+    if not rows_moving(): refresh_punch_day(instance.employee_code, instance.timestamp)
+
+# --- Balance ledger ---
+
+@receiver(post_save, sender=DailyAttendanceReport)
+def report_saved(sender, instance, raw=False, **kwargs):
+    if not raw: post_report(instance)
+
+@receiver(post_delete, sender=DailyAttendanceReport)
+def report_deleted(sender, instance, origin=None, **kwargs):
+    if not (rows_moving() or deleted_with_employee(origin)): post_report(instance, deleted=True)
+
+@receiver(post_save, sender=LeaveRequest)
+def leave_request_saved(sender, instance, raw=False, **kwargs):
+    if not raw: post_leave_request(instance)
+
+@receiver(post_delete, sender=LeaveRequest)
+def leave_request_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with_employee(origin): post_leave_request(instance, deleted=True)
+
+# --- Change feed ---
+
+@receiver(pre_save, sender=OvertimeRequest)
+@receiver(pre_save, sender=LeaveRequest)
+@receiver(pre_save, sender=MissionRequest)
+@receiver(pre_save, sender=ManualLogRequest)
+@receiver(pre_save, sender=RawAttendanceLog)
+@receiver(pre_save, sender=DailyAttendanceReport)
+def remember_feed_row(sender, instance, raw=False, **kwargs):
+    instance._feed_previous = None if raw else stored_values(instance)
+
+@receiver(post_save, sender=OvertimeRequest)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_save, sender=MissionRequest)
+@receiver(post_save, sender=ManualLogRequest)
+@receiver(post_save, sender=RawAttendanceLog)
+@receiver(post_save, sender=DailyAttendanceReport)
+def feed_saved(sender, instance, raw=False, **kwargs):
+    if not raw: record_change(instance, previous=getattr(instance, '_feed_previous', None))
+
+@receiver(post_delete, sender=OvertimeRequest)
+@receiver(post_delete, sender=LeaveRequest)
+@receiver(post_delete, sender=MissionRequest)
+@receiver(post_delete, sender=ManualLogRequest)
+@receiver(post_delete, sender=RawAttendanceLog)
+@receiver(post_delete, sender=DailyAttendanceReport)
+def feed_deleted(sender, instance, origin=None, **kwargs):
+    if not (rows_moving() or deleted_with_employee(origin)): record_change(instance, deleted=True)
+
+# --- Full-text search index ---
+
+@receiver(post_save, sender=OvertimeRequest)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_save, sender=MissionRequest)
+@receiver(post_save, sender=ManualLogRequest)
+def search_entry_saved(sender, instance, **kwargs):
+    # Fixture loads (raw) are indexed too: the entry is derived data, not a change anyone is notified of.
+    index_requests([instance])
+
+@receiver(post_delete, sender=OvertimeRequest)
+@receiver(post_delete, sender=LeaveRequest)
+@receiver(post_delete, sender=MissionRequest)
+@receiver(post_delete, sender=ManualLogRequest)
+def search_entry_deleted(sender, instance, **kwargs):
+    unindex_request(instance)
+
+# --- Closed periods ---
+
+@receiver(pre_save, sender=DailyAttendanceReport)
+@receiver(pre_delete, sender=DailyAttendanceReport)
+def report_period_open(sender, instance, raw=False, origin=None, **kwargs):
+    # Deleting an employee takes their kept rows along; the closed months still hold them in the snapshots.
+    if not (raw or deleted_with_employee(origin)): ensure_open(instance.date)
+
+@receiver(pre_save, sender=ClosedPeriod)
+@receiver(pre_save, sender=PeriodSnapshot)
+def closed_period_immutable(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding: raise PeriodClosed(f"{instance} is immutable.")
\ No newline at end of file
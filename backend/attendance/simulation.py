@@ -0,0 +1,114 @@
+import array
+import datetime
+import zoneinfo
+from collections import namedtuple
+from django.db.models import Q
+from django.utils import timezone
+from .models import Employee, DailyPunchSummary, LeaveRequest, MissionRequest, OvertimeRequest, Holiday, GlobalSettings
+from .assignments import ShiftTimeline
+from .reports import iter_dates
+
+# Everything the policy formulas of process_attendance need for one employee-day, with the punches already reduced to numbers.
+# PeriodInputs keeps one typed array per field (index i of every column is employee-day i); flags are 0/1, shift_id 0 means none.
+DAY_COLUMNS = (('employee_id', 'q'), ('shift_id', 'q'), ('weekday', 'b'), ('holiday', 'b'), ('full_leave', 'b'), ('full_mission', 'b'), ('ot_approved', 'b'), ('punch_count', 'l'), ('arrival_minutes', 'l'), ('presence_minutes', 'l'), ('span_minutes', 'l'), ('hourly_leave_minutes', 'l'), ('hourly_mission_minutes', 'l'))
+DayColumns = namedtuple('DayColumns', [name for name, _ in DAY_COLUMNS])
+Policy = namedtuple('Policy', 'grace_period_minutes penalty_rate rules')
+TOTAL_FIELDS = ('lateness_minutes', 'penalty_minutes', 'required_minutes', 'worked_minutes', 'shortfall_minutes', 'overtime_minutes')
+
+def _minutes(value): return value.hour * 60 + value.minute
+
+def _span_minutes(start_time, end_time):
+    if not (start_time and end_time): return 0
+    return int((datetime.datetime.combine(datetime.date.min, end_time) - datetime.datetime.combine(datetime.date.min, start_time)).total_seconds() / 60)
+
+class PeriodInputs:
+    """A period's attendance inputs loaded once with a fixed number of bulk queries, ready to be re-scored under many policies.
+    `days` holds them column-wise, a few bytes per employee-day instead of a tuple of Python objects each."""
+    def __init__(self, start, end, employees=None):
+        employees = (Employee.objects.all() if employees is None else employees).filter(Q(shift__isnull=False) | Q(shift_assignments__shift__isnull=False)).distinct()
+        self.start = start; self.end = end
+        self.employee_names = dict(employees.values_list('id', 'full_name'))
+        ids = list(self.employee_names); timeline = ShiftTimeline(ids)
+        histories = {emp.pk: timeline.history(emp) for emp in employees.only('id', 'shift_id')}
+        zone_of = {employee_id: zoneinfo.ZoneInfo(name) for employee_id, name in employees.filter(site__isnull=False).values_list('id', 'site__timezone')}
+        self.rules = {(rule.shift_id, rule.day_of_week): (rule.is_work_day, _minutes(rule.start_time), rule.required_work_minutes) for rules in timeline.rules_by_shift.values() for rule in rules.values()}
+        holidays = set(Holiday.objects.filter(date__range=(start, end)).values_list('date', flat=True))
+        in_range = {'employee_id__in': ids, 'date__range': (start, end)}
+        leaves = {(e, d): (t, _span_minutes(s, f)) for e, d, t, s, f in LeaveRequest.objects.filter(status=LeaveRequest.STATUS_APPROVED, **in_range).values_list('employee_id', 'date', 'leave_type', 'start_time', 'end_time')}
+        missions = {(e, d): (t, _span_minutes(s, f)) for e, d, t, s, f in MissionRequest.objects.filter(status=MissionRequest.STATUS_APPROVED, **in_range).values_list('employee_id', 'date', 'mission_type', 'start_time', 'end_time')}
+        overtime = set(OvertimeRequest.objects.filter(status=OvertimeRequest.STATUS_APPROVED, **in_range).values_list('employee_id', 'date'))
+        punches = {}
+        for e, d, first, last, count, presence in DailyPunchSummary.objects.filter(**in_range).values_list('employee_id', 'date', 'first_punch', 'last_punch', 'punch_count', 'presence_minutes'):
+            first_local = timezone.localtime(first, zone_of.get(e))
+            arrival = (first_local.date() - d).days * 24 * 60 + _minutes(first_local)
+            punches[e, d] = (count, arrival, presence, int((last - first).total_seconds() / 60))
+        self.days = DayColumns(*(array.array(typecode) for _, typecode in DAY_COLUMNS))
+        for day in iter_dates(start, end):
+            weekday = day.weekday(); holiday = day in holidays
+            for employee_id in ids:
+                key = (employee_id, day)
+                leave_type, leave_minutes = leaves.get(key, (None, 0)); mission_type, mission_minutes = missions.get(key, (None, 0))
+                count, arrival, presence, span = punches.get(key, (0, 0, 0, 0))
+                for column, value in zip(self.days, (
+                    employee_id, histories[employee_id].shift_id_on(day) or 0, weekday, holiday,
+                    leave_type == LeaveRequest.TYPE_FULL_DAY, mission_type == MissionRequest.TYPE_FULL_DAY, key in overtime,
+                    count, arrival, presence, span,
+                    leave_minutes if leave_type == LeaveRequest.TYPE_HOURLY else 0, mission_minutes if mission_type == MissionRequest.TYPE_HOURLY else 0,
+                )): column.append(value)
+    def __len__(self): return len(self.days.employee_id)
+    def current_policy(self):
+        settings = GlobalSettings.objects.get(pk=1)
+        return Policy(settings.grace_period_minutes, float(settings.penalty_rate), self.rules)
+
+    def policy(self, base, grace_period_minutes=None, penalty_rate=None, rule_overrides=None):
+        """Derives a policy from `base`. `rule_overrides` maps (shift_id, day_of_week) to a dict with any of is_work_day/start_time/required_work_minutes."""
+        rules = base.rules
+        if rule_overrides:
+            rules = dict(rules)
+            for key, changes in rule_overrides.items():
+                is_work_day, start_minutes, required = rules.get(key, (False, 8 * 60, 525))
+                if 'start_time' in changes: start_minutes = _minutes(changes['start_time'])
+                rules[key] = (changes.get('is_work_day', is_work_day), start_minutes, changes.get('required_work_minutes', required))
+        return Policy(
+            base.grace_period_minutes if grace_period_minutes is None else grace_period_minutes,
+            base.penalty_rate if penalty_rate is None else float(penalty_rate), rules,
+        )
+
+    def score(self, policy):
+        """Per-employee totals under `policy`, mirroring the formulas of process_attendance. Nothing is written."""
+        totals = {employee_id: dict.fromkeys(TOTAL_FIELDS, 0) for employee_id in self.employee_names}
+        grace = policy.grace_period_minutes; rate = policy.penalty_rate; rules = policy.rules
+        for employee_id, shift_id, weekday, holiday, full_leave, full_mission, ot_approved, punch_count, arrival_minutes, presence_minutes, span_minutes, hourly_leave_minutes, hourly_mission_minutes in zip(*self.days):
+            rule = rules.get((shift_id, weekday))
+            if rule is None and not holiday: continue
+            total = totals[employee_id]
+            if holiday or not rule[0]:
+                if punch_count:
+                    total['worked_minutes'] += span_minutes
+                    if ot_approved: total['overtime_minutes'] += span_minutes
+                continue
+            if full_leave: continue
+            _, start_minutes, required = rule
+            if full_mission: total['required_minutes'] += required; total['worked_minutes'] += required; continue
+            if not punch_count: total['required_minutes'] += required; total['shortfall_minutes'] += required; continue
+            lateness = arrival_minutes - start_minutes if arrival_minutes > start_minutes else 0
+            penalty = float(lateness) * rate if arrival_minutes > start_minutes + grace else 0
+            worked = presence_minutes + hourly_mission_minutes
+            required_today = float(required) + penalty - hourly_leave_minutes
+            balance = worked - required_today
+            total['lateness_minutes'] += lateness; total['penalty_minutes'] += penalty; total['required_minutes'] += required_today; total['worked_minutes'] += worked
+            if balance < 0: total['shortfall_minutes'] += int(abs(balance))
+            elif balance > 0 and ot_approved: total['overtime_minutes'] += int(balance)
+        return totals
+
+def compare(period, baseline, scenario):
+    """Scores both policies and returns per-employee baseline/scenario/delta rows plus aggregate totals."""
+    before = period.score(baseline); after = period.score(scenario)
+    employees = []; aggregate = {'baseline': dict.fromkeys(TOTAL_FIELDS, 0), 'scenario': dict.fromkeys(TOTAL_FIELDS, 0)}
+    for employee_id, old in before.items():
+        new = after[employee_id]; delta = {field: round(new[field] - old[field], 2) for field in TOTAL_FIELDS}
+        for field in TOTAL_FIELDS: aggregate['baseline'][field] += old[field]; aggregate['scenario'][field] += new[field]
+        if any(delta.values()): employees.append({'employee_id': employee_id, 'full_name': period.employee_names[employee_id], 'baseline': old, 'scenario': new, 'delta': delta})
+    aggregate['delta'] = {field: round(aggregate['scenario'][field] - aggregate['baseline'][field], 2) for field in TOTAL_FIELDS}
+    aggregate['employees_affected'] = len(employees)
+    return {'aggregate': aggregate, 'employees': employees}
\ No newline at end of file
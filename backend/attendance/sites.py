@@ -0,0 +1,60 @@
+from collections import defaultdict
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .models import Employee, Site
+
+USER_TIMEZONE_TIMEOUT = 300
+
+def site_timezone(site):
+    return site.tzinfo if site is not None else timezone.get_default_timezone()
+
+def employee_timezone(employee):
+    """The time zone the employee's work days are cut in. Loads the site unless it was selected with the employee."""
+    return site_timezone(employee.site) if employee.site_id else timezone.get_default_timezone()
+
+def by_timezone(employees):
+    """Groups employees (with `site` selected) by the time zone of their site."""
+    groups = defaultdict(list)
+    for emp in employees: groups[employee_timezone(emp)].append(emp)
+    return groups.items()
+
+def partitions(site_name=None):
+    """Sites processed as independent partitions; None stands for the employees without a site (server TIME_ZONE)."""
+    if site_name:
+        site = Site.objects.filter(name=site_name).first()
+        if site is None: raise Site.DoesNotExist(site_name)
+        return [site]
+    sites = list(Site.objects.order_by('name'))
+    # Employees scheduled only through assignments count too: Employee.shift is empty until one takes effect.
+    if not sites or Employee.objects.filter(Q(shift__isnull=False) | Q(shift_assignments__shift__isnull=False), site__isnull=True).exists(): sites.append(None)
+    return sites
+
+# --- Request time zone ---
+
+def user_timezone_key(user_id): return f"user-timezone:{user_id}"
+
+def user_timezone_name(user_id):
+    name = cache.get(user_timezone_key(user_id))
+    if name is None:
+        name = Employee.objects.filter(user_id=user_id).values_list('site__timezone', flat=True).first() or ''
+        cache.set(user_timezone_key(user_id), name, USER_TIMEZONE_TIMEOUT)
+    return name
+
+class SiteTimezoneJWTAuthentication(JWTAuthentication):
+    """JWT authentication that also activates the time zone of the user's site for the rest of the request, so "today" and
+    local times in responses follow the site. SiteTimezoneMiddleware resets it between requests."""
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            name = user_timezone_name(result[0].pk)
+            if name: timezone.activate(name)
+        return result
+
+class SiteTimezoneMiddleware:
+    def __init__(self, get_response): self.get_response = get_response
+    def __call__(self, request):
+        timezone.deactivate()
+        try: return self.get_response(request)
+        finally: timezone.deactivate()
\ No newline at end of file
@@ -0,0 +1,63 @@
+import bisect
+from django.db import transaction
+from django.utils import timezone
+from .models import Employee, DailyPunchSummary
+from .intervals import (
+    PunchSummary, pair_punches, pack_punches, unpack_punches, work_date_for, iter_work_days, load_punches
+)
+from .assignments import ShiftHistory
+from .sites import employee_timezone
+
+def fill_summary(summary, punches):
+    summary.first_punch = punches.first; summary.last_punch = punches.last; summary.punch_count = punches.count
+    summary.presence_minutes = punches.presence_minutes; summary.has_unmatched_punch = punches.has_unmatched_punch
+    summary.packed_punches = pack_punches(punches.punches)
+    return summary
+
+def to_punch_summary(summary):
+    if summary is None: return PunchSummary()
+    return pair_punches(unpack_punches(summary.packed_punches))
+
+@transaction.atomic
+def record_punch(employee, timestamp, shift_rules=None):
+    """Upserts the employee's summary row for the work day `timestamp` falls on, in the time zone of the employee's site
+    and under the shift assigned on that date."""
+    if shift_rules is None: shift_rules = ShiftHistory.for_employee(employee)
+    with timezone.override(employee_timezone(employee)): work_date = work_date_for(timestamp, shift_rules)
+    summary, created = DailyPunchSummary.objects.select_for_update().get_or_create(employee=employee, date=work_date, defaults={'first_punch': timestamp, 'last_punch': timestamp})
+    timestamps = [] if created else unpack_punches(summary.packed_punches)
+    bisect.insort(timestamps, timestamp)
+    fill_summary(summary, pair_punches(timestamps)).save()
+    return summary
+
+def record_raw_log(log):
+    employee = Employee.objects.filter(employee_code=log.employee_code).select_related('site').first()
+    if employee: return record_punch(employee, log.timestamp)
+
+def refresh_punch_day(employee_code, timestamp):
+    """Rebuilds, from the raw punches, the summary of the work day a punch was on; used after punches are edited or deleted."""
+    employee = Employee.objects.filter(employee_code=employee_code).select_related('site').first()
+    if employee is None: return None
+    shift_rules = ShiftHistory.for_employee(employee)
+    with timezone.override(employee_timezone(employee)): work_date = work_date_for(timestamp, shift_rules)
+    rebuild_summaries(employee, work_date, work_date, shift_rules)
+    return work_date
+
+@transaction.atomic
+def rebuild_summaries(employee, start_date, end_date, shift_rules=None):
+    """Recomputes every summary row in the range from the raw punches. Returns the number of days written."""
+    if shift_rules is None: shift_rules = ShiftHistory.for_employee(employee)
+    existing = {summary.date: summary for summary in DailyPunchSummary.objects.filter(employee=employee, date__range=[start_date, end_date])}
+    to_create = []; to_update = []; to_delete = []
+    with timezone.override(employee_timezone(employee)): work_days = list(iter_work_days(load_punches(employee.employee_code, start_date, end_date, shift_rules), start_date, end_date, shift_rules))
+    for work_date, punches in work_days:
+        summary = existing.get(work_date)
+        if not punches.count:
+            if summary: to_delete.append(summary.pk)
+            continue
+        if summary: summary.updated_at = timezone.now(); to_update.append(fill_summary(summary, punches))
+        else: to_create.append(fill_summary(DailyPunchSummary(employee=employee, date=work_date), punches))
+    DailyPunchSummary.objects.bulk_create(to_create)
+    DailyPunchSummary.objects.bulk_update(to_update, ['first_punch', 'last_punch', 'punch_count', 'presence_minutes', 'has_unmatched_punch', 'packed_punches', 'updated_at'])
+    DailyPunchSummary.objects.filter(pk__in=to_delete).delete()
+    return len(to_create) + len(to_update)
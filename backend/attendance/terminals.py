@@ -0,0 +1,72 @@
+import datetime
+import hmac
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from .models import Terminal, RawAttendanceLog, Employee
+from .assignments import ShiftTimeline
+from .intervals import work_date_for
+from .summaries import rebuild_summaries
+from .sites import employee_timezone
+from .changefeed import record_changes
+
+class SequenceGap(Exception):
+    """The page does not continue the terminal's acknowledged sequence without gaps."""
+
+def authenticate_terminal(request):
+    key = request.headers.get('X-Terminal-Key', '')
+    terminal = Terminal.objects.filter(serial=request.headers.get('X-Terminal-Serial', ''), is_active=True).select_related('site').first()
+    if terminal is None or not hmac.compare_digest(terminal.api_key, key): raise AuthenticationFailed("Unknown terminal or invalid key.")
+    return terminal
+
+def skew_corrector(terminal, device_now, server_now):
+    """Maps a device timestamp to server time.
+
+    The offset measured now is interpolated linearly, in device time, against the offset of the previous sync, so punches buffered while the clock drifted get the offset of their own time. Offsets below TERMINAL_SKEW_TOLERANCE_SECONDS are ignored."""
+    offset_now = (server_now - device_now).total_seconds(); tolerance = getattr(settings, 'TERMINAL_SKEW_TOLERANCE_SECONDS', 5)
+    if terminal.clock_checked_at is None: anchors = None
+    else:
+        previous_device_time = terminal.clock_checked_at - datetime.timedelta(seconds=terminal.clock_offset_seconds)
+        anchors = (previous_device_time, terminal.clock_offset_seconds) if previous_device_time < device_now else None
+    def correct(device_timestamp):
+        offset = offset_now
+        if anchors and device_timestamp < device_now:
+            previous_device_time, previous_offset = anchors
+            if device_timestamp <= previous_device_time: offset = previous_offset
+            else: offset = previous_offset + (offset_now - previous_offset) * ((device_timestamp - previous_device_time) / (device_now - previous_device_time))
+        return device_timestamp + datetime.timedelta(seconds=round(offset)) if abs(offset) >= tolerance else device_timestamp
+    return correct, offset_now
+
+@transaction.atomic
+def ingest_page(terminal_id, device_now, punches):
+    """Stores one uploaded page after the terminal's watermark, all-or-nothing.
+
+    `punches` are dicts with sequence, employee_code and (device) timestamp. Sequences at or below the watermark are replays and are skipped, so re-sending a page is harmless; the new part must continue the watermark without gaps."""
+    terminal = Terminal.objects.select_for_update().get(pk=terminal_id)
+    server_now = timezone.now(); correct, offset = skew_corrector(terminal, device_now, server_now)
+    fresh = sorted((punch for punch in punches if punch['sequence'] > terminal.acknowledged_sequence), key=lambda punch: punch['sequence'])
+    expected = terminal.acknowledged_sequence + 1
+    for punch in fresh:
+        if punch['sequence'] != expected: raise SequenceGap(expected)
+        expected += 1
+    created = RawAttendanceLog.objects.bulk_create([
+        RawAttendanceLog(terminal=terminal, sequence=punch['sequence'], employee_code=punch['employee_code'], device_timestamp=punch['timestamp'], timestamp=correct(punch['timestamp']))
+        for punch in fresh
+    ])
+    record_changes(created); refresh_summaries(created)
+    if fresh: terminal.acknowledged_sequence = fresh[-1]['sequence']
+    terminal.clock_offset_seconds = offset; terminal.clock_checked_at = server_now; terminal.last_seen_at = server_now
+    terminal.save(update_fields=['acknowledged_sequence', 'clock_offset_seconds', 'clock_checked_at', 'last_seen_at'])
+    return terminal, len(created), len(punches) - len(fresh)
+
+def refresh_summaries(logs):
+    """Rebuilds the punch summaries touched by a bulk insert, once per employee over the span of its new punches."""
+    spans = {}
+    for log in logs:
+        low, high = spans.get(log.employee_code, (log.timestamp, log.timestamp)); spans[log.employee_code] = (min(low, log.timestamp), max(high, log.timestamp))
+    employees = list(Employee.objects.filter(employee_code__in=spans).select_related('site')); timeline = ShiftTimeline([employee.pk for employee in employees])
+    for employee in employees:
+        shift_rules = timeline.history(employee); low, high = spans[employee.employee_code]
+        with timezone.override(employee_timezone(employee)): first_day, last_day = work_date_for(low, shift_rules), work_date_for(high, shift_rules)
+        rebuild_summaries(employee, first_day, last_day, shift_rules)
\ No newline at end of file
@@ -1 +1,581 @@
-from django.test import TestCase
\ No newline at end of file
+import datetime
+from io import StringIO
+from unittest import skipIf
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from .models import Employee, WorkShift, ShiftDayRule, GlobalSettings, RawAttendanceLog, DailyPunchSummary, DailyAttendanceReport, ManualLogRequest
+
+def aware(day, hour, minute=0): return timezone.make_aware(datetime.datetime.combine(day, datetime.time(hour, minute)))
+
+# Tests run in one process, so they do not need the shared Redis cache of the deployment.
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AttendanceTestCase(TestCase):
+    """A day shift (08:00-17:00, 480 minutes, every day) with one employee on it."""
+    day = datetime.date(2026, 3, 4)
+    @classmethod
+    def setUpTestData(cls):
+        GlobalSettings.objects.get_or_create(pk=1)
+        cls.shift = WorkShift.objects.create(name='Day')
+        for weekday in range(7): ShiftDayRule.objects.create(shift=cls.shift, day_of_week=weekday, is_work_day=True, start_time=datetime.time(8), end_time=datetime.time(17), required_work_minutes=480)
+        cls.employee = Employee.objects.create(full_name='Alice', employee_code='A1', shift=cls.shift)
+    def summary(self, day=None): return DailyPunchSummary.objects.filter(employee=self.employee, date=day or self.day).first()
+
+class PunchSummaryUpkeepTests(AttendanceTestCase):
+    def test_direct_inserts_reach_the_calculation(self):
+        for hour in (8, 12, 17): RawAttendanceLog.objects.create(employee_code='A1', timestamp=aware(self.day, hour))
+        self.assertEqual(self.summary().punch_count, 3)
+        call_command('process_attendance', date=self.day.isoformat(), verbosity=0, stdout=StringIO())
+        report = DailyAttendanceReport.objects.get(employee=self.employee, date=self.day)
+        self.assertEqual(report.first_check_in, datetime.time(8)); self.assertEqual(report.total_worked_minutes, 240); self.assertTrue(report.has_unmatched_punch)
+    def test_edit_moves_the_punch_between_days(self):
+        punch = RawAttendanceLog.objects.create(employee_code='A1', timestamp=aware(self.day, 8))
+        RawAttendanceLog.objects.create(employee_code='A1', timestamp=aware(self.day, 17))
+        next_day = self.day + datetime.timedelta(days=1)
+        punch.timestamp = aware(next_day, 9); punch.save()
+        self.assertEqual(self.summary().punch_count, 1); self.assertEqual(self.summary().first_punch, aware(self.day, 17))
+        self.assertEqual(self.summary(next_day).punch_count, 1)
+    def test_delete_rebuilds_the_day(self):
+        first = RawAttendanceLog.objects.create(employee_code='A1', timestamp=aware(self.day, 8))
+        RawAttendanceLog.objects.create(employee_code='A1', timestamp=aware(self.day, 17))
+        first.delete()
+        self.assertEqual(self.summary().punch_count, 1)
+        RawAttendanceLog.objects.filter(employee_code='A1').delete()
+        self.assertIsNone(self.summary())
+    def test_approved_manual_log_is_summarized_once(self):
+        from django.contrib.auth.models import User, Group
+        from rest_framework.test import APIClient
+        manager = User.objects.create_user('boss', password='x'); Group.objects.get_or_create(name='Manager')[0].user_set.add(manager)
+        request = ManualLogRequest.objects.create(employee=self.employee, date=self.day, time=datetime.time(8), log_type=ManualLogRequest.LOG_TYPE_IN)
+        client = APIClient(); client.force_authenticate(manager)
+        self.assertEqual(client.post(f'/api/manager/review-log/{request.pk}/', {'action': 'APPROVE'}).status_code, 200)
+        self.assertEqual(self.summary().punch_count, 1)
+class SchedulerTests(AttendanceTestCase):
+    def test_pass_reprocesses_earlier_dates_with_changed_inputs(self):
+        from .models import SchedulerLease
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        call_command('process_attendance', date=yesterday.isoformat(), verbosity=0, stdout=StringIO())
+        self.assertEqual(DailyAttendanceReport.objects.get(employee=self.employee, date=yesterday).total_worked_minutes, 0)
+        SchedulerLease.objects.create(name='default', last_incremental_at=timezone.now() - datetime.timedelta(minutes=10))
+        # A late terminal sync delivers yesterday's punches.
+        for hour in (8, 17): RawAttendanceLog.objects.create(employee_code='A1', timestamp=aware(yesterday, hour))
+        call_command('run_scheduler', once=True, interval=1, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(DailyAttendanceReport.objects.get(employee=self.employee, date=yesterday).total_worked_minutes, 540)
+    def test_lost_lease_is_not_an_error(self):
+        from .scheduling import acquire_lease, record_run
+        acquire_lease('default', 'node-a', 60)
+        self.assertIsNone(record_run('default', 'node-b', error=RuntimeError('boom')))
+        self.assertEqual(record_run('default', 'node-a').last_status, 'OK')
+
+    def test_every_site_runs_on_its_own_day(self):
+        from unittest import mock
+        from .models import ProcessingRun, SchedulerLease, Site
+        for name, zone in (('Auckland', 'Pacific/Auckland'), ('Los Angeles', 'America/Los_Angeles')):
+            Employee.objects.create(full_name=name, employee_code=name[:3], shift=self.shift, site=Site.objects.create(name=name, timezone=zone))
+        # 12:00 UTC: already the 5th in Auckland, still early on the 4th in Los Angeles.
+        with mock.patch('django.utils.timezone.now', return_value=datetime.datetime(2026, 3, 4, 12, tzinfo=datetime.timezone.utc)):
+            call_command('run_scheduler', once=True, nightly_at='00:00', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(dict(ProcessingRun.objects.filter(site__isnull=False).values_list('site__name', 'start_date')), {'Auckland': datetime.date(2026, 3, 5), 'Los Angeles': datetime.date(2026, 3, 4)})
+        self.assertEqual(SchedulerLease.objects.get(name='Auckland').last_full_run_date, datetime.date(2026, 3, 5))
+        self.assertEqual(DailyAttendanceReport.objects.get(employee__employee_code='Auc').date, datetime.date(2026, 3, 5))
+
+class RendererTests(TestCase):
+    def test_orjson_output_matches_drf(self):
+        import json
+        from rest_framework.renderers import JSONRenderer
+        from core.renderers import FastJSONRenderer
+        data = {'at': datetime.datetime(2026, 3, 4, 8, 0, 1, 250000, tzinfo=datetime.timezone.utc), 'day': datetime.date(2026, 3, 4), 'time': datetime.time(8, 5), 1: 'x'}
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+        self.assertIn(b'"2026-03-04T08:00:01.250000Z"', FastJSONRenderer().render(data))
+
+class PolicyChangeTests(AttendanceTestCase):
+    def test_rule_change_is_recorded_and_applied_by_the_scheduler(self):
+        from .models import PolicyChange
+        day = timezone.localdate() - datetime.timedelta(days=2)
+        call_command('process_attendance', date=day.isoformat(), verbosity=0, stdout=StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            rule = ShiftDayRule.objects.get(shift=self.shift, day_of_week=day.weekday()); rule.required_work_minutes = 300; rule.save()
+        change = PolicyChange.objects.get()
+        self.assertEqual(change.status, PolicyChange.STATUS_PENDING)
+        self.assertEqual(DailyAttendanceReport.objects.get(date=day).required_work_minutes_today, 480)
+        from .recompute import apply_pending_changes
+        self.assertEqual([change.status for change in apply_pending_changes()], [PolicyChange.STATUS_APPLIED])
+        self.assertEqual(DailyAttendanceReport.objects.get(date=day).required_work_minutes_today, 300)
+    def test_recompute_updates_reports_in_place(self):
+        from .models import BalanceMovement, ChangeFeedEntry
+        from .recompute import apply_pending_changes
+        day, other_day = timezone.localdate() - datetime.timedelta(days=2), timezone.localdate() - datetime.timedelta(days=3)
+        for when in (day, other_day): RawAttendanceLog.objects.create(employee_code='A1', timestamp=aware(when, 8)); RawAttendanceLog.objects.create(employee_code='A1', timestamp=aware(when, 18))
+        for when in (day, other_day): call_command('process_attendance', date=when.isoformat(), verbosity=0, stdout=StringIO())
+        self.assertEqual(DailyAttendanceReport.objects.get(date=other_day).work_overtime_minutes, 0)
+        reports = dict(DailyAttendanceReport.objects.values_list('date', 'pk')); movements = BalanceMovement.objects.count(); entries = ChangeFeedEntry.objects.count()
+        # The end of a day shift changes no number of its reports.
+        rule = ShiftDayRule.objects.get(shift=self.shift, day_of_week=day.weekday()); rule.end_time = datetime.time(16); rule.save()
+        apply_pending_changes()
+        self.assertEqual(dict(DailyAttendanceReport.objects.values_list('date', 'pk')), reports)
+        self.assertEqual((BalanceMovement.objects.count(), ChangeFeedEntry.objects.count()), (movements, entries))
+        rule = ShiftDayRule.objects.get(shift=self.shift, day_of_week=other_day.weekday()); rule.is_work_day = False; rule.save()
+        RawAttendanceLog.objects.filter(timestamp__date=other_day).delete()
+        apply_pending_changes()
+        self.assertFalse(DailyAttendanceReport.objects.filter(date=other_day).exists()); self.assertEqual(DailyAttendanceReport.objects.get(date=day).pk, reports[day])
+    def test_holiday_reaches_employees_scheduled_only_through_assignments(self):
+        from .models import Holiday, ShiftAssignment
+        from .recompute import holiday_affected, recompute_window
+        window = recompute_window(); day = window[1] - datetime.timedelta(days=3)
+        ShiftAssignment.objects.create(employee=self.employee, shift=self.shift, effective_from=window[0])
+        ShiftAssignment.objects.create(employee=self.employee, shift=None, effective_from=window[1] - datetime.timedelta(days=1))
+        Employee.objects.filter(pk=self.employee.pk).update(shift=None)
+        self.assertEqual(holiday_affected([day, window[1]], window), {day: [self.employee.pk]})
+
+class LedgerTests(AttendanceTestCase):
+    def overtime(self): from .ledger import balances; return balances(self.employee.pk).get('OVERTIME', 0)
+    def test_snapshots_and_movements_agree(self):
+        from .ledger import take_snapshots
+        from .models import BalanceMovement
+        report = DailyAttendanceReport.objects.create(employee=self.employee, date=self.day, work_overtime_minutes=60)
+        take_snapshots(); self.assertEqual(self.overtime(), 60)
+        report.work_overtime_minutes = 90; report.save()
+        DailyAttendanceReport.objects.create(employee=self.employee, date=self.day + datetime.timedelta(days=1), work_overtime_minutes=15)
+        self.assertEqual(self.overtime(), 105)
+        take_snapshots(); take_snapshots()
+        self.assertEqual(self.overtime(), 105)
+        self.assertEqual(self.overtime(), sum(BalanceMovement.objects.filter(employee=self.employee, account='OVERTIME').values_list('minutes', flat=True)))
+    def test_stale_saves_do_not_post_twice(self):
+        from .ledger import post_report
+        from .models import BalanceMovement
+        report = DailyAttendanceReport.objects.create(employee=self.employee, date=self.day, work_overtime_minutes=60)
+        stale = DailyAttendanceReport.objects.get(pk=report.pk); stale.work_overtime_minutes = 30
+        post_report(report); post_report(stale)
+        self.assertEqual(BalanceMovement.objects.filter(employee=self.employee).count(), 1); self.assertEqual(self.overtime(), 60)
+        report.delete(); self.assertEqual(self.overtime(), 0)
+
+class PunchArchiveTests(AttendanceTestCase):
+    def setUp(self):
+        import tempfile
+        directory = tempfile.TemporaryDirectory(); self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(PUNCH_ARCHIVE_DIR=directory.name))
+    def archive(self, *args): call_command('archive_punches', '--before', '2026-05', *args, stdout=StringIO())
+    def punches(self):
+        from .intervals import load_punches, shift_rules_by_weekday
+        return load_punches('A1', self.day, self.day, shift_rules_by_weekday(self.shift))
+    def test_round_trips_count_every_punch_once(self):
+        from .archive import archive_path, PunchArchive
+        from .models import ArchivedMonth, ChangeFeedEntry
+        for hour in (8, 12, 17): RawAttendanceLog.objects.create(employee_code='A1', timestamp=aware(self.day, hour))
+        self.archive('--keep-rows'); self.archive('--keep-rows')
+        self.assertEqual(ArchivedMonth.objects.get().punch_count, 3); self.assertEqual(len(self.punches()), 3)
+        feed_entries = ChangeFeedEntry.objects.count()
+        self.archive()
+        self.assertFalse(RawAttendanceLog.objects.exists()); self.assertEqual(ChangeFeedEntry.objects.count(), feed_entries)
+        self.assertEqual(self.summary().punch_count, 3)
+        # A late punch is read alongside the file, then merged into it.
+        RawAttendanceLog.objects.create(employee_code='A1', timestamp=aware(self.day, 13))
+        self.assertEqual(len(self.punches()), 4)
+        self.archive()
+        with PunchArchive(archive_path(2026, 3)) as archive: self.assertEqual(archive.punches('A1'), [aware(self.day, hour) for hour in (8, 12, 13, 17)])
+        self.assertEqual(self.punches(), [aware(self.day, hour) for hour in (8, 12, 13, 17)])
+    def test_codes_must_fit_the_index_in_utf8(self):
+        from django.core.management.base import CommandError
+        from .archive import archive_path, PunchArchive
+        fitting = 'ك' * 25; too_long = 'ك' * 26
+        for code in (fitting, too_long): RawAttendanceLog.objects.create(employee_code=code, timestamp=aware(self.day, 8))
+        with self.assertRaisesMessage(CommandError, '52 bytes'): self.archive()
+        self.assertFalse(archive_path(2026, 3).exists()); self.assertEqual(RawAttendanceLog.objects.count(), 2)
+        RawAttendanceLog.objects.filter(employee_code=too_long).delete(); self.archive()
+        with PunchArchive(archive_path(2026, 3)) as archive: self.assertEqual(list(archive.employees()), [(fitting, 0, 1)]); self.assertEqual(archive.punches(fitting), [aware(self.day, 8)])
+
+class ClosedPeriodTests(AttendanceTestCase):
+    def test_closing_moves_the_rows_and_guards_writes_at_once(self):
+        from .ledger import balances
+        from .models import ChangeFeedEntry
+        from .periods import PeriodClosed, close_period, closed_ranges, period_reports
+        report = DailyAttendanceReport.objects.create(employee=self.employee, date=self.day, total_worked_minutes=540, work_overtime_minutes=60)
+        self.assertEqual(closed_ranges(), []); feed_entries = ChangeFeedEntry.objects.count()
+        close_period(self.day.year, self.day.month, keep_rows=False)
+        self.assertFalse(DailyAttendanceReport.objects.exists()); self.assertEqual(ChangeFeedEntry.objects.count(), feed_entries)
+        self.assertEqual(balances(self.employee.pk)['OVERTIME'], 60)
+        self.assertEqual([row[7] for row in period_reports([self.employee.pk], self.day, self.day)], [540])
+        # The cached ranges are only dropped on commit; the write guard does not wait for that.
+        with self.assertRaises(PeriodClosed): DailyAttendanceReport.objects.create(employee=self.employee, date=self.day)
+    def test_closed_months_keep_their_rows_and_outlive_their_employees(self):
+        from .models import ClosedPeriod, PeriodSnapshot
+        from .periods import PeriodClosed, close_period, period_reports, verify_period
+        report = DailyAttendanceReport.objects.create(employee=self.employee, date=self.day, total_worked_minutes=540)
+        other = Employee.objects.create(full_name='Bob', employee_code='B1', shift=self.shift); DailyAttendanceReport.objects.create(employee=other, date=self.day, total_worked_minutes=300)
+        call_command('close_period', month=f"{self.day:%Y-%m}", stdout=StringIO())
+        self.assertEqual(DailyAttendanceReport.objects.count(), 2); self.assertEqual([row[7] for row in period_reports([self.employee.pk], self.day, self.day)], [540])
+        from django.db import transaction
+        with self.assertRaises(PeriodClosed), transaction.atomic(): report.delete()
+        self.employee.delete()
+        period = ClosedPeriod.objects.get(); self.assertEqual(PeriodSnapshot.objects.filter(period=period, employee__isnull=True).count(), 1)
+        self.assertTrue(verify_period(period)); self.assertEqual(DailyAttendanceReport.objects.get().employee, other)
+
+class ChangeFeedTests(AttendanceTestCase):
+    def test_unchanged_saves_are_not_announced(self):
+        from .models import ChangeFeedEntry
+        call_command('process_attendance', date=self.day.isoformat(), verbosity=0, stdout=StringIO())
+        call_command('process_attendance', date=self.day.isoformat(), verbosity=0, stdout=StringIO())
+        self.assertEqual(ChangeFeedEntry.objects.filter(kind='report').count(), 1)
+        report = DailyAttendanceReport.objects.get(); report.save()
+        self.assertEqual(ChangeFeedEntry.objects.filter(kind='report').count(), 1)
+        report.penalty_minutes = 5; report.save()
+        self.assertEqual(ChangeFeedEntry.objects.filter(kind='report').count(), 2)
+
+class SiteTests(AttendanceTestCase):
+    def test_lateness_is_judged_on_the_employee_clock(self):
+        from .models import Site
+        from .reports import team_matrix_rows
+        self.employee.site = Site.objects.create(name='Tehran', timezone='Asia/Tehran'); self.employee.save()
+        # 04:40 UTC is 08:10 in Tehran: late there, early on the server clock.
+        RawAttendanceLog.objects.create(employee_code='A1', timestamp=datetime.datetime(2026, 3, 4, 4, 40, tzinfo=datetime.timezone.utc))
+        with timezone.override('UTC'): row, = team_matrix_rows(Employee.objects.select_related('site'), self.day, self.day)
+        self.assertIn('LATE', row['days'][0]['flags'])
+    def test_partitions_include_assignment_only_employees(self):
+        from .models import ShiftAssignment, Site
+        from .sites import partitions
+        Site.objects.create(name='Tehran', timezone='Asia/Tehran')
+        ShiftAssignment.objects.create(employee=self.employee, shift=self.shift, effective_from=self.day)
+        Employee.objects.filter(pk=self.employee.pk).update(shift=None)
+        self.assertIn(None, partitions())
+
+class RollupTests(AttendanceTestCase):
+    def test_incremental_pass_refreshes_only_the_groups_it_touched(self):
+        from .models import AttendanceRollup
+        manager = Employee.objects.create(full_name='Boss', employee_code='M1')
+        Employee.objects.create(full_name='Bob', employee_code='B1', shift=self.shift, manager=manager)
+        call_command('process_attendance', date=self.day.isoformat(), verbosity=0, stdout=StringIO())
+        self.assertEqual(AttendanceRollup.objects.filter(date=self.day).count(), 2)
+        AttendanceRollup.objects.filter(manager=manager).update(late=99)
+        since = timezone.now()
+        RawAttendanceLog.objects.create(employee_code='A1', timestamp=aware(self.day, 8, 20))
+        call_command('process_attendance', date=self.day.isoformat(), changed_since=since.isoformat(), verbosity=0, stdout=StringIO())
+        self.assertEqual(AttendanceRollup.objects.get(manager=manager).late, 99)
+        own = AttendanceRollup.objects.get(manager=None, shift=self.shift)
+        self.assertEqual((own.employees, own.present, own.late, own.late_minutes), (1, 1, 1, 20))
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+@skipIf(connection.vendor == 'sqlite', "SQLite admits one writer at a time, and its in-memory test database refuses a second one outright.")
+class ChangeFeedOrderingTests(TransactionTestCase):
+    def test_cursor_never_passes_an_entry_still_being_written(self):
+        import threading
+        from django.db import transaction
+        from .changefeed import read_changes, record_change
+        employee = Employee.objects.create(full_name='Alice', employee_code='A1')
+        first, second = [DailyAttendanceReport.objects.create(employee=employee, date=datetime.date(2026, 3, day)) for day in (4, 5)]
+        cursor = read_changes([employee.pk], 0, 10)['cursor']
+        wrote, release = threading.Event(), threading.Event()
+        def slow_writer():
+            try:
+                with transaction.atomic(): record_change(first); wrote.set(); release.wait(5)
+            finally: connection.close()
+        def quick_writer():
+            try: record_change(second)
+            finally: connection.close()
+        slow = threading.Thread(target=slow_writer); slow.start(); wrote.wait(5)
+        # The quick writer gets the higher id but may not commit before the slow one, or a reader would move past the slow entry.
+        quick = threading.Thread(target=quick_writer); quick.start(); quick.join(0.5)
+        page = read_changes([employee.pk], cursor, 10)
+        self.assertEqual(page['changes'], [])
+        release.set(); slow.join(); quick.join()
+        self.assertEqual([change['id'] for change in read_changes([employee.pk], page['cursor'], 10)['changes']], [first.pk, second.pk])
+
+
+# The replica is a TEST MIRROR of default on a second connection, which only sees committed rows.
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        cache.clear(); GlobalSettings.objects.get_or_create(pk=1)
+        self.user = User.objects.create_user('alice', password='x'); self.employee = Employee.objects.create(full_name='Alice', employee_code='A1', user=self.user)
+    def serve(self, method):
+        """Runs a request through the routing middleware to a reporting view; returns where it read and wrote."""
+        from django.db import router
+        from rest_framework.response import Response
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from rest_framework.views import APIView
+        from core.replica import ReplicaReadMixin, ReplicaRoutingMiddleware
+        seen = {}
+        class Probe(ReplicaReadMixin, APIView):
+            def get(self, request): seen['read'] = router.db_for_read(Employee); return Response()
+            def post(self, request):
+                seen['read'] = router.db_for_read(Employee); seen['write'] = router.db_for_write(Employee)
+                Employee.objects.filter(user=request.user).update(full_name='Alice B'); return Response()
+        request = getattr(APIRequestFactory(), method)('/probe/'); force_authenticate(request, self.user); request.user = self.user
+        ReplicaRoutingMiddleware(Probe.as_view())(request)
+        return seen
+    def test_reads_go_to_the_replica(self):
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework.test import APIClient
+        self.assertEqual(self.serve('get'), {'read': 'replica'})
+        client = APIClient(); client.force_authenticate(self.user)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(client.get('/api/requests/my-history/').status_code, 200)
+        self.assertTrue(replica.captured_queries)
+    def test_unsafe_methods_and_writes_stay_on_the_primary(self):
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(self.serve('post'), {'read': 'default', 'write': 'default'})
+        self.assertFalse(replica.captured_queries); self.assertEqual(Employee.objects.get(pk=self.employee.pk).full_name, 'Alice B')
+    def test_a_write_pins_the_user_to_the_primary(self):
+        from django.core.cache import cache
+        self.serve('post')
+        self.assertEqual(self.serve('get'), {'read': 'default'})
+        cache.clear()
+        self.assertEqual(self.serve('get'), {'read': 'replica'})
+
+class BulkRequestTests(AttendanceTestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        user = User.objects.create_user('alice', password='x'); Employee.objects.filter(pk=self.employee.pk).update(user=user)
+        self.client = APIClient(); self.client.force_authenticate(user)
+    def post(self, url, data): return self.client.post(url, data, format='json')
+    def dates(self, model): return sorted(model.objects.filter(employee=self.employee).values_list('date', flat=True))
+    def test_duplicates_in_the_batch_and_in_the_table_are_rejected(self):
+        from .models import OvertimeRequest
+        OvertimeRequest.objects.create(employee=self.employee, date=self.day, requested_minutes=30)
+        next_day = (self.day + datetime.timedelta(days=1)).isoformat()
+        response = self.post('/api/overtime/request/bulk/', {'items': [{'date': self.day.isoformat(), 'requested_minutes': 60}, {'date': next_day, 'requested_minutes': 60}, {'date': next_day, 'requested_minutes': 90}]})
+        self.assertEqual(response.status_code, 400); self.assertEqual(response.json()['created'], 0)
+        self.assertEqual(response.json()['errors'], [{'index': 0, 'errors': [{'non_field_errors': ["An overtime request for this date already exists."]}]}, {'index': 2, 'errors': [{'non_field_errors': ["Duplicated within this batch."]}]}])
+        self.assertEqual(self.dates(OvertimeRequest), [self.day])
+    def test_manual_logs_only_clash_with_requests_still_standing(self):
+        response = self.post('/api/log/request-bulk/', {'items': [{'date': self.day.isoformat(), 'start_time': '08:00', 'end_time': '17:00'}]})
+        self.assertEqual(response.status_code, 201); self.assertEqual(len(response.json()), 2)
+        self.assertEqual(self.post('/api/log/request-bulk/', {'items': [{'date': self.day.isoformat(), 'start_time': '08:00', 'end_time': '12:00'}]}).status_code, 400)
+        ManualLogRequest.objects.filter(employee=self.employee, time=datetime.time(8)).update(status=ManualLogRequest.STATUS_REJECTED)
+        self.assertEqual(self.post('/api/log/request-bulk/', {'items': [{'date': self.day.isoformat(), 'start_time': '08:00', 'end_time': '12:00'}]}).status_code, 201)
+    def test_every_invalid_item_is_reported_and_nothing_is_created(self):
+        from .models import LeaveRequest
+        response = self.post('/api/leave/request/bulk/', {'items': [{'date': self.day.isoformat(), 'leave_type': 'FULL_DAY'}, {'date': 'not a date', 'leave_type': 'FULL_DAY'}, {'date': '2026-03-06', 'leave_type': 'HOURLY'}]})
+        self.assertEqual(response.status_code, 400); self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2])
+        self.assertIn('date', response.json()['errors'][0]['errors'][0])
+        self.assertEqual(self.dates(LeaveRequest), [])
+    def test_a_failed_insert_leaves_no_part_of_the_batch(self):
+        from unittest import mock
+        from .models import OvertimeRequest
+        from .views import OvertimeRequestBulkView
+        OvertimeRequest.objects.create(employee=self.employee, date=self.day + datetime.timedelta(days=2))
+        # The row landed after the duplicate check, as a concurrent submission would.
+        with mock.patch.object(OvertimeRequestBulkView, 'get_existing_queryset', lambda view, employee, dates: OvertimeRequest.objects.none()):
+            response = self.post('/api/overtime/request/bulk/', {'start_date': self.day.isoformat(), 'end_date': (self.day + datetime.timedelta(days=3)).isoformat(), 'defaults': {'requested_minutes': 60}})
+        self.assertEqual(response.status_code, 409); self.assertEqual(self.dates(OvertimeRequest), [self.day + datetime.timedelta(days=2)])
+    def test_skip_off_days_leaves_out_rest_days_and_holidays(self):
+        from .models import Holiday, MissionRequest
+        ShiftDayRule.objects.filter(shift=self.shift, day_of_week__in=[5, 6]).update(is_work_day=False)
+        Holiday.objects.create(date=self.day, name='Founders day')
+        data = {'start_date': '2026-03-02', 'end_date': '2026-03-08', 'defaults': {'mission_type': 'FULL_DAY', 'destination': 'Branch'}}
+        self.assertEqual(self.post('/api/mission/request/bulk/', {**data, 'skip_off_days': True}).status_code, 201)
+        self.assertEqual(self.dates(MissionRequest), [datetime.date(2026, 3, day) for day in (2, 3, 5, 6)])
+        MissionRequest.objects.all().delete()
+        self.assertEqual(self.post('/api/mission/request/bulk/', data).status_code, 201); self.assertEqual(len(self.dates(MissionRequest)), 7)
+    def test_a_batch_covers_at_most_a_year(self):
+        from .models import OvertimeRequest
+        start = datetime.date(2025, 1, 1)
+        self.assertEqual(self.post('/api/overtime/request/bulk/', {'start_date': start.isoformat(), 'end_date': (start + datetime.timedelta(days=366)).isoformat()}).status_code, 400)
+        self.assertEqual(self.post('/api/overtime/request/bulk/', {'items': [{'date': (start + datetime.timedelta(days=offset)).isoformat()} for offset in range(367)]}).status_code, 400)
+        self.assertEqual(self.dates(OvertimeRequest), [])
+        self.assertEqual(self.post('/api/overtime/request/bulk/', {'start_date': start.isoformat(), 'end_date': (start + datetime.timedelta(days=365)).isoformat()}).status_code, 201)
+        self.assertEqual(len(self.dates(OvertimeRequest)), 366)
+
+
+class TerminalSyncTests(AttendanceTestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from .models import Terminal
+        self.terminal = Terminal.objects.create(name='Gate', serial='T-1')
+        self.client = APIClient(HTTP_X_TERMINAL_SERIAL='T-1', HTTP_X_TERMINAL_KEY=self.terminal.api_key)
+    def sync(self, punches, device_time=None, server_time=None):
+        """Uploads (sequence, device timestamp) punches of A1 with the server clock at server_time."""
+        from unittest import mock
+        server_time = server_time or aware(self.day, 18)
+        data = {'device_time': (device_time or server_time).isoformat(), 'punches': [{'sequence': sequence, 'employee_code': 'A1', 'timestamp': timestamp.isoformat()} for sequence, timestamp in punches]}
+        with mock.patch('django.utils.timezone.now', return_value=server_time): return self.client.post('/api/terminals/sync/', data, format='json')
+    def test_a_page_must_continue_the_watermark(self):
+        response = self.sync([(2, aware(self.day, 8))])
+        self.assertEqual(response.status_code, 409); self.assertEqual(response.json()['expected_sequence'], 1)
+        self.assertEqual(self.sync([(1, aware(self.day, 8)), (3, aware(self.day, 17))]).json()['expected_sequence'], 2)
+        self.assertFalse(RawAttendanceLog.objects.exists()); self.assertIsNone(self.summary())
+        self.assertEqual(self.client.get('/api/terminals/sync/').json()['acknowledged_sequence'], 0)
+    def test_replayed_pages_are_stored_once(self):
+        page = [(1, aware(self.day, 8)), (2, aware(self.day, 12))]
+        self.assertEqual(self.sync(page).json()['accepted'], 2)
+        response = self.sync(page).json(); self.assertEqual((response['accepted'], response['duplicates'], response['acknowledged_sequence']), (0, 2, 2))
+        response = self.sync(page[1:] + [(3, aware(self.day, 17))]).json(); self.assertEqual((response['accepted'], response['duplicates'], response['acknowledged_sequence']), (1, 1, 3))
+        self.assertEqual(RawAttendanceLog.objects.filter(terminal=self.terminal).count(), 3); self.assertEqual(self.summary().punch_count, 3)
+    def test_device_clock_skew_is_corrected(self):
+        # A few seconds off is within the tolerance and left alone.
+        self.assertEqual(self.sync([(1, aware(self.day, 8))], device_time=aware(self.day, 9) - datetime.timedelta(seconds=3), server_time=aware(self.day, 9)).json()['clock_offset_seconds'], 3)
+        self.assertEqual(RawAttendanceLog.objects.get(sequence=1).timestamp, aware(self.day, 8))
+        self.sync([(2, aware(self.day, 11, 58))], device_time=aware(self.day, 11, 58), server_time=aware(self.day, 12))
+        punch = RawAttendanceLog.objects.get(sequence=2); self.assertEqual(punch.timestamp, aware(self.day, 12)); self.assertEqual(punch.device_timestamp, aware(self.day, 11, 58))
+        # Four minutes behind by 16:00: a punch halfway between the syncs in device time gets the offset halfway between them.
+        self.assertEqual(self.sync([(3, aware(self.day, 13, 57))], device_time=aware(self.day, 15, 56), server_time=aware(self.day, 16)).json()['clock_offset_seconds'], 240)
+        self.assertEqual(RawAttendanceLog.objects.get(sequence=3).timestamp, aware(self.day, 14))
+
+# The search view reads from the replica, whose connection cannot see the rows of this test's open transaction.
+@override_settings(DATABASE_ROUTERS=[])
+class RequestSearchTests(AttendanceTestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        self.client = APIClient(); self.client.force_authenticate(User.objects.create_user('hr', password='x', is_staff=True))
+    def fts_ids(self, word):
+        from .search import FTS_TABLE
+        with connection.cursor() as cursor: cursor.execute(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rowid", [f'"{word}"']); return [row[0] for row in cursor.fetchall()]
+    def search(self, **params): return [(row['kind'], row['id']) for row in self.client.get('/api/requests/search/', params).json()['results']]
+    @skipIf(connection.vendor != 'sqlite', "The FTS5 table exists on SQLite only.")
+    def test_the_index_follows_saves_deletes_and_admin_actions(self):
+        from unittest import mock
+        from .admin import set_request_status
+        from .models import LeaveRequest, RequestSearchEntry
+        leave = LeaveRequest.objects.create(employee=self.employee, date=self.day, leave_type=LeaveRequest.TYPE_FULL_DAY, reason='Dentist appointment')
+        entry = RequestSearchEntry.objects.get(kind='leave', request_id=leave.pk)
+        self.assertEqual(self.fts_ids('dentist'), [entry.pk])
+        leave.reason = 'Moving house'; leave.save()
+        self.assertEqual(self.fts_ids('dentist'), []); self.assertEqual(self.fts_ids('moving'), [entry.pk])
+        set_request_status(mock.Mock(), None, LeaveRequest.objects.filter(pk=leave.pk), LeaveRequest.STATUS_APPROVED)
+        self.assertEqual(RequestSearchEntry.objects.get(pk=entry.pk).status, LeaveRequest.STATUS_APPROVED); self.assertEqual(self.fts_ids('moving'), [entry.pk])
+        leave.delete()
+        self.assertFalse(RequestSearchEntry.objects.exists()); self.assertEqual(self.fts_ids('moving'), [])
+    def test_every_word_must_match_as_a_prefix(self):
+        from .models import MissionRequest, OvertimeRequest
+        mission = MissionRequest.objects.create(employee=self.employee, date=self.day, mission_type=MissionRequest.TYPE_FULL_DAY, destination='Tabriz branch', reason='Server installation')
+        overtime = OvertimeRequest.objects.create(employee=self.employee, date=self.day + datetime.timedelta(days=1), requested_minutes=60, reason='Server migration')
+        self.assertEqual(self.search(q='server'), [('overtime', overtime.pk), ('mission', mission.pk)])
+        self.assertEqual(self.search(q='serv instal'), [('mission', mission.pk)]); self.assertEqual(self.search(q='tabriz'), [('mission', mission.pk)])
+        self.assertEqual(self.search(q='server', kind='overtime'), [('overtime', overtime.pk)]); self.assertEqual(self.search(q='installation migration'), [])
+        OvertimeRequest.objects.filter(pk=overtime.pk).update(status=OvertimeRequest.STATUS_REJECTED)
+        self.assertEqual(self.search(q='server', status='pending'), [('overtime', overtime.pk), ('mission', mission.pk)])
+        overtime.refresh_from_db(); overtime.save()
+        self.assertEqual(self.search(q='server', status='pending'), [('mission', mission.pk)])
+        self.assertEqual(self.client.get('/api/requests/search/').status_code, 400)
+
+
+# As RequestSearchTests: the history views read from the replica.
+@override_settings(DATABASE_ROUTERS=[])
+class ConditionalGetTests(AttendanceTestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        user = User.objects.create_user('alice', password='x'); Employee.objects.filter(pk=self.employee.pk).update(user=user)
+        self.client = APIClient(); self.client.force_authenticate(user)
+    def leave(self, day): from .models import LeaveRequest; return LeaveRequest.objects.create(employee=self.employee, date=day, leave_type=LeaveRequest.TYPE_FULL_DAY)
+    def etag(self):
+        response = self.client.get('/api/leave/my-history/'); self.assertEqual(response.status_code, 200)
+        return response['ETag']
+    def test_an_unchanged_list_answers_304(self):
+        self.leave(self.day); etag = self.etag()
+        response = self.client.get('/api/leave/my-history/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304); self.assertEqual(response['ETag'], etag); self.assertFalse(response.content)
+        self.assertEqual(self.client.get('/api/leave/my-history/', HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+    def test_the_stamp_changes_on_create_update_and_delete(self):
+        earlier = self.leave(self.day - datetime.timedelta(days=1)); seen = [self.etag()]
+        leave = self.leave(self.day); seen.append(self.etag())
+        leave.reason = 'Family'; leave.save(); seen.append(self.etag())
+        earlier.delete(); seen.append(self.etag())
+        self.assertEqual(len(set(seen)), 4)
+    def test_a_delete_plus_an_insert_in_one_clock_tick_changes_the_stamp(self):
+        from unittest import mock
+        from .conditional import version_stamp
+        from .models import LeaveRequest
+        with mock.patch('django.utils.timezone.now', return_value=aware(self.day, 9)):
+            first = self.leave(self.day); self.leave(self.day + datetime.timedelta(days=1))
+            before = version_stamp(LeaveRequest.objects.all()); etag = self.etag()
+            first.delete(); self.leave(self.day + datetime.timedelta(days=2))
+        after = version_stamp(LeaveRequest.objects.all())
+        self.assertEqual((after.count, after.last_modified), (before.count, before.last_modified)); self.assertNotEqual(after, before)
+        self.assertEqual(self.client.get('/api/leave/my-history/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class NightShiftTests(AttendanceTestCase):
+    """A 22:00-06:00 shift: its day closes at 14:00 the next morning, halfway to the following start."""
+    def setUp(self):
+        night = WorkShift.objects.create(name='Night')
+        for weekday in range(7): ShiftDayRule.objects.create(shift=night, day_of_week=weekday, is_work_day=True, start_time=datetime.time(22), end_time=datetime.time(6), required_work_minutes=480)
+        self.employee = Employee.objects.create(full_name='Nadia', employee_code='N1', shift=night); self.rules = {rule.day_of_week: rule for rule in night.day_rules.all()}
+        self.next_day = self.day + datetime.timedelta(days=1)
+    def punch(self, *moments):
+        for day, hour, minute in moments: RawAttendanceLog.objects.create(employee_code='N1', timestamp=aware(day, hour, minute))
+    def test_the_day_closes_at_the_midpoint_to_the_next_start(self):
+        from .intervals import day_cutoff, work_date_for
+        self.assertEqual(day_cutoff(self.day, self.rules), aware(self.next_day, 14))
+        self.assertEqual(work_date_for(aware(self.next_day, 13, 59), self.rules), self.day); self.assertEqual(work_date_for(aware(self.next_day, 14), self.rules), self.next_day)
+        self.assertEqual(day_cutoff(self.day, {self.day.weekday(): self.rules[self.day.weekday()]}), aware(self.next_day, 14))
+        self.rules[self.next_day.weekday()].start_time = datetime.time(20)
+        self.assertEqual(day_cutoff(self.day, self.rules), aware(self.next_day, 13))
+    def test_punches_pair_across_midnight(self):
+        self.punch((self.day, 21, 55), (self.next_day, 6, 5), (self.next_day, 21, 58))
+        self.assertEqual((self.summary().punch_count, self.summary().presence_minutes, self.summary().has_unmatched_punch), (2, 490, False))
+        self.assertEqual(self.summary(self.next_day).punch_count, 1)
+        call_command('process_attendance', date=self.day.isoformat(), verbosity=0, stdout=StringIO())
+        report = DailyAttendanceReport.objects.get(employee=self.employee, date=self.day)
+        self.assertEqual((report.first_check_in, report.last_check_out, report.total_worked_minutes, report.total_lateness_minutes), (datetime.time(21, 55), datetime.time(6, 5), 490, 0)); self.assertFalse(report.has_unmatched_punch)
+    def test_an_odd_punch_is_flagged_not_dropped(self):
+        self.punch((self.day, 22, 0), (self.next_day, 2, 0), (self.next_day, 3, 0))
+        summary = self.summary(); self.assertEqual((summary.punch_count, summary.presence_minutes), (3, 240)); self.assertTrue(summary.has_unmatched_punch)
+        call_command('process_attendance', date=self.day.isoformat(), verbosity=0, stdout=StringIO())
+        report = DailyAttendanceReport.objects.get(employee=self.employee, date=self.day)
+        self.assertTrue(report.has_unmatched_punch); self.assertEqual(report.total_worked_minutes, 240)
+
+
+class ShiftTimelineTests(AttendanceTestCase):
+    def setUp(self):
+        from .models import ShiftAssignment
+        self.evening = WorkShift.objects.create(name='Evening')
+        for weekday in range(7): ShiftDayRule.objects.create(shift=self.evening, day_of_week=weekday, is_work_day=True, start_time=datetime.time(14), end_time=datetime.time(22), required_work_minutes=480)
+        self.moved = Employee.objects.create(full_name='Bob', employee_code='B1', shift=self.evening)
+        ShiftAssignment.objects.filter(employee=self.moved).delete()
+        ShiftAssignment.objects.bulk_create([ShiftAssignment(employee=self.moved, shift=self.shift, effective_from=datetime.date(2026, 1, 1)), ShiftAssignment(employee=self.moved, shift=self.evening, effective_from=self.day)])
+    def test_the_assignment_applies_from_its_effective_date(self):
+        from .assignments import ShiftTimeline
+        history = ShiftTimeline([self.moved.pk]).history(self.moved); day_before = self.day - datetime.timedelta(days=1)
+        self.assertEqual([history.shift_id_on(day) for day in (day_before, self.day, self.day + datetime.timedelta(days=1))], [self.shift.pk, self.evening.pk, self.evening.pk])
+        self.assertEqual(history.on(day_before).start_time, datetime.time(8)); self.assertEqual(history.on(self.day).start_time, datetime.time(14))
+        # The first assignment also covers the days before it.
+        self.assertEqual(history.shift_id_on(datetime.date(2025, 6, 1)), self.shift.pk)
+        self.assertEqual(history.shift_ids_between(day_before - datetime.timedelta(days=7), day_before), {self.shift.pk}); self.assertEqual(history.shift_ids_between(day_before, self.day), {self.shift.pk, self.evening.pk})
+    def test_employees_without_assignments_keep_their_shift(self):
+        from .assignments import ShiftTimeline
+        from .models import ShiftAssignment
+        ShiftAssignment.objects.filter(employee=self.employee).delete(); unassigned = Employee.objects.create(full_name='Carol', employee_code='C1')
+        # The day shift's rules are already loaded for Bob's first assignment.
+        with self.assertNumQueries(2):
+            timeline = ShiftTimeline([self.employee.pk, self.moved.pk, unassigned.pk])
+            history = timeline.history(self.employee)
+        for day in (datetime.date(2000, 1, 1), self.day, datetime.date(2030, 1, 1)): self.assertEqual(history.shift_id_on(day), self.shift.pk); self.assertEqual(history.on(day).start_time, datetime.time(8))
+        self.assertEqual(timeline.shift_id(self.moved, self.day), self.evening.pk)
+        self.assertIsNone(timeline.history(unassigned).on(self.day)); self.assertEqual(timeline.history(unassigned).shift_ids_between(self.day, self.day), set())
+
+
+class PolicySimulationTests(AttendanceTestCase):
+    def test_the_current_policy_reproduces_process_attendance(self):
+        from .models import Holiday, LeaveRequest, MissionRequest, OvertimeRequest
+        from .periods import TOTALS
+        from .simulation import PeriodInputs
+        ShiftDayRule.objects.filter(shift=self.shift, day_of_week=6).update(is_work_day=False)
+        other = Employee.objects.create(full_name='Bob', employee_code='B1', shift=self.shift)
+        start = datetime.date(2026, 3, 2); days = [start + datetime.timedelta(days=offset) for offset in range(7)]
+        for code, day, hours in [('A1', days[0], ((9, 45), (17, 30))), ('A1', days[1], ((8, 0), (12, 0), (13, 0), (19, 0))), ('A1', days[3], ((8, 10), (16, 0))), ('A1', days[6], ((10, 0), (14, 0))),
+                                 ('B1', days[0], ((8, 0), (17, 0))), ('B1', days[4], ((7, 55), (15, 0))), ('B1', days[5], ((8, 0),))]:
+            for hour, minute in hours: RawAttendanceLog.objects.create(employee_code=code, timestamp=aware(day, hour, minute))
+        Holiday.objects.create(date=days[2], name='Holiday')
+        OvertimeRequest.objects.create(employee=self.employee, date=days[1], requested_minutes=60, status=OvertimeRequest.STATUS_APPROVED)
+        OvertimeRequest.objects.create(employee=self.employee, date=days[6], requested_minutes=60, status=OvertimeRequest.STATUS_APPROVED)
+        LeaveRequest.objects.create(employee=self.employee, date=days[3], leave_type=LeaveRequest.TYPE_HOURLY, start_time=datetime.time(16), end_time=datetime.time(17), status=LeaveRequest.STATUS_APPROVED)
+        LeaveRequest.objects.create(employee=other, date=days[1], leave_type=LeaveRequest.TYPE_FULL_DAY, status=LeaveRequest.STATUS_APPROVED)
+        MissionRequest.objects.create(employee=other, date=days[3], mission_type=MissionRequest.TYPE_FULL_DAY, destination='Branch', status=MissionRequest.STATUS_APPROVED)
+        MissionRequest.objects.create(employee=other, date=days[4], mission_type=MissionRequest.TYPE_HOURLY, start_time=datetime.time(15), end_time=datetime.time(17), destination='Bank', status=MissionRequest.STATUS_APPROVED)
+        call_command('process_attendance', date=days[0].isoformat(), end_date=days[-1].isoformat(), verbosity=0, stdout=StringIO())
+        period = PeriodInputs(days[0], days[-1]); self.assertEqual(len(period), 14)
+        simulated = period.score(period.current_policy())
+        for employee in (self.employee, other):
+            reports = DailyAttendanceReport.objects.filter(employee=employee, date__range=(days[0], days[-1]))
+            for total, field in TOTALS.items():
+                with self.subTest(employee=employee.employee_code, total=total): self.assertAlmostEqual(simulated[employee.pk][total], sum(getattr(report, field) for report in reports))
+        self.assertGreater(simulated[self.employee.pk]['penalty_minutes'], 0); self.assertGreater(simulated[self.employee.pk]['overtime_minutes'], 0)
@@ -1,24 +1,45 @@
 from rest_framework import generics
 from .models import (
     RawAttendanceLog, OvertimeRequest, DailyAttendanceReport, 
-    LeaveRequest, MissionRequest, ManualLogRequest, Holiday, GlobalSettings, WorkShift, Employee, ShiftDayRule
+    LeaveRequest, MissionRequest, ManualLogRequest, Holiday, GlobalSettings, WorkShift, Employee, ShiftDayRule, ShiftAssignment, DailyPunchSummary, BalanceMovement, AttendanceRollup, ClosedPeriod
 )
 from .serializers import (
     RawAttendanceLogSerializer, OvertimeRequestCreateSerializer, DailyAttendanceReportSerializer, OvertimeRequestListSerializer,
     LeaveRequestCreateSerializer, LeaveRequestListSerializer, MissionRequestCreateSerializer, MissionRequestListSerializer,
     ManualLogRequestCreateSerializer, ManualLogRequestPairCreateSerializer, ManualLogRequestListSerializer, GlobalSettingsSerializer,
-    WorkShiftSerializer, WorkShiftDetailSerializer, HolidaySerializer, EmployeeListSerializer
+    WorkShiftSerializer, WorkShiftDetailSerializer, HolidaySerializer, EmployeeListSerializer, BulkRequestSerializer, PolicySimulationSerializer, TerminalSyncSerializer,
+    overtime_request_rows, leave_request_rows, mission_request_rows, manual_log_request_rows
 )
-from rest_framework.permissions import IsAuthenticated
-from .permissions import IsManager, IsOwnerOfRequestAndPending
+from rest_framework.permissions import IsAuthenticated, AllowAny
+from .permissions import IsManager, IsHR, IsOwnerOfRequestAndPending
+from .assignments import ShiftHistory
+from .conditional import ConditionalGetMixin, version_stamp, team_ids
+from .reports import team_matrix_rows, iter_dates, daily_work_chart, grouped_log_day
+from core.replica import ReplicaReadMixin
+from .pending_counts import pending_counts, compute_pending_counts, invalidate_pending_counts, REQUEST_KINDS
+from .simulation import PeriodInputs, compare
+from .ledger import balances, last_movement_id
+from .changefeed import record_changes, read_changes, latest_cursor
+from .search import SEARCH_SOURCES, index_requests, search_requests
+from .analytics import GROUPINGS, bucket_labels, trend
+from .periods import is_closed, period_reports, REPORT_FIELDS
+from .terminals import authenticate_terminal, ingest_page, SequenceGap
+from .sites import employee_timezone, site_timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from collections import defaultdict
 import datetime
+import json
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from django.db import transaction
-from django.db.models import Min, Max
+from django.db import transaction, IntegrityError
+from django.db.models import Min, Max, Q
+
+class ValueRowListMixin:
+    """List views whose rows are built by a ValueRowSerializer instead of per-instance DRF serialization."""
+    row_serializer = None
+    def list(self, request, *args, **kwargs): return Response(self.row_serializer.serialize(self.filter_queryset(self.get_queryset())))
 
 # --- Main Dashboard & User Views ---
 
@@ -29,8 +50,16 @@ class TeamListView(generics.ListAPIView):
         manager_employee = self.request.user.employee
         return manager_employee.subordinates.all()
 
-class DashboardDataView(APIView):
+class DashboardDataView(ConditionalGetMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    def get_version_parts(self, request):
+        employee = getattr(request.user, 'employee', None)
+        if not employee: return None
+        today = timezone.localdate(); start_of_month = today.replace(day=1)
+        if request.user.groups.filter(name='Manager').exists():
+            ids = team_ids(employee)
+            return ['manager', today, ids, version_stamp(DailyPunchSummary.objects.filter(employee_id__in=ids, date__range=[start_of_month, today])), last_movement_id(employee.id)]
+        return ['employee', today, version_stamp(DailyPunchSummary.objects.filter(employee=employee, date__range=[start_of_month, today])), last_movement_id(employee.id)]
     def get(self, request, *args, **kwargs):
         user = request.user; employee = getattr(user, 'employee', None)
         if not employee: return Response({"error": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -43,19 +72,15 @@ class DashboardDataView(APIView):
     def get_manager_dashboard(self, manager_employee):
         today = timezone.localdate()
         subordinates = manager_employee.subordinates.all()
-        team_employee_codes = list(subordinates.values_list('employee_code', flat=True))
-        present_today_logs = RawAttendanceLog.objects.filter(employee_code__in=team_employee_codes, timestamp__date=today).values('employee_code').annotate(first_check_in=Min('timestamp'))
-        present_employees = []
-        for log in present_today_logs:
-            emp = Employee.objects.filter(employee_code=log['employee_code']).first()
-            if emp:
-                present_employees.append({ "id": emp.id, "full_name": emp.full_name, "first_check_in": log['first_check_in'].strftime('%H:%M')})
+        present_today = DailyPunchSummary.objects.filter(employee__in=subordinates, date=today).select_related('employee').order_by('first_punch')
+        present_employees = [{ "id": summary.employee.id, "full_name": summary.employee.full_name, "first_check_in": timezone.localtime(summary.first_punch).strftime('%H:%M')} for summary in present_today]
         
         personal_chart_data = self.get_employee_chart_data(manager_employee)
         response_data = {
             "role": "manager",
             "present_employees": present_employees,
-            "daily_work_chart": personal_chart_data.get("daily_work_chart")
+            "daily_work_chart": personal_chart_data.get("daily_work_chart"),
+            "balances": personal_chart_data.get("balances")
         }
         return Response(response_data, status=status.HTTP_200_OK)
 
@@ -66,23 +91,31 @@ class DashboardDataView(APIView):
 
     def get_employee_chart_data(self, employee):
         today = timezone.localdate(); start_of_month = today.replace(day=1)
-        logs = RawAttendanceLog.objects.filter(employee_code=employee.employee_code, timestamp__date__range=[start_of_month, today]).order_by('timestamp')
-        logs_by_date = defaultdict(list)
-        for log in logs: logs_by_date[log.timestamp.date()].append(log.timestamp)
-        chart_data = []
-        current_day = start_of_month
-        while current_day <= today:
-            timestamps = logs_by_date.get(current_day, [])
-            worked_minutes = 0
-            if len(timestamps) >= 2:
-                duration = timestamps[-1] - timestamps[0]
-                worked_minutes = round(duration.total_seconds() / 60)
-            chart_data.append({ "date": current_day.strftime('%Y-%m-%d'), "day": current_day.strftime('%d'), "worked_minutes": worked_minutes })
-            current_day += datetime.timedelta(days=1)
-        return { "daily_work_chart": chart_data }
-
-class MyGroupedLogsView(APIView):
+        summaries = dict((row[0], row[1:]) for row in DailyPunchSummary.objects.filter(employee=employee, date__range=[start_of_month, today]).values_list('date', 'presence_minutes', 'has_unmatched_punch'))
+        account_balances = balances(employee.id)
+        return { "daily_work_chart": daily_work_chart(start_of_month, today, summaries), "balances": { "overtime_minutes": account_balances[BalanceMovement.ACCOUNT_OVERTIME], "leave_minutes": account_balances[BalanceMovement.ACCOUNT_LEAVE] } }
+
+def shift_version_parts(employee):
+    """Stamps that change whenever the shift or day rules in force on any of the employee's dates change."""
+    assignments = ShiftAssignment.objects.filter(employee=employee)
+    return [version_stamp(assignments), version_stamp(ShiftDayRule.objects.filter(Q(shift_id=employee.shift_id) | Q(shift_id__in=assignments.values('shift_id'))))]
+
+class MyGroupedLogsView(ConditionalGetMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    def get_version_parts(self, request):
+        employee = getattr(request.user, 'employee', None)
+        if not employee: return None
+        try:
+            start_date = datetime.date.fromisoformat(request.query_params.get('start_date', ''))
+            end_date = datetime.date.fromisoformat(request.query_params.get('end_date', ''))
+        except ValueError: return None
+        return [
+            start_date, end_date, employee.shift_id,
+            version_stamp(DailyPunchSummary.objects.filter(employee=employee, date__range=[start_date, end_date])),
+            version_stamp(LeaveRequest.objects.filter(employee=employee, date__range=[start_date, end_date])),
+            version_stamp(Holiday.objects.filter(date__range=[start_date, end_date])),
+            *shift_version_parts(employee),
+        ]
     def get(self, request, *args, **kwargs):
         try: employee = request.user.employee
         except AttributeError: return Response({"error": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -93,36 +126,58 @@ class MyGroupedLogsView(APIView):
             end_date = datetime.date.fromisoformat(end_date_str)
         except ValueError: return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
         
-        logs_queryset = RawAttendanceLog.objects.filter(employee_code=employee.employee_code, timestamp__date__range=[start_date, end_date]).order_by('timestamp')
+        shift_rules = ShiftHistory.for_employee(employee)
+        if not shift_rules.shift_ids_between(start_date, end_date) - {None}: return Response({"error": "Employee is not assigned to a valid shift."}, status=status.HTTP_400_BAD_REQUEST)
+        summaries_map = {summary.date: summary for summary in DailyPunchSummary.objects.filter(employee=employee, date__range=[start_date, end_date])}
         leave_queryset = LeaveRequest.objects.filter(employee=employee, date__range=[start_date, end_date], status=LeaveRequest.STATUS_APPROVED)
-        raw_logs_map = defaultdict(list)
-        for log in logs_queryset: raw_logs_map[log.timestamp.date()].append(log.timestamp.strftime("%H:%M:%S"))
         approved_leave_map = {leave.date: leave for leave in leave_queryset}
-        holidays_set = set(Holiday.objects.filter(date__range=[start_date, end_date]).values_list('date', flat=True))
-        try: shift_rules = {rule.day_of_week: rule for rule in employee.shift.day_rules.all()}
-        except AttributeError: return Response({"error": "Employee is not assigned to a valid shift."}, status=status.HTTP_400_BAD_REQUEST)
+        holidays_map = dict(Holiday.objects.filter(date__range=[start_date, end_date]).values_list('date', 'name'))
         
-        final_report = []
-        current_date = start_date
-        while current_date <= end_date:
-            date_str = current_date.isoformat(); day_status = "Unknown"; day_logs = raw_logs_map.get(current_date, []); day_type_info = ""
-            if current_date in holidays_set:
-                day_status = "HOLIDAY"; day_type_info = Holiday.objects.get(date=current_date).name
-            elif current_date in approved_leave_map:
-                leave = approved_leave_map[current_date]
-                day_status = "LEAVE_FULL" if leave.leave_type == LeaveRequest.TYPE_FULL_DAY else "LEAVE_HOURLY"
-                day_type_info = leave.reason or "Leave"
-            else:
-                day_rule = shift_rules.get(current_date.weekday())
-                if not day_rule or not day_rule.is_work_day:
-                    day_status = "WEEKEND_OFF"; day_type_info = "Scheduled Day Off"
-                else:
-                    day_status = "ABSENT" if not day_logs else "PRESENT"
-                    day_type_info = "No logs recorded" if not day_logs else f"{len(day_logs)} logs recorded"
-            final_report.append({"date": date_str, "status": day_status, "status_info": day_type_info, "logs": day_logs})
-            current_date += datetime.timedelta(days=1)
+        final_report = [
+            grouped_log_day(current_date, summaries_map.get(current_date), holidays_map.get(current_date), approved_leave_map.get(current_date), shift_rules.on(current_date))
+            for current_date in iter_dates(start_date, end_date)
+        ]
         return Response(final_report, status=status.HTTP_200_OK)
 
+class EmployeeHomeView(ConditionalGetMixin, ReplicaReadMixin, APIView):
+    """Everything the employee home screen needs in one response; the employee, shift rules and holidays are loaded once and shared."""
+    permission_classes = [IsAuthenticated]; RECENT_REQUESTS = 5
+    recent_sources = (
+        ('overtime', OvertimeRequest, overtime_request_rows, ('-date',)), ('leave', LeaveRequest, leave_request_rows, ('-date',)),
+        ('mission', MissionRequest, mission_request_rows, ('-date',)), ('logs', ManualLogRequest, manual_log_request_rows, ('-date', '-time')),
+    )
+    def get_version_parts(self, request):
+        employee = getattr(request.user, 'employee', None)
+        if not employee: return None
+        today = timezone.localdate(); start_of_month = today.replace(day=1)
+        return [
+            today, employee.shift_id, version_stamp(DailyPunchSummary.objects.filter(employee=employee, date__range=[start_of_month, today])),
+            *[version_stamp(model.objects.filter(employee=employee)) for _, model, _, _ in self.recent_sources],
+            version_stamp(Holiday.objects.filter(date=today)), *shift_version_parts(employee), last_movement_id(employee.id),
+        ]
+    def get(self, request, *args, **kwargs):
+        employee = Employee.objects.filter(user=request.user).first()
+        if not employee: return Response({"error": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        today = timezone.localdate(); start_of_month = today.replace(day=1)
+        today_rule = ShiftHistory.for_employee(employee).on(today)
+        summaries = {summary.date: summary for summary in DailyPunchSummary.objects.filter(employee=employee, date__range=[start_of_month, today])}
+        holiday_name = Holiday.objects.filter(date=today).values_list('name', flat=True).first()
+        leave_today = LeaveRequest.objects.filter(employee=employee, date=today, status=LeaveRequest.STATUS_APPROVED).first()
+        account_balances = balances(employee.id)
+        response_data = {
+            "employee": {"id": employee.id, "full_name": employee.full_name, "employee_code": employee.employee_code, "shift": today_rule.shift.name if today_rule else None},
+            "is_manager": request.user.groups.filter(name='Manager').exists(),
+            "daily_work_chart": daily_work_chart(start_of_month, today, {day: (summary.presence_minutes, summary.has_unmatched_punch) for day, summary in summaries.items()}),
+            "today": grouped_log_day(today, summaries.get(today), holiday_name, leave_today, today_rule),
+            "recent_requests": {
+                kind: row_serializer.serialize(model.objects.filter(employee=employee).order_by(*ordering)[:self.RECENT_REQUESTS])
+                for kind, model, row_serializer, ordering in self.recent_sources
+            },
+            "pending_counts": compute_pending_counts([employee.id]).get(employee.id, dict.fromkeys([kind for kind, _ in REQUEST_KINDS], 0)),
+            "balances": {"overtime_minutes": account_balances[BalanceMovement.ACCOUNT_OVERTIME], "leave_minutes": account_balances[BalanceMovement.ACCOUNT_LEAVE]},
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
+
 # --- Settings & Admin Views ---
 
 class GlobalSettingsView(generics.RetrieveUpdateAPIView):
@@ -140,6 +195,17 @@ class HolidayListCreateView(generics.ListCreateAPIView):
     queryset = Holiday.objects.all().order_by('date'); serializer_class = HolidaySerializer; permission_classes = [IsAuthenticated, IsManager]
 class HolidayDestroyView(generics.DestroyAPIView):
     queryset = Holiday.objects.all(); serializer_class = HolidaySerializer; permission_classes = [IsAuthenticated, IsManager]
+class PolicySimulationView(APIView):
+    permission_classes = [IsAuthenticated, IsManager]
+    def post(self, request, *args, **kwargs):
+        serializer = PolicySimulationSerializer(data=request.data); serializer.is_valid(raise_exception=True); data = serializer.validated_data
+        if not GlobalSettings.objects.filter(pk=1).exists(): return Response({"error": "Global settings are not configured."}, status=status.HTTP_400_BAD_REQUEST)
+        period = PeriodInputs(data['start_date'], data['end_date']); baseline = period.current_policy(); results = []
+        for scenario_input, scenario in zip(request.data['scenarios'], data['scenarios']):
+            policy = period.policy(baseline, scenario.get('grace_period_minutes'), scenario.get('penalty_rate'), scenario['rule_overrides'])
+            results.append({'scenario': scenario_input, **compare(period, baseline, policy)})
+        response_data = {'start_date': data['start_date'], 'end_date': data['end_date'], 'current_policy': {'grace_period_minutes': baseline.grace_period_minutes, 'penalty_rate': baseline.penalty_rate}, 'results': results}
+        return Response(response_data, status=status.HTTP_200_OK)
 
 # --- Employee Request Views (Create, Detail, History) ---
 
@@ -148,27 +214,30 @@ class OvertimeRequestCreateView(generics.CreateAPIView):
     def perform_create(self, serializer): serializer.save(employee=self.request.user.employee)
 class OvertimeRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = OvertimeRequest.objects.all(); serializer_class = OvertimeRequestCreateSerializer; permission_classes = [IsAuthenticated, IsOwnerOfRequestAndPending]
-class MyRequestHistoryView(generics.ListAPIView):
-    serializer_class = OvertimeRequestListSerializer; permission_classes = [IsAuthenticated]
+class MyRequestHistoryView(ConditionalGetMixin, ReplicaReadMixin, ValueRowListMixin, generics.ListAPIView):
+    serializer_class = OvertimeRequestListSerializer; permission_classes = [IsAuthenticated]; row_serializer = overtime_request_rows
     def get_queryset(self): return OvertimeRequest.objects.filter(employee=self.request.user.employee).order_by('-date')
+    def get_version_parts(self, request): return [version_stamp(OvertimeRequest.objects.filter(employee=request.user.employee))]
 
 class LeaveRequestCreateView(generics.CreateAPIView):
     queryset = LeaveRequest.objects.all(); serializer_class = LeaveRequestCreateSerializer; permission_classes = [IsAuthenticated]
     def perform_create(self, serializer): serializer.save(employee=self.request.user.employee, status=LeaveRequest.STATUS_PENDING)
 class LeaveRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = LeaveRequest.objects.all(); serializer_class = LeaveRequestCreateSerializer; permission_classes = [IsAuthenticated, IsOwnerOfRequestAndPending]
-class MyLeaveHistoryView(generics.ListAPIView):
-    serializer_class = LeaveRequestListSerializer; permission_classes = [IsAuthenticated]
+class MyLeaveHistoryView(ConditionalGetMixin, ReplicaReadMixin, ValueRowListMixin, generics.ListAPIView):
+    serializer_class = LeaveRequestListSerializer; permission_classes = [IsAuthenticated]; row_serializer = leave_request_rows
     def get_queryset(self): return LeaveRequest.objects.filter(employee=self.request.user.employee).order_by('-date')
+    def get_version_parts(self, request): return [version_stamp(LeaveRequest.objects.filter(employee=request.user.employee))]
 
 class MissionRequestCreateView(generics.CreateAPIView):
     queryset = MissionRequest.objects.all(); serializer_class = MissionRequestCreateSerializer; permission_classes = [IsAuthenticated]
     def perform_create(self, serializer): serializer.save(employee=self.request.user.employee, status=MissionRequest.STATUS_PENDING)
 class MissionRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = MissionRequest.objects.all(); serializer_class = MissionRequestCreateSerializer; permission_classes = [IsAuthenticated, IsOwnerOfRequestAndPending]
-class MyMissionHistoryView(generics.ListAPIView):
-    serializer_class = MissionRequestListSerializer; permission_classes = [IsAuthenticated]
+class MyMissionHistoryView(ConditionalGetMixin, ReplicaReadMixin, ValueRowListMixin, generics.ListAPIView):
+    serializer_class = MissionRequestListSerializer; permission_classes = [IsAuthenticated]; row_serializer = mission_request_rows
     def get_queryset(self): return MissionRequest.objects.filter(employee=self.request.user.employee).order_by('-date')
+    def get_version_parts(self, request): return [version_stamp(MissionRequest.objects.filter(employee=request.user.employee))]
 
 class ManualLogRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = ManualLogRequest.objects.all(); serializer_class = ManualLogRequestCreateSerializer; permission_classes = [IsAuthenticated, IsOwnerOfRequestAndPending]
@@ -176,27 +245,232 @@ class ManualLogRequestSingleView(APIView):
     permission_classes = [IsAuthenticated]
     def post(self, request, *args, **kwargs):
         log_type = request.data.get('log_type'); request_obj = ManualLogRequest.objects.create(employee=request.user.employee, date=timezone.localdate(), time=timezone.localtime().time(), log_type=log_type, reason=request.data.get('reason', 'Real-time remote log'), status=ManualLogRequest.STATUS_PENDING); serializer = ManualLogRequestListSerializer(request_obj); return Response(serializer.data, status=status.HTTP_201_CREATED)
+def manual_log_pair(employee, data):
+    reason = data.get('reason', 'Paired remote log')
+    return [
+        ManualLogRequest(employee=employee, date=data['date'], time=data['start_time'], log_type=ManualLogRequest.LOG_TYPE_IN, reason=reason, status=ManualLogRequest.STATUS_PENDING),
+        ManualLogRequest(employee=employee, date=data['date'], time=data['end_time'], log_type=ManualLogRequest.LOG_TYPE_OUT, reason=reason, status=ManualLogRequest.STATUS_PENDING),
+    ]
 class ManualLogRequestPairView(APIView):
     permission_classes = [IsAuthenticated]
     def post(self, request, *args, **kwargs):
         serializer = ManualLogRequestPairCreateSerializer(data=request.data)
         if serializer.is_valid():
-            data = serializer.validated_data; employee = request.user.employee
-            req_in = ManualLogRequest.objects.create(employee=employee, date=data['date'], time=data['start_time'], log_type=ManualLogRequest.LOG_TYPE_IN, reason=data.get('reason', 'Paired remote log'), status=ManualLogRequest.STATUS_PENDING)
-            req_out = ManualLogRequest.objects.create(employee=employee, date=data['date'], time=data['end_time'], log_type=ManualLogRequest.LOG_TYPE_OUT, reason=data.get('reason', 'Paired remote log'), status=ManualLogRequest.STATUS_PENDING)
+            with transaction.atomic(): created = ManualLogRequest.objects.bulk_create(manual_log_pair(request.user.employee, serializer.validated_data)); record_changes(created); index_requests(created)
+            invalidate_pending_counts([request.user.employee.id])
             return Response({"status": "Paired log requests created successfully."}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-class MyManualLogHistoryView(generics.ListAPIView):
-    serializer_class = ManualLogRequestListSerializer; permission_classes = [IsAuthenticated]
+class MyManualLogHistoryView(ConditionalGetMixin, ReplicaReadMixin, ValueRowListMixin, generics.ListAPIView):
+    serializer_class = ManualLogRequestListSerializer; permission_classes = [IsAuthenticated]; row_serializer = manual_log_request_rows
     def get_queryset(self): return ManualLogRequest.objects.filter(employee=self.request.user.employee).order_by('-date', '-time')
+    def get_version_parts(self, request): return [version_stamp(ManualLogRequest.objects.filter(employee=request.user.employee))]
+
+# --- Bulk Request Submission ---
+
+class BulkRequestCreateView(APIView):
+    """Validates a batch (explicit items or a date range) with one duplicate query and inserts it all-or-nothing."""
+    permission_classes = [IsAuthenticated]
+    model = None; item_serializer_class = None; list_serializer_class = None
+    duplicate_fields = ('date',); duplicate_message = "A request for this date already exists."
+    def expand_items(self, data, employee):
+        if 'items' in data: return data['items']
+        start_date, end_date = data['start_date'], data['end_date']
+        shift_rules = ShiftHistory.for_employee(employee) if data['skip_off_days'] else None
+        holidays = set(Holiday.objects.filter(date__range=[start_date, end_date]).values_list('date', flat=True)) if data['skip_off_days'] else set()
+        items = []; current_date = start_date
+        while current_date <= end_date:
+            day_rule = shift_rules.on(current_date) if shift_rules else None
+            is_off_day = current_date in holidays or not day_rule or not day_rule.is_work_day
+            if not (data['skip_off_days'] and is_off_day): items.append({**data['defaults'], 'date': current_date.isoformat()})
+            current_date += datetime.timedelta(days=1)
+        return items
+    def build_instances(self, employee, data): return [self.model(employee=employee, status=self.model.STATUS_PENDING, **data)]
+    def get_existing_queryset(self, employee, dates): return self.model.objects.filter(employee=employee, date__in=dates)
+    def post(self, request, *args, **kwargs):
+        employee = request.user.employee
+        bulk_serializer = BulkRequestSerializer(data=request.data)
+        if not bulk_serializer.is_valid(): return Response(bulk_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        errors = defaultdict(list); instances = []
+        for index, item in enumerate(self.expand_items(bulk_serializer.validated_data, employee)):
+            serializer = self.item_serializer_class(data=item, context={'request': request, 'bulk': True})
+            if not serializer.is_valid(): errors[index].append(serializer.errors); continue
+            instances.extend((index, instance) for instance in self.build_instances(employee, serializer.validated_data))
+        existing = set(self.get_existing_queryset(employee, {instance.date for _, instance in instances}).values_list(*self.duplicate_fields))
+        seen = set()
+        for index, instance in instances:
+            key = tuple(getattr(instance, field) for field in self.duplicate_fields)
+            if key in existing: errors[index].append({"non_field_errors": [self.duplicate_message]})
+            elif key in seen: errors[index].append({"non_field_errors": ["Duplicated within this batch."]})
+            seen.add(key)
+        if errors: return Response({"created": 0, "errors": [{"index": index, "errors": item_errors} for index, item_errors in sorted(errors.items())]}, status=status.HTTP_400_BAD_REQUEST)
+        if not instances: return Response([], status=status.HTTP_201_CREATED)
+        try:
+            with transaction.atomic(): created = self.model.objects.bulk_create([instance for _, instance in instances]); record_changes(created); index_requests(created)
+        except IntegrityError: return Response({"error": "Some requests were submitted concurrently. Please retry."}, status=status.HTTP_409_CONFLICT)
+        invalidate_pending_counts([employee.id])
+        return Response(self.list_serializer_class(created, many=True).data, status=status.HTTP_201_CREATED)
+class OvertimeRequestBulkView(BulkRequestCreateView):
+    model = OvertimeRequest; item_serializer_class = OvertimeRequestCreateSerializer; list_serializer_class = OvertimeRequestListSerializer
+    duplicate_message = "An overtime request for this date already exists."
+class LeaveRequestBulkView(BulkRequestCreateView):
+    model = LeaveRequest; item_serializer_class = LeaveRequestCreateSerializer; list_serializer_class = LeaveRequestListSerializer
+    duplicate_message = "A leave request for this date already exists."
+class MissionRequestBulkView(BulkRequestCreateView):
+    model = MissionRequest; item_serializer_class = MissionRequestCreateSerializer; list_serializer_class = MissionRequestListSerializer
+    duplicate_message = "A mission request for this date already exists."
+class ManualLogRequestBulkView(BulkRequestCreateView):
+    model = ManualLogRequest; item_serializer_class = ManualLogRequestPairCreateSerializer; list_serializer_class = ManualLogRequestListSerializer
+    duplicate_fields = ('date', 'time', 'log_type'); duplicate_message = "A manual log request for this time already exists."
+    def build_instances(self, employee, data): return manual_log_pair(employee, data)
+    def get_existing_queryset(self, employee, dates): return super().get_existing_queryset(employee, dates).exclude(status=ManualLogRequest.STATUS_REJECTED)
 
 # --- Manager Review Views ---
 
-class PendingOvertimeView(generics.ListAPIView):
-    permission_classes = [IsAuthenticated, IsManager]; serializer_class = OvertimeRequestListSerializer 
+class PendingCountsView(APIView):
+    permission_classes = [IsAuthenticated, IsManager]
+    def get(self, request, *args, **kwargs):
+        by_employee = pending_counts(request.user.employee, team_ids(request.user.employee))
+        response_data = {kind: sum(counts[kind] for counts in by_employee.values()) for kind, _ in REQUEST_KINDS}
+        if request.query_params.get('by_employee') in ('1', 'true'): response_data['by_employee'] = {str(employee_id): counts for employee_id, counts in by_employee.items()}
+        return Response(response_data, status=status.HTTP_200_OK)
+
+class ChangeFeedView(ReplicaReadMixin, APIView):
+    """Delta sync: the caller's (or, with scope=team, their team's) changes after `cursor`. Without a cursor only the current cursor is returned."""
+    permission_classes = [IsAuthenticated]; DEFAULT_LIMIT = 200; MAX_LIMIT = 1000
+    def get(self, request, *args, **kwargs):
+        employee = getattr(request.user, 'employee', None)
+        if not employee: return Response({"error": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        if request.query_params.get('scope', 'me') == 'team':
+            if not IsManager().has_permission(request, self): return Response({"error": "Only managers can follow their team's changes."}, status=status.HTTP_403_FORBIDDEN)
+            employee_ids = team_ids(employee)
+        else: employee_ids = [employee.id]
+        if 'cursor' not in request.query_params: return Response({"cursor": latest_cursor(employee_ids), "has_more": False, "changes": []}, status=status.HTTP_200_OK)
+        try:
+            cursor = int(request.query_params['cursor']); limit = min(int(request.query_params.get('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+            if cursor < 0 or limit < 1: raise ValueError
+        except ValueError: return Response({"error": "cursor and limit must be non-negative integers."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(read_changes(employee_ids, cursor, limit), status=status.HTTP_200_OK)
+
+class AttendanceAnalyticsView(ConditionalGetMixin, ReplicaReadMixin, APIView):
+    """Daily KPI trends read from the precomputed rollups only. `group_by` is organization, site, shift or manager; `site_id`,
+    `shift_id` and `manager_id` narrow the rows. HR sees the whole company, managers their own team."""
+    permission_classes = [IsAuthenticated]; MAX_DAYS = 731
+    def get_rollups(self, request):
+        if IsHR().has_permission(request, self): rollups = AttendanceRollup.objects.all()
+        elif IsManager().has_permission(request, self) and getattr(request.user, 'employee', None): rollups = AttendanceRollup.objects.filter(manager=request.user.employee)
+        else: return None
+        params = request.query_params
+        start_date = datetime.date.fromisoformat(params.get('start_date', '')); end_date = datetime.date.fromisoformat(params.get('end_date', ''))
+        if start_date > end_date or (end_date - start_date).days >= self.MAX_DAYS: raise ValueError
+        rollups = rollups.filter(date__range=[start_date, end_date])
+        for field in ('site_id', 'shift_id', 'manager_id'):
+            if params.get(field): rollups = rollups.filter(**{field: int(params[field])})
+        return rollups
+    def get_version_parts(self, request):
+        try: rollups = self.get_rollups(request)
+        except ValueError: return None
+        if rollups is None: return None
+        return [version_stamp(rollups)]
+    def get(self, request, *args, **kwargs):
+        group_by = request.query_params.get('group_by', 'organization')
+        if group_by not in GROUPINGS: return Response({"error": f"group_by must be one of: {', '.join(GROUPINGS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        try: rollups = self.get_rollups(request)
+        except ValueError: return Response({"error": f"start_date and end_date are required in YYYY-MM-DD format, ordered and at most {self.MAX_DAYS} days apart; ids must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if rollups is None: return Response({"error": "Only HR and managers can view attendance analytics."}, status=status.HTTP_403_FORBIDDEN)
+        return Response({"group_by": group_by, "arrival_buckets": bucket_labels(), "series": trend(rollups, group_by)}, status=status.HTTP_200_OK)
+
+class RequestSearchView(ReplicaReadMixin, APIView):
+    """Full-text search over request reasons and mission destinations, company-wide for HR. Every word of `q` must match (as a word
+    prefix); `kind`, `status` and `employee_id` take comma-separated values, `start_date`/`end_date` bound the request date."""
+    permission_classes = [IsAuthenticated, IsHR]; DEFAULT_LIMIT = 50; MAX_LIMIT = 200
+    STATUSES = {value for value, _ in OvertimeRequest.STATUS_CHOICES}
+    def get(self, request, *args, **kwargs):
+        params = request.query_params; query = params.get('q', '').strip()
+        if not query: return Response({"error": "q is required."}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = [kind for kind in params.get('kind', '').split(',') if kind]; statuses = [value.upper() for value in params.get('status', '').split(',') if value]
+        if set(kinds) - set(SEARCH_SOURCES): return Response({"error": f"kind must be one of: {', '.join(SEARCH_SOURCES)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if set(statuses) - self.STATUSES: return Response({"error": f"status must be one of: {', '.join(sorted(self.STATUSES))}."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            employee_ids = [int(pk) for pk in params.get('employee_id', '').split(',') if pk]
+            start_date = datetime.date.fromisoformat(params['start_date']) if params.get('start_date') else None
+            end_date = datetime.date.fromisoformat(params['end_date']) if params.get('end_date') else None
+            limit = min(int(params.get('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT); offset = int(params.get('offset', 0))
+            if limit < 1 or offset < 0: raise ValueError
+        except ValueError: return Response({"error": "employee_id, limit and offset must be non-negative integers and dates YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        entries = search_requests(query, kinds, statuses, employee_ids, start_date, end_date)
+        rows = list(entries.values_list('kind', 'request_id', 'employee_id', 'employee__full_name', 'date', 'status', 'document')[offset:offset + limit + 1])
+        return Response({
+            "has_more": len(rows) > limit,
+            "results": [
+                {"kind": kind, "id": request_id, "employee_id": employee_id, "employee": full_name, "date": day.isoformat(), "status": request_status, "text": text}
+                for kind, request_id, employee_id, full_name, day, request_status, text in rows[:limit]
+            ],
+        }, status=status.HTTP_200_OK)
+
+class AttendanceReportView(ReplicaReadMixin, APIView):
+    """Daily reports of a date range: HR sees everyone, managers their team, employees themselves; `employee_id` takes
+    comma-separated ids. Days of closed months are read from the period snapshots and flagged `closed`."""
+    permission_classes = [IsAuthenticated]; MAX_DAYS = 366
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            start_date = datetime.date.fromisoformat(params.get('start_date', '')); end_date = datetime.date.fromisoformat(params.get('end_date', ''))
+            if start_date > end_date or (end_date - start_date).days >= self.MAX_DAYS: raise ValueError
+            employee_ids = [int(pk) for pk in params.get('employee_id', '').split(',') if pk]
+        except ValueError: return Response({"error": f"start_date and end_date are required in YYYY-MM-DD format, ordered and at most {self.MAX_DAYS} days apart; employee_id must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        employee = getattr(request.user, 'employee', None)
+        if IsHR().has_permission(request, self): allowed = None
+        elif employee is None: return Response({"error": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        elif IsManager().has_permission(request, self): allowed = set(team_ids(employee))
+        else: allowed = {employee.pk}
+        if allowed is not None and set(employee_ids) - allowed: return Response({"error": "You can only view your own team's reports."}, status=status.HTTP_403_FORBIDDEN)
+        ids = employee_ids or (sorted(allowed) if allowed is not None else None)
+        rows = period_reports(ids, start_date, end_date)
+        names = dict(Employee.objects.filter(id__in={row[0] for row in rows}).values_list('id', 'full_name'))
+        closed = list(ClosedPeriod.objects.filter(period_start__lte=end_date, period_end__gte=start_date).values_list('period_start', 'period_end'))
+        plain = lambda value: value.isoformat() if isinstance(value, datetime.time) else value
+        return Response({
+            "closed_months": [f"{start:%Y-%m}" for start, _ in closed],
+            "results": [
+                {"employee_id": employee_id, "employee_name": names.get(employee_id), "date": day.isoformat(), **{field: plain(value) for field, value in zip(REPORT_FIELDS, values)}, "closed": any(start <= day <= end for start, end in closed)}
+                for employee_id, day, *values in rows
+            ],
+        }, status=status.HTTP_200_OK)
+
+class ClosedPeriodListView(ReplicaReadMixin, APIView):
+    """Closed months with the company totals frozen when they were closed."""
+    permission_classes = [IsAuthenticated, IsHR]
+    def get(self, request, *args, **kwargs):
+        periods = ClosedPeriod.objects.values_list('year', 'month', 'closed_at', 'closed_by__username', 'employee_count', 'report_count', 'totals', 'checksum')
+        return Response([
+            {"month": f"{year:04d}-{month:02d}", "closed_at": closed_at, "closed_by": closed_by, "employee_count": employee_count, "report_count": report_count, "totals": totals, "checksum": checksum}
+            for year, month, closed_at, closed_by, employee_count, report_count, totals, checksum in periods
+        ], status=status.HTTP_200_OK)
+
+class TeamAttendanceMatrixView(ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated, IsManager]
+    MAX_DAYS = 93
+    def get(self, request, *args, **kwargs):
+        try:
+            start_date = datetime.date.fromisoformat(request.query_params.get('start_date', ''))
+            end_date = datetime.date.fromisoformat(request.query_params.get('end_date', ''))
+        except ValueError: return Response({"error": "start_date and end_date are required in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date or (end_date - start_date).days >= self.MAX_DAYS: return Response({"error": f"The range must be ordered and cover at most {self.MAX_DAYS} days."}, status=status.HTTP_400_BAD_REQUEST)
+        team = request.user.employee.subordinates.select_related('site').order_by('full_name')
+        return StreamingHttpResponse(self.stream(team, start_date, end_date), content_type='application/json')
+    def stream(self, team, start_date, end_date):
+        yield '{"dates": %s, "rows": [' % json.dumps([day.isoformat() for day in iter_dates(start_date, end_date)])
+        for index, row in enumerate(team_matrix_rows(team, start_date, end_date)):
+            yield (',' if index else '') + json.dumps(row)
+        yield ']}'
+
+class PendingOvertimeView(ConditionalGetMixin, ValueRowListMixin, generics.ListAPIView):
+    permission_classes = [IsAuthenticated, IsManager]; serializer_class = OvertimeRequestListSerializer; row_serializer = overtime_request_rows
+    def get_version_parts(self, request):
+        ids = team_ids(request.user.employee)
+        return [ids, request.query_params.get('employee_id'), version_stamp(OvertimeRequest.objects.filter(employee_id__in=ids, status=OvertimeRequest.STATUS_PENDING))]
     def get_queryset(self):
-        manager_employee = self.request.user.employee; subordinate_ids = manager_employee.subordinates.values_list('id', flat=True)
-        team_ids = list(subordinate_ids) + [manager_employee.id]; queryset = OvertimeRequest.objects.filter(employee_id__in=team_ids, status=OvertimeRequest.STATUS_PENDING)
+        queryset = OvertimeRequest.objects.filter(employee_id__in=team_ids(self.request.user.employee), status=OvertimeRequest.STATUS_PENDING)
         employee_id = self.request.query_params.get('employee_id');
         if employee_id and employee_id != 'all': queryset = queryset.filter(employee_id=employee_id)
         return queryset.order_by('date')
@@ -205,16 +479,19 @@ class ReviewOvertimeView(APIView):
     def post(self, request, pk, format=None):
         try: req_to_review = OvertimeRequest.objects.get(pk=pk)
         except OvertimeRequest.DoesNotExist: return Response({"error": "Request not found"}, status=status.HTTP_404_NOT_FOUND)
+        if is_closed(req_to_review.date): return Response({"error": f"{req_to_review.date:%Y-%m} is closed."}, status=status.HTTP_409_CONFLICT)
         action = request.data.get('action')
         if action == "APPROVE": req_to_review.status = OvertimeRequest.STATUS_APPROVED; req_to_review.save(); return Response({"status": "Request Approved"})
         elif action == "REJECT": req_to_review.status = OvertimeRequest.STATUS_REJECTED; req_to_review.save(); return Response({"status": "Request Rejected"})
         else: return Response({"error": "Invalid action"}, status=status.HTTP_400_BAD_REQUEST)
 
-class PendingLeaveView(generics.ListAPIView):
-    permission_classes = [IsAuthenticated, IsManager]; serializer_class = LeaveRequestListSerializer
+class PendingLeaveView(ConditionalGetMixin, ValueRowListMixin, generics.ListAPIView):
+    permission_classes = [IsAuthenticated, IsManager]; serializer_class = LeaveRequestListSerializer; row_serializer = leave_request_rows
+    def get_version_parts(self, request):
+        ids = team_ids(request.user.employee)
+        return [ids, request.query_params.get('employee_id'), version_stamp(LeaveRequest.objects.filter(employee_id__in=ids, status=LeaveRequest.STATUS_PENDING))]
     def get_queryset(self):
-        manager_employee = self.request.user.employee; subordinate_ids = manager_employee.subordinates.values_list('id', flat=True)
-        team_ids = list(subordinate_ids) + [manager_employee.id]; queryset = LeaveRequest.objects.filter(employee_id__in=team_ids, status=LeaveRequest.STATUS_PENDING)
+        queryset = LeaveRequest.objects.filter(employee_id__in=team_ids(self.request.user.employee), status=LeaveRequest.STATUS_PENDING)
         employee_id = self.request.query_params.get('employee_id')
         if employee_id and employee_id != 'all': queryset = queryset.filter(employee_id=employee_id)
         return queryset.order_by('date')
@@ -223,16 +500,19 @@ class ReviewLeaveView(APIView):
     def post(self, request, pk, format=None):
         try: req_to_review = LeaveRequest.objects.get(pk=pk)
         except LeaveRequest.DoesNotExist: return Response({"error": "Request not found"}, status=status.HTTP_404_NOT_FOUND)
+        if is_closed(req_to_review.date): return Response({"error": f"{req_to_review.date:%Y-%m} is closed."}, status=status.HTTP_409_CONFLICT)
         action = request.data.get('action')
         if action == "APPROVE": req_to_review.status = LeaveRequest.STATUS_APPROVED; req_to_review.save(); return Response({"status": "Request Approved"})
         elif action == "REJECT": req_to_review.status = LeaveRequest.STATUS_REJECTED; req_to_review.save(); return Response({"status": "Request Rejected"})
         else: return Response({"error": "Invalid action"}, status=status.HTTP_400_BAD_REQUEST)
 
-class PendingMissionView(generics.ListAPIView):
-    permission_classes = [IsAuthenticated, IsManager]; serializer_class = MissionRequestListSerializer
+class PendingMissionView(ConditionalGetMixin, ValueRowListMixin, generics.ListAPIView):
+    permission_classes = [IsAuthenticated, IsManager]; serializer_class = MissionRequestListSerializer; row_serializer = mission_request_rows
+    def get_version_parts(self, request):
+        ids = team_ids(request.user.employee)
+        return [ids, request.query_params.get('employee_id'), version_stamp(MissionRequest.objects.filter(employee_id__in=ids, status=MissionRequest.STATUS_PENDING))]
     def get_queryset(self):
-        manager_employee = self.request.user.employee; subordinate_ids = manager_employee.subordinates.values_list('id', flat=True)
-        team_ids = list(subordinate_ids) + [manager_employee.id]; queryset = MissionRequest.objects.filter(employee_id__in=team_ids, status=MissionRequest.STATUS_PENDING)
+        queryset = MissionRequest.objects.filter(employee_id__in=team_ids(self.request.user.employee), status=MissionRequest.STATUS_PENDING)
         employee_id = self.request.query_params.get('employee_id')
         if employee_id and employee_id != 'all': queryset = queryset.filter(employee_id=employee_id)
         return queryset.order_by('date')
@@ -241,16 +521,19 @@ class ReviewMissionView(APIView):
     def post(self, request, pk, format=None):
         try: req_to_review = MissionRequest.objects.get(pk=pk)
         except MissionRequest.DoesNotExist: return Response({"error": "Request not found"}, status=status.HTTP_404_NOT_FOUND)
+        if is_closed(req_to_review.date): return Response({"error": f"{req_to_review.date:%Y-%m} is closed."}, status=status.HTTP_409_CONFLICT)
         action = request.data.get('action')
         if action == "APPROVE": req_to_review.status = MissionRequest.STATUS_APPROVED; req_to_review.save(); return Response({"status": "Request Approved"})
         elif action == "REJECT": req_to_review.status = MissionRequest.STATUS_REJECTED; req_to_review.save(); return Response({"status": "Request Rejected"})
         else: return Response({"error": "Invalid action"}, status=status.HTTP_400_BAD_REQUEST)
 
-class PendingManualLogView(generics.ListAPIView):
-    permission_classes = [IsAuthenticated, IsManager]; serializer_class = ManualLogRequestListSerializer
+class PendingManualLogView(ConditionalGetMixin, ValueRowListMixin, generics.ListAPIView):
+    permission_classes = [IsAuthenticated, IsManager]; serializer_class = ManualLogRequestListSerializer; row_serializer = manual_log_request_rows
+    def get_version_parts(self, request):
+        ids = team_ids(request.user.employee)
+        return [ids, request.query_params.get('employee_id'), version_stamp(ManualLogRequest.objects.filter(employee_id__in=ids, status=ManualLogRequest.STATUS_PENDING))]
     def get_queryset(self):
-        manager_employee = self.request.user.employee; subordinate_ids = manager_employee.subordinates.values_list('id', flat=True)
-        team_ids = list(subordinate_ids) + [manager_employee.id]; queryset = ManualLogRequest.objects.filter(employee_id__in=team_ids, status=ManualLogRequest.STATUS_PENDING)
+        queryset = ManualLogRequest.objects.filter(employee_id__in=team_ids(self.request.user.employee), status=ManualLogRequest.STATUS_PENDING)
         employee_id = self.request.query_params.get('employee_id')
         if employee_id and employee_id != 'all': queryset = queryset.filter(employee_id=employee_id)
         return queryset.order_by('date', 'time')
@@ -259,11 +542,14 @@ class ReviewManualLogView(APIView):
     def post(self, request, pk, format=None):
         try: req_to_review = ManualLogRequest.objects.get(pk=pk)
         except ManualLogRequest.DoesNotExist: return Response({"error": "Request not found"}, status=status.HTTP_404_NOT_FOUND)
+        if is_closed(req_to_review.date): return Response({"error": f"{req_to_review.date:%Y-%m} is closed."}, status=status.HTTP_409_CONFLICT)
         action = request.data.get('action')
         if action == "APPROVE":
-            req_to_review.status = ManualLogRequest.STATUS_APPROVED; req_to_review.save()
-            timestamp = timezone.make_aware(datetime.datetime.combine(req_to_review.date, req_to_review.time))
-            RawAttendanceLog.objects.create(employee_code=req_to_review.employee.employee_code, timestamp=timestamp)
+            timestamp = timezone.make_aware(datetime.datetime.combine(req_to_review.date, req_to_review.time), employee_timezone(req_to_review.employee))
+            # The approval, the punch and its summary (updated by the punch's post_save) commit together or not at all.
+            with transaction.atomic():
+                req_to_review.status = ManualLogRequest.STATUS_APPROVED; req_to_review.save()
+                RawAttendanceLog.objects.create(employee_code=req_to_review.employee.employee_code, timestamp=timestamp)
             return Response({"status": "Log Approved and created successfully"})
         elif action == "REJECT":
             req_to_review.status = ManualLogRequest.STATUS_REJECTED; req_to_review.save(); return Response({"status": "Request Rejected"})
@@ -272,4 +558,23 @@ class ReviewManualLogView(APIView):
 # --- Hardware Endpoint ---
 class LogAttendanceView(generics.CreateAPIView):
     queryset = RawAttendanceLog.objects.all()
-    serializer_class = RawAttendanceLogSerializer
\ No newline at end of file
+    serializer_class = RawAttendanceLogSerializer
+    # The punch's post_save updates its summary in the same transaction.
+    @transaction.atomic
+    def perform_create(self, serializer): serializer.save()
+
+class TerminalSyncView(APIView):
+    """Watermark sync for terminals: GET returns what the server has acknowledged, POST uploads the next page of punches after it."""
+    authentication_classes = []; permission_classes = [AllowAny]
+    def get(self, request, *args, **kwargs):
+        terminal = authenticate_terminal(request)
+        return Response({"acknowledged_sequence": terminal.acknowledged_sequence, "server_time": timezone.now(), "clock_offset_seconds": terminal.clock_offset_seconds, "max_page": TerminalSyncSerializer.MAX_PAGE}, status=status.HTTP_200_OK)
+    def post(self, request, *args, **kwargs):
+        terminal = authenticate_terminal(request)
+        serializer = TerminalSyncSerializer(data=request.data)
+        with timezone.override(site_timezone(terminal.site)): serializer.is_valid(raise_exception=True)
+        try: terminal, accepted, duplicates = ingest_page(terminal.pk, serializer.validated_data['device_time'], serializer.validated_data['punches'])
+        except SequenceGap as gap:
+            return Response({"error": "Punches must continue the acknowledged sequence without gaps.", "acknowledged_sequence": terminal.acknowledged_sequence, "expected_sequence": gap.args[0]}, status=status.HTTP_409_CONFLICT)
+        response_data = {"acknowledged_sequence": terminal.acknowledged_sequence, "accepted": accepted, "duplicates": duplicates, "clock_offset_seconds": terminal.clock_offset_seconds, "server_time": terminal.last_seen_at}
+        return Response(response_data, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional, the stdlib encoder is the fallback
+    orjson = None
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when it is installed.
+
+    Indented (browsable/`; indent=`) output and the no-orjson case fall back to DRF's stdlib path. Dates and times are passed
+    through to DRF's encoder so the wire format stays the same (UTC datetimes end in `Z`, not `+00:00`)."""
+    _encoder = JSONEncoder()
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=self._encoder.default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+
+class ThresholdGZipMiddleware(GZipMiddleware):
+    """Compresses only responses of at least GZIP_MIN_LENGTH bytes; small payloads are not worth the CPU."""
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < getattr(settings, 'GZIP_MIN_LENGTH', 1024): return response
+        return super().process_response(request, response)
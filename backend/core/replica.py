@@ -0,0 +1,49 @@
+import contextvars
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_ALIAS = 'replica'
+_routing = contextvars.ContextVar('replica_routing', default=None)
+
+def _pin_key(user_pk): return f"replica-pin:{user_pk}"
+
+def is_pinned(user):
+    return bool(user and user.is_authenticated and cache.get(_pin_key(user.pk)))
+
+class ReplicaRouter:
+    """Sends reads to the replica only while an opted-in view serves a safe request; all writes go to default."""
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state and state['use_replica'] and REPLICA_ALIAS in settings.DATABASES: return REPLICA_ALIAS
+        return None
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None: state['wrote'] = True
+        return 'default'
+    def allow_relation(self, obj1, obj2, **hints): return True
+    def allow_migrate(self, db, app_label, model_name=None, **hints): return db != REPLICA_ALIAS
+
+class ReplicaRoutingMiddleware:
+    """Scopes routing state to one request and pins a user to the primary for a while after they write."""
+    def __init__(self, get_response): self.get_response = get_response
+    def __call__(self, request):
+        state = {'use_replica': False, 'wrote': False}; token = _routing.set(state)
+        try: response = self.get_response(request)
+        finally: _routing.reset(token)
+        user = getattr(request, 'user', None)
+        if state['wrote'] and user is not None and user.is_authenticated:
+            cache.set(_pin_key(user.pk), True, timeout=getattr(settings, 'REPLICA_STICKY_SECONDS', 10))
+        if response.streaming and state['use_replica']: response.streaming_content = self._with_state(state, response.streaming_content)
+        return response
+    def _with_state(self, state, content):
+        token = _routing.set(state)
+        try: yield from content
+        finally: _routing.reset(token)
+
+class ReplicaReadMixin:
+    """Opt-in for reporting views: safe requests read from the replica unless the user wrote recently."""
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        state = _routing.get()
+        if state is not None and request.method in SAFE_METHODS and not is_pinned(request.user): state['use_replica'] = True
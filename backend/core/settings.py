@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,12 +45,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.renderers.ThresholdGZipMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.replica.ReplicaRoutingMiddleware',
+    'attendance.sites.SiteTimezoneMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,9 +86,35 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Read-only reporting traffic (see core.replica). Locally this is the same file;
+    # in production point it at the streaming replica of 'default'.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['core.replica.ReplicaRouter']
+
+# Seconds a user keeps reading from 'default' after their own write, to hide replica lag.
+REPLICA_STICKY_SECONDS = 10
+
+# One cache shared by every worker process. Replica read-your-writes pins, pending counts, user time zones and closed
+# periods are set or invalidated through it, which a per-process cache would hide from the other workers: deployments running
+# more than one process set REDIS_URL. Without it, a single-process setup (development, tests) keeps a local memory cache.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'attendance',
+        },
+    }
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -129,14 +159,34 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'attendance.sites.SiteTimezoneJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
+# Responses smaller than this are sent uncompressed by core.renderers.ThresholdGZipMiddleware.
+GZIP_MIN_LENGTH = 1024
+
+# Days of history recomputed when shift rules, settings, holidays or shift assignments change
+RECOMPUTE_LOOKBACK_DAYS = 62
+
+# Terminal clock offsets below this many seconds are treated as network noise and not corrected
+TERMINAL_SKEW_TOLERANCE_SECONDS = 5
+
+# Per-month columnar files of archived raw punches (see attendance/archive.py)
+PUNCH_ARCHIVE_DIR = BASE_DIR / 'punch_archive'
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+from corsheaders.defaults import default_headers
+
+CORS_ALLOW_HEADERS = (*default_headers, "if-none-match")
+CORS_EXPOSE_HEADERS = ["ETag", "Last-Modified"]
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -6,19 +6,24 @@ from rest_framework_simplejwt.views import (TokenObtainPairView, TokenRefreshVie
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/log/', views.LogAttendanceView.as_view(), name='log_attendance'),
+    path('api/terminals/sync/', views.TerminalSyncView.as_view(), name='terminal_sync'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/overtime/request/', views.OvertimeRequestCreateView.as_view(), name='overtime_request_create'),
     path('api/requests/my-history/', views.MyRequestHistoryView.as_view(), name='my_requests_history'),
+    path('api/overtime/request/bulk/', views.OvertimeRequestBulkView.as_view(), name='overtime_request_bulk'),
     path('api/overtime/request/<int:pk>/', views.OvertimeRequestDetailView.as_view(), name='overtime_request_detail'),
     path('api/leave/request/', views.LeaveRequestCreateView.as_view(), name='leave_request_create'),
     path('api/leave/my-history/', views.MyLeaveHistoryView.as_view(), name='my_leave_history'),
+    path('api/leave/request/bulk/', views.LeaveRequestBulkView.as_view(), name='leave_request_bulk'),
     path('api/leave/request/<int:pk>/', views.LeaveRequestDetailView.as_view(), name='leave_request_detail'),
     path('api/mission/request/', views.MissionRequestCreateView.as_view(), name='mission_request_create'),
     path('api/mission/my-history/', views.MyMissionHistoryView.as_view(), name='my_mission_history'),
+    path('api/mission/request/bulk/', views.MissionRequestBulkView.as_view(), name='mission_request_bulk'),
     path('api/mission/request/<int:pk>/', views.MissionRequestDetailView.as_view(), name='mission_request_detail'),
     path('api/log/request-single/', views.ManualLogRequestSingleView.as_view(), name='request_single_log'),
     path('api/log/request-pair/', views.ManualLogRequestPairView.as_view(), name='request_pair_log'),
+    path('api/log/request-bulk/', views.ManualLogRequestBulkView.as_view(), name='request_bulk_log'),
     path('api/log/my-history/', views.MyManualLogHistoryView.as_view(), name='my_manual_log_history'),
     path('api/log/request/<int:pk>/', views.ManualLogRequestDetailView.as_view(), name='manual_log_request_detail'),
     path('api/manager/pending-requests/', views.PendingOvertimeView.as_view(), name='pending_requests'),
@@ -29,8 +34,17 @@ urlpatterns = [
     path('api/manager/review-mission/<int:pk>/', views.ReviewMissionView.as_view(), name='review_mission'),
     path('api/manager/pending-logs/', views.PendingManualLogView.as_view(), name='pending_logs'),
     path('api/manager/review-log/<int:pk>/', views.ReviewManualLogView.as_view(), name='review_log'),
+    path('api/manager/pending-counts/', views.PendingCountsView.as_view(), name='pending_counts'),
+    path('api/manager/team-matrix/', views.TeamAttendanceMatrixView.as_view(), name='team_matrix'),
+    path('api/changes/', views.ChangeFeedView.as_view(), name='change_feed'),
+    path('api/requests/search/', views.RequestSearchView.as_view(), name='request_search'),
+    path('api/analytics/attendance/', views.AttendanceAnalyticsView.as_view(), name='attendance_analytics'),
+    path('api/reports/', views.AttendanceReportView.as_view(), name='attendance_reports'),
+    path('api/periods/closed/', views.ClosedPeriodListView.as_view(), name='closed_periods'),
+    path('api/home/', views.EmployeeHomeView.as_view(), name='employee_home'),
     path('api/logs/my-grouped-logs/', views.MyGroupedLogsView.as_view(), name='my_grouped_logs'),
     path('api/settings/', views.GlobalSettingsView.as_view(), name='global_settings'),
+    path('api/settings/simulate/', views.PolicySimulationView.as_view(), name='policy_simulation'),
     path('api/shifts/', views.WorkShiftListView.as_view(), name='list_create_shifts'),
     path('api/shifts/<int:pk>/', views.WorkShiftDetailView.as_view(), name='shift_detail'),
     path('api/holidays/', views.HolidayListCreateView.as_view(), name='holiday_list_create'),
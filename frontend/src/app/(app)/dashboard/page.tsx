@@ -15,7 +15,9 @@ export default function DashboardPage() {
   useEffect(() => {
     const fetchDashboardData = async () => {
       try {
-        const data = await apiClient("/dashboard/");
+        // One composite call covers the employee home; managers additionally need the team view.
+        const home = await apiClient("/home/");
+        const data = home?.is_manager ? await apiClient("/dashboard/") : home && { ...home, role: "employee" };
         if (data) {
           setDashboardData(data);
         } else {
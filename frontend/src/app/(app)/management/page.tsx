@@ -21,17 +21,12 @@ export default function ManagementPage() {
   const [loading, setLoading] = useState(true);
 
   const fetchCounts = useCallback(async () => {
-    const [logData, otData, leaveData, missionData] = await Promise.all([
-      apiClient("/manager/pending-logs/"),
-      apiClient("/manager/pending-requests/"),
-      apiClient("/manager/pending-leave/"),
-      apiClient("/manager/pending-mission/")
-    ]);
+    const countData = await apiClient("/manager/pending-counts/");
     setCounts({
-      logs: logData?.length || 0,
-      overtime: otData?.length || 0,
-      leave: leaveData?.length || 0,
-      mission: missionData?.length || 0,
+      logs: countData?.logs || 0,
+      overtime: countData?.overtime || 0,
+      leave: countData?.leave || 0,
+      mission: countData?.mission || 0,
     });
   }, []);
 
@@ -0,0 +1,36 @@
+"use client";
+
+import { ClockIcon, CalendarDaysIcon } from '@heroicons/react/24/outline';
+
+type Balances = {
+    overtime_minutes: number;
+    leave_minutes: number;
+}
+
+const formatHours = (minutes: number) => {
+  const sign = minutes < 0 ? "-" : "";
+  const total = Math.round(Math.abs(minutes));
+  return `${sign}${Math.floor(total / 60)}h ${total % 60}m`;
+};
+
+export default function BalanceCards({ balances }: { balances?: Balances }) {
+  if (!balances) return null;
+  const cards = [
+    { label: "Overtime Bank", value: balances.overtime_minutes, icon: ClockIcon, color: "text-green-400" },
+    { label: "Leave Balance", value: balances.leave_minutes, icon: CalendarDaysIcon, color: "text-indigo-400" },
+  ];
+
+  return (
+    <div className="grid grid-cols-1 sm:grid-cols-2 gap-4">
+      {cards.map(({ label, value, icon: Icon, color }) => (
+        <div key={label} className="flex items-center gap-4 rounded-xl bg-black/20 border border-white/10 backdrop-blur-md p-5 text-white">
+          <Icon className={`h-10 w-10 ${color}`} />
+          <div>
+            <div className="text-sm text-gray-400">{label}</div>
+            <div className={`font-mono text-2xl ${value < 0 ? "text-red-400" : "text-white"}`}>{formatHours(value)}</div>
+          </div>
+        </div>
+      ))}
+    </div>
+  );
+}
\ No newline at end of file
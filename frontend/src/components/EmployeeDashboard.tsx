@@ -3,6 +3,8 @@
 import { motion, Variants } from "framer-motion";
 import { ChartPieIcon } from '@heroicons/react/24/outline';
 import DailyWorkChart from './DailyWorkChart';
+import BalanceCards from './BalanceCards';
+import HomeSummary from './HomeSummary';
 
 const containerVariants: Variants = { hidden: { opacity: 0 }, visible: { opacity: 1 } };
 const itemVariants: Variants = { hidden: { y: 20, opacity: 0 }, visible: { y: 0, opacity: 1 } };
@@ -12,18 +14,28 @@ export default function EmployeeDashboard({ data }: { data: any }) {
 
   if (!hasData) {
     return (
-        <motion.div initial={{ opacity: 0 }} animate={{ opacity: 1 }} className="flex flex-col items-center justify-center rounded-xl bg-black/20 border border-white/10 backdrop-blur-md p-12 min-h-[60vh] text-center text-white">
-            <ChartPieIcon className="h-16 w-16 text-gray-500" />
-            <h3 className="mt-4 text-xl font-semibold">No Activity This Month</h3>
-            <p className="mt-2 text-gray-400">
-                Your daily work chart will appear here once you have attendance data.
-            </p>
+        <motion.div initial={{ opacity: 0 }} animate={{ opacity: 1 }} className="space-y-8">
+            <BalanceCards balances={data.balances} />
+            <HomeSummary data={data} />
+            <div className="flex flex-col items-center justify-center rounded-xl bg-black/20 border border-white/10 backdrop-blur-md p-12 min-h-[60vh] text-center text-white">
+                <ChartPieIcon className="h-16 w-16 text-gray-500" />
+                <h3 className="mt-4 text-xl font-semibold">No Activity This Month</h3>
+                <p className="mt-2 text-gray-400">
+                    Your daily work chart will appear here once you have attendance data.
+                </p>
+            </div>
         </motion.div>
     );
   }
 
   return (
-    <motion.div variants={containerVariants} initial="hidden" animate="visible">
+    <motion.div variants={containerVariants} initial="hidden" animate="visible" className="space-y-8">
+        <motion.div variants={itemVariants}>
+           <BalanceCards balances={data.balances} />
+        </motion.div>
+        <motion.div variants={itemVariants}>
+           <HomeSummary data={data} />
+        </motion.div>
         <motion.div variants={itemVariants}>
            <DailyWorkChart data={data.daily_work_chart} />
         </motion.div>
@@ -0,0 +1,44 @@
+"use client";
+
+import { ClockIcon, InboxStackIcon } from '@heroicons/react/24/outline';
+
+type RecentRequest = {
+    id: number;
+    date: string;
+    status: string;
+}
+
+const REQUEST_LABELS: Record<string, string> = { overtime: "Overtime", leave: "Leave", mission: "Mission", logs: "Manual Logs" };
+const STATUS_COLORS: Record<string, string> = { Pending: "text-yellow-400", Approved: "text-green-400", Rejected: "text-red-400" };
+
+export default function HomeSummary({ data }: { data: any }) {
+  if (!data.today) return null;
+  const pendingTotal = Object.values(data.pending_counts || {}).reduce((sum: number, count: any) => sum + count, 0);
+
+  return (
+    <div className="grid grid-cols-1 lg:grid-cols-2 gap-4 text-white">
+      <div className="rounded-xl bg-black/20 border border-white/10 backdrop-blur-md p-5">
+        <div className="flex items-center gap-2 text-sm text-gray-400"><ClockIcon className="h-5 w-5" /> Today</div>
+        <div className="mt-2 text-lg font-semibold">{data.today.status_info}</div>
+        <div className="mt-3 flex flex-wrap gap-2">
+          {data.today.logs.map((log: string, index: number) => (
+            <span key={index} className="font-mono rounded-md bg-gray-800/60 px-2 py-1 text-sm">{log}</span>
+          ))}
+        </div>
+      </div>
+      <div className="rounded-xl bg-black/20 border border-white/10 backdrop-blur-md p-5">
+        <div className="flex items-center gap-2 text-sm text-gray-400"><InboxStackIcon className="h-5 w-5" /> Recent Requests ({pendingTotal} pending)</div>
+        <ul className="mt-2 space-y-1 text-sm">
+          {Object.entries(data.recent_requests || {}).flatMap(([kind, rows]) =>
+            (rows as RecentRequest[]).slice(0, 2).map((row) => (
+              <li key={`${kind}-${row.id}`} className="flex justify-between">
+                <span>{REQUEST_LABELS[kind]} · {row.date}</span>
+                <span className={STATUS_COLORS[row.status] || "text-gray-300"}>{row.status}</span>
+              </li>
+            ))
+          )}
+        </ul>
+      </div>
+    </div>
+  );
+}
\ No newline at end of file
@@ -5,6 +5,7 @@ import { Popover, Transition } from '@headlessui/react';
 import { Fragment } from 'react';
 import { motion, Variants } from "framer-motion";
 import DailyWorkChart from './DailyWorkChart';
+import BalanceCards from './BalanceCards';
 
 const containerVariants: Variants = { hidden: { opacity: 0 }, visible: { opacity: 1, transition: { staggerChildren: 0.1 } } };
 const itemVariants: Variants = { hidden: { y: 20, opacity: 0 }, visible: { y: 0, opacity: 1 } };
@@ -50,6 +51,10 @@ export default function ManagerDashboard({ data }: { data: any }) {
         )}
       </motion.div>
       
+      <motion.div variants={itemVariants}>
+        <BalanceCards balances={data.balances} />
+      </motion.div>
+
       <motion.div variants={itemVariants}>
         <DailyWorkChart data={data.daily_work_chart} />
       </motion.div>
@@ -6,6 +6,8 @@ const BASE_URL = "http://localhost:8000/api";
 
 let isRefreshing = false;
 let failedQueue: { resolve: (value?: any) => void; reject: (reason?: any) => void; }[] = [];
+// Last body and ETag per GET endpoint, so unchanged data comes back as a bodiless 304.
+const etagCache = new Map<string, { etag: string; data: any }>();
 
 const processQueue = (error: any, token: string | null = null) => {
   failedQueue.forEach(prom => {
@@ -29,7 +31,14 @@ async function apiClient(endpoint: string, options: RequestInit = {}) {
     defaultHeaders["Authorization"] = `Bearer ${token}`;
   }
 
+  const isGet = !options.method || options.method.toUpperCase() === "GET";
+  const cached = isGet ? etagCache.get(endpoint) : undefined;
+  if (cached) {
+    defaultHeaders["If-None-Match"] = cached.etag;
+  }
+
   const config: RequestInit = {
+    cache: "no-store",
     ...options,
     headers: {
       ...defaultHeaders,
@@ -91,6 +100,7 @@ async function apiClient(endpoint: string, options: RequestInit = {}) {
     }
     
     if (response.status === 204) { return { success: true }; }
+    if (response.status === 304 && cached) { return cached.data; }
     
     const data = await response.json();
 
@@ -99,6 +109,9 @@ async function apiClient(endpoint: string, options: RequestInit = {}) {
       toast.error("Request Failed", { description: errorMessage });
       return null;
     }
+
+    const etag = response.headers.get("ETag");
+    if (isGet && etag) etagCache.set(endpoint, { etag, data });
     
     return data;
 